@@ -0,0 +1,76 @@
+if __name__ == "__main__":
+    # use the local version of renderstream
+    import sys
+    import os.path as p
+
+    sys.path.insert(0, p.join(p.dirname(p.dirname(__file__)), "src"))
+
+import math
+import sys
+import time
+
+import numpy as np
+
+import renderstream as RS
+from renderstream.buffers import BufferPool, hostMemoryFrameData
+from renderstream.parallel import StreamWorkers, gilEnabled
+from renderstream.simulator import SimulatedController, SimulatedStream
+
+N_STREAMS = 16
+FRAMES = 120
+
+
+def renderStream(rs, pool, stream, frameData, scene):
+    "Per-stream work dominated by Python code, as in many simple workloads."
+    camera = RS.CameraResponseData()
+    camera.tTracked = frameData.tTracked
+    camera.camera = rs.getFrameCamera(stream.handle)
+
+    brightness = []
+    for row in range(stream.height):
+        value = 0.0
+        for i in range(40):
+            value += math.sin(frameData.tTracked + row * 0.01 + i) ** 2
+        brightness.append(int(value / 40 * 255))
+
+    image = pool.get(stream.handle, (stream.height, stream.width, 4))
+    image[...] = np.array(brightness, dtype=np.uint8)[:, None, None]
+    pixels = hostMemoryFrameData(image)
+    rs.sendFrame(stream.handle, RS.SenderFrameType.HOST_MEMORY, pixels, RS.FrameResponseData(camera, scene, {}))
+
+
+def measure(threads):
+    streams = [SimulatedStream(f"tile {i}", 64, 256) for i in range(N_STREAMS)]
+    controller = SimulatedController(streams)
+    rs = RS.RenderStream(dll=controller.library)
+    schema = RS.Schema(["main"], [RS.RemoteParameters("default", [])])
+    rs.setSchema(schema)
+    scene = schema.scenes.scenes[0]
+    descriptions = rs.getStreams()
+    pool = BufferPool()
+    workers = StreamWorkers(threads)
+
+    start = None
+    for frame in range(FRAMES + 10):
+        if frame == 10:
+            start = time.perf_counter()  # after warm-up
+        frameData = rs.awaitFrameData(5000)
+        workers.run(descriptions, lambda stream: renderStream(rs, pool, stream, frameData, scene))
+    seconds = time.perf_counter() - start
+    workers.close()
+    if controller.violations:
+        raise RuntimeError(controller.violations[0])
+    return FRAMES / seconds
+
+
+def main():
+    print(f"Python {sys.version.split()[0]}, GIL {'enabled' if gilEnabled() else 'disabled'}")
+    baseline = None
+    for threads in (1, 2, 4, 8):
+        fps = measure(threads)
+        baseline = baseline or fps
+        print(f"{threads} threads: {fps:.1f} frames/s, {fps / baseline:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
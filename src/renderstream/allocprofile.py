@@ -0,0 +1,334 @@
+"""Allocation instrumentation for the frame loop.
+
+AllocationProfiler brackets each frame, and optionally each stream's render within it, and records how much memory
+was allocated in it: the most allocated at once above the start of the bracket (`peakBytes`, which catches temporary
+buffers freed before the bracket ends), what was still allocated at the end (`blocks` and `bytes`), and how many
+ctypes objects of the bindings' types (CameraData, RemoteParameter, pointers to them...) were created. With
+tracemalloc snapshots enabled every frame also records its top allocation sites. Intended for development and tests,
+not production: snapshots are expensive, and so is counting ctypes objects (see below).
+
+    profiler = AllocationProfiler(budgetBlocks=0, warmupFrames=10)
+    profiler.start()
+    for _ in range(100):
+        with profiler.frame():
+            frameData = rs.awaitFrameData(5000)
+            for stream in streams:
+                with profiler.stream(stream.handle):
+                    render(stream)
+    profiler.stop()
+    profiler.assertWithinBudget()
+
+`budgetBytes` limits the peak, so temporaries count against it; `budgetBlocks` limits blocks still allocated at the
+end of the bracket. Peaks need Python 3.9 or later; before that only the net bytes are checked. The profiler's own
+temporaries are measured on start() and left out of the peaks.
+
+ctypes objects are counted however they were made: constructed, or created by reading a structure field, indexing a
+pointer or array, `.contents`, cast() or from_address(). Each bracket counts the live objects of those types at
+entry and exit, from gc.get_objects(), and the objects finalized in between, through a `__del__` which start() adds
+to the types and stop() removes. The census walks every object tracked by the gc twice per bracket; pass
+`countCtypesObjects=False` when that is too slow. ctypes objects of other types (c_float arrays, c_char_p...) aren't
+counted."""
+
+import ctypes
+import gc
+import sys
+import tracemalloc
+from array import array
+from collections import deque
+from typing import Deque, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from . import renderstream as _bindings
+
+_resetPeak = getattr(tracemalloc, "reset_peak", None)
+_CData = ctypes.Structure.__mro__[1]
+
+# ctypes objects finalized, counted by the __del__ added by AllocationProfiler.start()
+_ctypesDeaths = array("q", [0])
+
+
+def _bindingsTypes() -> List[type]:
+    "The ctypes structures, unions and enumerations defined by the bindings, and pointers to them."
+    types = [
+        value
+        for value in vars(_bindings).values()
+        if isinstance(value, type) and issubclass(value, _CData) and value.__module__ == _bindings.__name__
+    ]
+    return list(dict.fromkeys(types + [ctypes.POINTER(cls) for cls in types]))  # some pointers are bindings too
+
+
+def _countDeath(self):
+    _ctypesDeaths[0] += 1
+
+
+class Allocations:
+    "What was allocated within one frame or stream bracket."
+
+    def __init__(self):
+        self.blocks = 0
+        self.bytes = 0
+        self.peakBytes: Optional[int] = None
+        self.ctypesObjects = 0
+        self.topSites: List[Tuple[str, int, int]] = []  # (file:line, bytes, blocks)
+
+    def __repr__(self):
+        return (
+            f"<Allocations blocks={self.blocks} bytes={self.bytes} peakBytes={self.peakBytes} "
+            f"ctypesObjects={self.ctypesObjects}>"
+        )
+
+
+class FrameAllocations(Allocations):
+    def __init__(self, frame: int):
+        super().__init__()
+        self.frame = frame
+        self.streams: Dict[Hashable, Allocations] = {}
+
+
+class _Bracket:
+    """Context manager measuring the allocation between enter and exit.
+
+    Stream brackets are kept and reused from frame to frame, and keep their measurements in arrays rather than int
+    objects, so the profiler doesn't allocate inside the frames it measures."""
+
+    BLOCKS, BYTES, PEAK, CTYPES = range(4)
+
+    def __init__(self, profiler: "AllocationProfiler", isFrame: bool):
+        self._profiler = profiler
+        self._isFrame = isFrame
+        self.frame = -1
+        self.values = array("q", [0, 0, -1, 0])
+        self._start = array("q", [0, 0, 0])
+
+    def __enter__(self):
+        profiler = self._profiler
+        if self._isFrame:
+            profiler._frameStarted()
+        else:
+            profiler._foldPeak()
+        start = self._start
+        start[2] = profiler._ctypesObjects()  # the census allocates, so before the memory is read
+        start[1] = tracemalloc.get_traced_memory()[0]
+        start[0] = sys.getallocatedblocks()
+        if _resetPeak is not None:
+            _resetPeak()  # drop the profiler's own temporaries from the peak
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        profiler, values, start = self._profiler, self.values, self._start
+        values[0] = sys.getallocatedblocks() - start[0]
+        current, peak = tracemalloc.get_traced_memory()
+        values[1] = current - start[1]
+        if self._isFrame:
+            peak = max(peak, profiler._peak) - profiler._frameOverhead
+        else:
+            peak -= profiler._streamOverhead
+        values[2] = max(peak - start[1], values[1], 0)
+        if not self._isFrame:
+            profiler._foldPeak()  # before the census, which mustn't reach the frame's peak
+        values[3] = profiler._ctypesObjects() - start[2]
+        if self._isFrame:
+            profiler._frameEnded(self)
+        elif _resetPeak is not None:
+            _resetPeak()
+
+    def allocations(self, result: Allocations) -> Allocations:
+        values = self.values
+        result.blocks = values[self.BLOCKS]
+        result.bytes = values[self.BYTES]
+        result.ctypesObjects = values[self.CTYPES]
+        if _resetPeak is not None:
+            result.peakBytes = values[self.PEAK]
+        return result
+
+
+class AllocationProfiler:
+    """Measures the memory allocated by each frame and each stream render.
+
+    If `snapshots` is set a tracemalloc snapshot is compared every frame to find the `topSites` allocation sites.
+    Frames after the first `warmupFrames` (whose allocations are expected: pools filling, caches warming, the first
+    frame of each stream) are checked against `budgetBlocks`, `budgetBytes` and `budgetCtypesObjects`, and the last
+    `history` frames are kept for reports."""
+
+    def __init__(
+        self,
+        topSites: int = 10,
+        snapshots: bool = True,
+        budgetBlocks: Optional[int] = None,
+        budgetBytes: Optional[int] = None,
+        budgetCtypesObjects: Optional[int] = None,
+        warmupFrames: int = 0,
+        history: int = 100,
+        countCtypesObjects: bool = True,
+    ):
+        self.topSites = topSites
+        self.snapshots = snapshots
+        self.budgetBlocks = budgetBlocks
+        self.budgetBytes = budgetBytes
+        self.budgetCtypesObjects = budgetCtypesObjects
+        self.warmupFrames = warmupFrames
+        self.countCtypesObjects = countCtypesObjects
+        self.frames: Deque[FrameAllocations] = deque(maxlen=history)
+        self.overBudget: List[FrameAllocations] = []
+        self._frame = 0
+        self._frameBracket = _Bracket(self, True)
+        self._streamBrackets: Dict[Hashable, _Bracket] = {}
+        self._inFrame = False
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+        self._peak = 0
+        # bytes the profiler's own bookkeeping adds to the peak of an empty bracket
+        self._frameOverhead = 0
+        self._streamOverhead = 0
+        self._hooked: List[type] = []
+        self._counted: FrozenSet[type] = frozenset()
+        self._startedTracing = False
+        self._filters = [
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, __file__),
+        ]
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._startedTracing = True
+        if self.countCtypesObjects:
+            types = _bindingsTypes()
+            self._counted = frozenset(types)
+            self._hooked = [cls for cls in types if "__del__" not in vars(cls)]
+            for cls in self._hooked:
+                cls.__del__ = _countDeath
+        self._calibrate()
+
+    def stop(self):
+        for cls in self._hooked:
+            del cls.__del__
+        self._hooked = []
+        self._counted = frozenset()
+        if self._startedTracing:
+            tracemalloc.stop()
+            self._startedTracing = False
+        self._snapshot = None
+
+    def _calibrate(self):
+        "Measure the peaks of empty frames and streams, to subtract the profiler's own temporaries."
+        if _resetPeak is None:
+            return
+        calibration = AllocationProfiler(snapshots=False, countCtypesObjects=False)
+        for _ in range(8):
+            with calibration.frame():
+                with calibration.stream(0):
+                    pass
+                with calibration.stream(1):
+                    pass
+        frames = list(calibration.frames)[3:]  # after the brackets and their results are first allocated
+        self._frameOverhead = max(frame.peakBytes for frame in frames)
+        self._streamOverhead = max(stream.peakBytes for frame in frames for stream in frame.streams.values())
+
+    def frame(self) -> _Bracket:
+        "Bracket one iteration of the frame loop."
+        if self._inFrame:
+            raise RuntimeError("Frames can't be nested")
+        return self._frameBracket
+
+    def stream(self, stream: Hashable) -> _Bracket:
+        "Bracket one stream's render inside a frame."
+        if not self._inFrame:
+            raise RuntimeError("Streams must be profiled inside a frame")
+        bracket = self._streamBrackets.get(stream)
+        if bracket is None:
+            bracket = self._streamBrackets[stream] = _Bracket(self, False)
+        bracket.frame = self._frame
+        return bracket
+
+    def _ctypesObjects(self) -> int:
+        "Live objects of the counted types plus those finalized so far: the difference over a bracket is those made."
+        if not self._counted:
+            return 0
+        counted = self._counted
+        return sum(1 for obj in gc.get_objects() if type(obj) in counted) + _ctypesDeaths[0]
+
+    def _foldPeak(self):
+        # stream brackets reset the peak, so the frame's own peak is the maximum seen at every reset
+        if _resetPeak is not None:
+            peak = tracemalloc.get_traced_memory()[1]
+            if peak > self._peak:
+                self._peak = peak
+            _resetPeak()
+
+    def _frameStarted(self):
+        if not tracemalloc.is_tracing():
+            raise RuntimeError("AllocationProfiler.start() must be called first")
+        if self.snapshots and self._snapshot is None:
+            self._snapshot = self._takeSnapshot()
+        self._inFrame = True
+        self._peak = 0
+        if _resetPeak is not None:
+            _resetPeak()
+
+    def _frameEnded(self, frameBracket: _Bracket):
+        self._inFrame = False
+        result = frameBracket.allocations(FrameAllocations(self._frame))
+        for stream, bracket in self._streamBrackets.items():
+            if bracket.frame == self._frame:
+                streamResult = result.streams[stream] = bracket.allocations(Allocations())
+                if streamResult.peakBytes is not None and streamResult.peakBytes > result.peakBytes:
+                    result.peakBytes = streamResult.peakBytes
+        if self.snapshots:
+            snapshot = self._takeSnapshot()
+            self._compare(result, snapshot, self._snapshot)
+            self._snapshot = snapshot
+
+        self.frames.append(result)
+        if self._frame >= self.warmupFrames and not self.withinBudget(result):
+            self.overBudget.append(result)
+        self._frame += 1
+
+    def _takeSnapshot(self) -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(self._filters)
+
+    def _compare(self, result: Allocations, snapshot: tracemalloc.Snapshot, previous: tracemalloc.Snapshot):
+        diffs = snapshot.compare_to(previous, "lineno")
+        sites = []
+        for diff in diffs:
+            if diff.size_diff <= 0 and diff.count_diff <= 0:
+                continue
+            frame = diff.traceback[0]
+            sites.append((f"{frame.filename}:{frame.lineno}", diff.size_diff, diff.count_diff))
+        result.topSites = sites[: self.topSites]  # compare_to sorts by size difference
+
+    def withinBudget(self, allocations: Allocations) -> bool:
+        grossBytes = allocations.bytes if allocations.peakBytes is None else allocations.peakBytes
+        return (
+            (self.budgetBlocks is None or allocations.blocks <= self.budgetBlocks)
+            and (self.budgetBytes is None or grossBytes <= self.budgetBytes)
+            and (self.budgetCtypesObjects is None or allocations.ctypesObjects <= self.budgetCtypesObjects)
+        )
+
+    def report(self, allocations: Optional[FrameAllocations] = None) -> str:
+        "A readable summary of one frame, by default the most recent."
+        if allocations is None:
+            if not self.frames:
+                return "No frames profiled"
+            allocations = self.frames[-1]
+        lines = [
+            f"Frame {allocations.frame}: {allocations.blocks} blocks, {allocations.bytes} bytes"
+            + (f", peak {allocations.peakBytes} bytes" if allocations.peakBytes is not None else "")
+            + f", {allocations.ctypesObjects} ctypes objects"
+        ]
+        for stream, streamAllocations in allocations.streams.items():
+            lines.append(
+                f"  stream {stream}: {streamAllocations.blocks} blocks, {streamAllocations.bytes} bytes"
+                + (f", peak {streamAllocations.peakBytes} bytes" if streamAllocations.peakBytes is not None else "")
+                + f", {streamAllocations.ctypesObjects} ctypes objects"
+            )
+        for site, size, count in allocations.topSites:
+            lines.append(f"  {site}: {size} bytes in {count} blocks")
+        return "\n".join(lines)
+
+    def assertWithinBudget(self):
+        "Raise AssertionError describing the first frame that went over budget, if any did."
+        if self.overBudget:
+            raise AssertionError(
+                f"{len(self.overBudget)} frame(s) over the allocation budget "
+                f"(blocks={self.budgetBlocks}, bytes={self.budgetBytes}, ctypesObjects={self.budgetCtypesObjects})\n"
+                + self.report(self.overBudget[0])
+            )
@@ -0,0 +1,239 @@
+"""Per-frame arena for the transient ctypes structures used by the frame loop.
+
+A FrameArena preallocates one block holding the FrameData, CameraData, CameraResponseData, FrameResponseData and
+SenderFrameTypeData for every stream, along with the parameter buffers, and carves it into views once. After
+RenderStream.setFrameArena(arena), awaitFrameData resets the arena and the structures it hands out are reused every
+frame instead of being allocated. They are only valid until the next awaitFrameData.
+
+In debug mode every frame gets a fresh block and the previous one is poisoned, so data read through a stale view is
+obviously wrong, and check() (called by sendFrame) raises if given a structure from an earlier frame."""
+
+import ctypes
+import threading
+from typing import Dict, List, Mapping, Optional, Tuple, Union
+
+from .renderstream import (
+    CameraData,
+    CameraResponseData,
+    FrameData,
+    FrameResponseData,
+    ImageFrameData,
+    RemoteParameters,
+    RemoteParameterType,
+    SenderFrameTypeData,
+    outputParameterLayout,
+)
+
+_ALIGNMENT = 16
+_POISON = 0xDD
+_STALE_GENERATIONS = 4  # poisoned blocks kept alive so their address ranges can't be reused by other objects
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) & ~(_ALIGNMENT - 1)
+
+
+class FrameArena:
+    def __init__(
+        self,
+        maxStreams: int = 64,
+        maxParameterFloats: int = 4096,
+        maxParameterImages: int = 64,
+        maxOutputFloats: int = 64,
+        maxOutputTexts: int = 16,
+        debug: bool = False,
+    ):
+        self.maxStreams = maxStreams
+        self.maxParameterFloats = maxParameterFloats
+        self.maxParameterImages = maxParameterImages
+        self.maxOutputFloats = maxOutputFloats
+        self.maxOutputTexts = maxOutputTexts
+        self.debug = debug
+        self.generation = 0
+        self.overflows = 0  # structures allocated on the heap because the arena was full
+        self._lock = threading.Lock()  # slots may be claimed by several per-stream threads at once
+
+        layout = [
+            ("frameData", FrameData, 1),
+            ("cameraData", CameraData, maxStreams),
+            ("cameraResponseData", CameraResponseData, maxStreams),
+            ("frameResponseData", FrameResponseData, maxStreams),
+            ("senderFrameTypeData", SenderFrameTypeData, maxStreams),
+            ("parameterFloats", ctypes.c_float, maxParameterFloats),
+            ("parameterImages", ImageFrameData, maxParameterImages),
+            ("outputFloats", ctypes.c_float, maxStreams * maxOutputFloats),
+            ("outputTexts", ctypes.c_char_p, maxStreams * maxOutputTexts),
+        ]
+        self._offsets = {}
+        size = 0
+        for name, type, count in layout:
+            self._offsets[name] = (size, type, count)
+            size = _align(size + ctypes.sizeof(type) * count)
+        self.nbytes = size
+
+        self._stale: List[ctypes.Array] = []
+        # the camera each response slot points at, kept alive until the slot is reset, as ctypes.pointer would
+        self._responseCameraRefs: List[Optional[CameraResponseData]] = [None] * maxStreams
+        self._iResponse = 0
+        # per scene hash: (key, type) of each output parameter, and how many are numbers and texts
+        self._outputLayouts: Dict[int, Tuple[List[Tuple[str, RemoteParameterType]], int, int]] = {}
+        self._carve()
+        self.reset()
+
+    def _array(self, name: str) -> ctypes.Array:
+        offset, type, count = self._offsets[name]
+        return (type * count).from_buffer(self._buffer, offset)
+
+    def _carve(self):
+        "Allocate the block and create every view into it, so handing them out later doesn't allocate."
+        self._buffer = (ctypes.c_uint8 * self.nbytes)()
+        self._base = ctypes.addressof(self._buffer)
+
+        self._frameData = self._array("frameData")[0]
+        cameras = self._array("cameraData")
+        self._cameras = [cameras[i] for i in range(self.maxStreams)]
+        cameraResponses = self._array("cameraResponseData")
+        self._cameraResponses = [cameraResponses[i] for i in range(self.maxStreams)]
+        senders = self._array("senderFrameTypeData")
+        self._senders = [senders[i] for i in range(self.maxStreams)]
+        self.parameterFloats = self._array("parameterFloats")
+        self.parameterImages = self._array("parameterImages")
+
+        # Each response slot permanently points at its own output parameter storage. Only the camera pointer
+        # changes per frame, so it is written through a c_void_p view rather than by allocating a pointer object.
+        responses = self._array("frameResponseData")
+        outputFloatsOffset = self._offsets["outputFloats"][0]
+        outputTextsOffset = self._offsets["outputTexts"][0]
+        responseOffset = self._offsets["frameResponseData"][0]
+        cameraPointerOffset = FrameResponseData.cameraData.offset
+        self._responses = []
+        self._responseCameras = []
+        self._outputFloats = []
+        self._outputTexts = []
+        for i in range(self.maxStreams):
+            response = responses[i]
+            floatsOffset = outputFloatsOffset + i * self.maxOutputFloats * ctypes.sizeof(ctypes.c_float)
+            textsOffset = outputTextsOffset + i * self.maxOutputTexts * ctypes.sizeof(ctypes.c_char_p)
+            response.parameterData = self._base + floatsOffset
+            response.textData = ctypes.cast(self._base + textsOffset, ctypes.POINTER(ctypes.c_char_p))
+            self._responses.append(response)
+            cameraPointer = responseOffset + i * ctypes.sizeof(FrameResponseData) + cameraPointerOffset
+            self._responseCameras.append(ctypes.c_void_p.from_buffer(self._buffer, cameraPointer))
+            self._outputFloats.append((ctypes.c_float * self.maxOutputFloats).from_buffer(self._buffer, floatsOffset))
+            self._outputTexts.append((ctypes.c_char_p * self.maxOutputTexts).from_buffer(self._buffer, textsOffset))
+
+    def reset(self):
+        "Start a new frame. Everything handed out since the last reset becomes invalid."
+        if self.debug and self.generation > 0:
+            ctypes.memset(self._base, _POISON, self.nbytes)
+            self._stale.append(self._buffer)
+            del self._stale[:-_STALE_GENERATIONS]
+            self._carve()
+        for i in range(self._iResponse):
+            self._responseCameraRefs[i] = None
+        self.generation += 1
+        self._iCamera = 0
+        self._iCameraResponse = 0
+        self._iResponse = 0
+        self._iSender = 0
+
+    def check(self, obj):
+        "Raises RuntimeError if obj was handed out by this arena before the last reset (debug mode only)."
+        if not self.debug:
+            return
+        address = ctypes.addressof(obj)
+        for stale in self._stale:
+            base = ctypes.addressof(stale)
+            if base <= address < base + self.nbytes:
+                raise RuntimeError(f"{type(obj).__name__} from a previous frame used after FrameArena.reset()")
+
+    def overflow(self, what: str):
+        "Record that `what` didn't fit and was allocated instead. In debug mode raises MemoryError."
+        if self.debug:
+            raise MemoryError(f"FrameArena has no more {what}, increase its capacity")
+        with self._lock:
+            self.overflows += 1
+
+    def frameData(self) -> FrameData:
+        return self._frameData
+
+    def _claim(self, counter: str) -> int:
+        "Index of the next free slot counted by `counter`, or -1 if they are all in use."
+        with self._lock:
+            i = getattr(self, counter)
+            if i >= self.maxStreams:
+                return -1
+            setattr(self, counter, i + 1)
+            return i
+
+    def cameraData(self) -> CameraData:
+        i = self._claim("_iCamera")
+        if i < 0:
+            self.overflow("CameraData")
+            return CameraData()
+        return self._cameras[i]
+
+    def cameraResponseData(self) -> CameraResponseData:
+        i = self._claim("_iCameraResponse")
+        if i < 0:
+            self.overflow("CameraResponseData")
+            return CameraResponseData()
+        return self._cameraResponses[i]
+
+    def senderFrameTypeData(self) -> SenderFrameTypeData:
+        i = self._claim("_iSender")
+        if i < 0:
+            self.overflow("SenderFrameTypeData")
+            return SenderFrameTypeData()
+        sender = self._senders[i]
+        ctypes.memset(ctypes.addressof(sender), 0, ctypes.sizeof(sender))
+        return sender
+
+    def frameResponseData(
+        self,
+        cameraData: CameraResponseData,
+        scene: RemoteParameters,
+        outputParams: Mapping[str, Union[float, str]],
+    ) -> FrameResponseData:
+        """Equivalent to FrameResponseData(cameraData, scene, outputParams), using arena storage. The scene's output
+        parameters are looked up once per scene, and numbers written straight into the arena; texts are encoded."""
+        outputLayout = self._outputLayouts.get(scene.hash)
+        if outputLayout is None:
+            layout = outputParameterLayout(scene)
+            nFloats = sum(1 for _, paramType in layout if paramType == RemoteParameterType.NUMBER)
+            nTexts = sum(1 for _, paramType in layout if paramType == RemoteParameterType.TEXT)
+            outputLayout = self._outputLayouts[scene.hash] = (layout, nFloats, nTexts)
+        layout, nFloats, nTexts = outputLayout
+        i = -1
+        if nFloats <= self.maxOutputFloats and nTexts <= self.maxOutputTexts:
+            i = self._claim("_iResponse")
+        if i < 0:
+            self.overflow("FrameResponseData")
+            return FrameResponseData(cameraData, scene, outputParams)
+
+        response = self._responses[i]
+        self._responseCameraRefs[i] = cameraData
+        self._responseCameras[i].value = ctypes.addressof(cameraData)
+        response.schemaHash = scene.hash
+
+        outputFloats = self._outputFloats[i]
+        outputTexts = self._outputTexts[i]
+        iFloat = 0
+        iText = 0
+        for key, paramType in layout:
+            value = outputParams[key]
+            if paramType == RemoteParameterType.NUMBER:
+                if not isinstance(value, float):
+                    raise ValueError(f"Value for {key} should be float")
+                outputFloats[iFloat] = value
+                iFloat += 1
+            elif paramType == RemoteParameterType.TEXT:
+                if not isinstance(value, str):
+                    raise ValueError(f"Value for {key} should be str")
+                outputTexts[iText] = bytes(value, encoding="utf-8")
+                iText += 1
+            else:
+                raise ValueError(f"Unexpected {value!r} in output params")
+        response.parameterDataSize = nFloats * ctypes.sizeof(ctypes.c_float)
+        response.textDataCount = nTexts
+        return response
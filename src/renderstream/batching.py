@@ -0,0 +1,161 @@
+"""Batched rendering of streams with the same size and pixel format. Requires numpy.
+
+With many small streams, e.g. dense LED tiles, running numpy kernels once per stream is dominated by per-call
+overhead. StreamBatcher groups the streams by width, height and format and backs each group with one pooled
+(N, height, width, 4) array, so a render callback can run each kernel once over the whole group, with the streams'
+cameras and clipping given as arrays. Each stream is sent its zero-copy [i] slice:
+
+    batcher = StreamBatcher()
+    batcher.update(rs.getStreams())  # again after every STREAMS_CHANGED
+    ...
+    batcher.renderBatches(rs, frameData, scene, render)
+"""
+
+import ctypes
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .buffers import BufferPool, hostMemoryFrameData
+from .pixelformat import formatDtype
+from .renderstream import (
+    CameraData,
+    CameraResponseData,
+    FrameData,
+    FrameResponseData,
+    RemoteParameters,
+    RenderStream,
+    RenderStreamError,
+    RS_ERROR,
+    SenderFrameType,
+    StreamDescription,
+    StreamDescriptions,
+)
+
+# columns of StreamBatch.cameras, the contiguous float fields of CameraData
+CAMERA_COLUMNS = (
+    "x",
+    "y",
+    "z",
+    "rx",
+    "ry",
+    "rz",
+    "focalLength",
+    "sensorX",
+    "sensorY",
+    "cx",
+    "cy",
+    "nearZ",
+    "farZ",
+    "orthoWidth",
+)
+# columns of StreamBatch.clipping
+CLIPPING_COLUMNS = ("left", "right", "top", "bottom")
+
+_CAMERA_OFFSET = CameraData.x.offset
+
+
+class StreamBatch:
+    """Streams of one size and format rendered together.
+
+    `images[i]`, `cameras[i]` and `clipping[i]` belong to streams[i]. `valid[i]` is False for streams without a
+    camera this frame (NOT_FOUND), which are not sent."""
+
+    def __init__(self, streams: List[StreamDescription], pool: BufferPool):
+        first = streams[0]
+        self.streams = streams
+        self.width = first.width
+        self.height = first.height
+        self.format = first.format
+        self.key = ("batch", first.width, first.height, first.format.value)  # of images in the pool
+        self.images = pool.get(self.key, (len(streams), first.height, first.width, 4), formatDtype(first.format))
+        self.cameras = np.zeros((len(streams), len(CAMERA_COLUMNS)), dtype=np.float32)
+        self.clipping = np.array(
+            [[getattr(stream.clipping, column) for column in CLIPPING_COLUMNS] for stream in streams],
+            dtype=np.float32,
+        )
+        self.valid = np.zeros(len(streams), dtype=bool)
+
+        # the pooled array doesn't move, so each stream's frame data and response are built once
+        self.cameraData = [CameraData() for _ in streams]
+        self.senderFrameData = [hostMemoryFrameData(self.images[i]) for i in range(len(streams))]
+        self.cameraResponses = [CameraResponseData() for _ in streams]
+
+    def __len__(self) -> int:
+        return len(self.streams)
+
+    def column(self, name: str) -> np.ndarray:
+        "One camera field for every stream in the batch, e.g. batch.column('focalLength')."
+        return self.cameras[:, CAMERA_COLUMNS.index(name)]
+
+    def setCamera(self, i: int, camera: Optional[CameraData]):
+        if camera is None:
+            self.valid[i] = False
+            return
+        self.valid[i] = True
+        ctypes.memmove(ctypes.addressof(self.cameraData[i]), ctypes.addressof(camera), ctypes.sizeof(CameraData))
+        self.cameras[i] = np.frombuffer(camera, dtype=np.float32, count=len(CAMERA_COLUMNS), offset=_CAMERA_OFFSET)
+
+
+def batchStreams(streams: StreamDescriptions, pool: BufferPool) -> List[StreamBatch]:
+    "Group streams by width, height and pixel format."
+    grouped: Dict[Tuple[int, int, int], List[StreamDescription]] = {}
+    for i in range(streams.nStreams):
+        stream = streams.streams[i]
+        grouped.setdefault((stream.width, stream.height, stream.format.value), []).append(stream)
+    return [StreamBatch(members, pool) for members in grouped.values()]
+
+
+class StreamBatcher:
+    def __init__(self, pool: Optional[BufferPool] = None):
+        self.pool = pool if pool is not None else BufferPool()
+        self.batches: List[StreamBatch] = []
+
+    def update(self, streams: StreamDescriptions):
+        "Regroup after the stream set changes."
+        for batch in self.batches:
+            self.pool.discard(batch.key)
+        self.batches = batchStreams(streams, self.pool)
+
+    def fetchCameras(self, rs: RenderStream):
+        "Fill every batch's camera arrays with this frame's cameras."
+        for batch in self.batches:
+            for i, stream in enumerate(batch.streams):
+                try:
+                    batch.setCamera(i, rs.getFrameCamera(stream.handle))
+                except RenderStreamError as e:
+                    if e.error != RS_ERROR.NOT_FOUND:
+                        raise
+                    # on startup, this workload may not have been found on the controller yet.
+                    batch.setCamera(i, None)
+
+    def sendBatch(
+        self, rs: RenderStream, batch: StreamBatch, frameData: FrameData, scene: RemoteParameters, outputParams: Mapping
+    ):
+        "Send each valid stream of the batch its slice of batch.images."
+        for i, stream in enumerate(batch.streams):
+            if not batch.valid[i]:
+                continue
+            cameraResponse = batch.cameraResponses[i]
+            cameraResponse.tTracked = frameData.tTracked
+            cameraResponse.camera = batch.cameraData[i]
+            response = FrameResponseData(cameraResponse, scene, outputParams)
+            rs.sendFrame(stream.handle, SenderFrameType.HOST_MEMORY, batch.senderFrameData[i], response)
+
+    def renderBatches(
+        self,
+        rs: RenderStream,
+        frameData: FrameData,
+        scene: RemoteParameters,
+        render: Callable[[StreamBatch], Optional[Mapping]],
+    ):
+        """Render and send every batch.
+
+        `render(batch)` draws all of batch.images at once, using batch.cameras and batch.clipping, and may return
+        the output parameters for the frame."""
+        self.fetchCameras(rs)
+        for batch in self.batches:
+            if not batch.valid.any():
+                continue
+            outputParams = render(batch) or {}
+            self.sendBatch(rs, batch, frameData, scene, outputParams)
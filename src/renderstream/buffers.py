@@ -0,0 +1,57 @@
+"""Reusable host-memory frame buffers. Requires numpy."""
+
+import ctypes
+import threading
+from typing import Dict, Hashable, Optional, Tuple
+
+import numpy as np
+
+from .renderstream import SenderFrameTypeData
+
+
+class BufferPool:
+    """Numpy arrays kept per key (typically a stream handle), allocated on first use and reused for as long as the
+    requested shape and dtype stay the same, so steady-state frames don't allocate image memory.
+
+    Safe to use from several threads; two threads asking for a new buffer with the same key get the same array."""
+
+    def __init__(self):
+        self._buffers: Dict[Hashable, np.ndarray] = {}
+        self._lock = threading.Lock()  # only taken when allocating
+
+    def _matches(self, buffer: Optional[np.ndarray], shape: Tuple[int, ...], dtype) -> bool:
+        return buffer is not None and buffer.shape == tuple(shape) and buffer.dtype == dtype
+
+    def get(self, key: Hashable, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        buffer = self._buffers.get(key)
+        if not self._matches(buffer, shape, dtype):
+            with self._lock:
+                buffer = self._buffers.get(key)
+                if not self._matches(buffer, shape, dtype):
+                    buffer = self._buffers[key] = np.empty(shape, dtype=dtype)
+        return buffer
+
+    def discard(self, key: Hashable):
+        self._buffers.pop(key, None)
+
+    def clear(self):
+        "Release every buffer, e.g. after STREAMS_CHANGED."
+        self._buffers.clear()
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+
+def hostMemoryFrameData(image: np.ndarray, frameData: Optional[SenderFrameTypeData] = None) -> SenderFrameTypeData:
+    """Fill in (or create) SenderFrameTypeData for sending `image` as SenderFrameType.HOST_MEMORY.
+
+    `image` is indexed [row, column, ...]; its rows may be strided (e.g. a slice of a larger image) but each row
+    must be contiguous."""
+    if image.strides[1] != image.itemsize * int(np.prod(image.shape[2:], dtype=np.int64)):
+        raise ValueError("Rows of a host memory frame must be contiguous")
+    if frameData is None:
+        frameData = SenderFrameTypeData()
+    frameData.cpu.data = ctypes.cast(image.ctypes.data, ctypes.POINTER(ctypes.c_uint8))
+    frameData.cpu.stride = image.strides[0]
+    return frameData
@@ -0,0 +1,157 @@
+"""Render-once shared canvases for streams that only differ by clipping. Requires numpy.
+
+When a canvas is split across several streams, e.g. a wide LED processor fed by many outputs, every stream on the
+same channel and mapping shares a camera and only its ProjectionClipping differs. groupStreams finds those groups so
+the full canvas can be rendered once, and each stream is sent a strided sub-rectangle view of it through
+HostMemoryData.stride without copying."""
+
+import ctypes
+from typing import Callable, Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .buffers import BufferPool, hostMemoryFrameData
+from .pixelformat import formatDtype
+from .renderstream import (
+    CameraData,
+    CameraResponseData,
+    FrameData,
+    FrameResponseData,
+    ProjectionClipping,
+    RemoteParameters,
+    RenderStream,
+    RenderStreamError,
+    RS_ERROR,
+    SenderFrameType,
+    SenderFrameTypeData,
+    StreamDescription,
+    StreamDescriptions,
+)
+
+_POSE_OFFSET = CameraData.x.offset  # everything after the stream id and camera handle
+
+
+def _cameraPose(camera: CameraData) -> bytes:
+    return ctypes.string_at(ctypes.addressof(camera) + _POSE_OFFSET, ctypes.sizeof(CameraData) - _POSE_OFFSET)
+
+
+class CanvasGroup:
+    """Streams rendered from one shared canvas.
+
+    `clipping` is the union of the members' clipping, for building the canvas projection exactly as for a single
+    stream. `rects[i]` is the (x, y, width, height) of streams[i] within the canvas."""
+
+    def __init__(self, streams: List[StreamDescription], camera: CameraData):
+        self.streams = streams
+        self.camera = camera
+        self.format = streams[0].format
+
+        first = streams[0]
+        if len(streams) == 1:
+            self.clipping = first.clipping
+            self.width, self.height = first.width, first.height
+            self.rects = [(0, 0, first.width, first.height)]
+            return
+
+        self.clipping = ProjectionClipping()
+        self.clipping.left = min(stream.clipping.left for stream in streams)
+        self.clipping.right = max(stream.clipping.right for stream in streams)
+        self.clipping.top = min(stream.clipping.top for stream in streams)
+        self.clipping.bottom = max(stream.clipping.bottom for stream in streams)
+
+        pixelsPerUnitX = first.width / (first.clipping.right - first.clipping.left)
+        pixelsPerUnitY = first.height / (first.clipping.bottom - first.clipping.top)
+        self.width = round((self.clipping.right - self.clipping.left) * pixelsPerUnitX)
+        self.height = round((self.clipping.bottom - self.clipping.top) * pixelsPerUnitY)
+
+        self.rects = []
+        for stream in streams:
+            x = min(round((stream.clipping.left - self.clipping.left) * pixelsPerUnitX), self.width - stream.width)
+            y = min(round((stream.clipping.top - self.clipping.top) * pixelsPerUnitY), self.height - stream.height)
+            self.rects.append((max(x, 0), max(y, 0), stream.width, stream.height))
+
+    @property
+    def shape(self) -> Tuple[int, int, int]:
+        return (self.height, self.width, 4)
+
+    def view(self, canvas: np.ndarray, i: int) -> np.ndarray:
+        "The zero-copy region of the canvas belonging to streams[i]."
+        x, y, width, height = self.rects[i]
+        return canvas[y : y + height, x : x + width]
+
+    def senderFrameData(
+        self, canvas: np.ndarray, i: int, frameData: Optional[SenderFrameTypeData] = None
+    ) -> SenderFrameTypeData:
+        return hostMemoryFrameData(self.view(canvas, i), frameData)
+
+
+def _sharesCanvas(stream: StreamDescription, first: StreamDescription) -> bool:
+    "Streams can only share a canvas if they sample it at the same resolution."
+    scaleX = stream.width / (stream.clipping.right - stream.clipping.left)
+    scaleY = stream.height / (stream.clipping.bottom - stream.clipping.top)
+    firstX = first.width / (first.clipping.right - first.clipping.left)
+    firstY = first.height / (first.clipping.bottom - first.clipping.top)
+    return abs(scaleX - firstX) <= 0.5 and abs(scaleY - firstY) <= 0.5
+
+
+def groupStreams(streams: StreamDescriptions, cameras: Mapping[int, CameraData]) -> List[CanvasGroup]:
+    """Group streams by channel, mappingId, pixel format and camera.
+
+    `cameras` maps stream handles to this frame's CameraData; streams without a camera (NOT_FOUND) are left out.
+    Streams whose clipping is degenerate or which sample the canvas at a different resolution get their own
+    group."""
+    grouped: Dict[tuple, List[StreamDescription]] = {}
+    groupCameras: Dict[tuple, CameraData] = {}
+    singles: List[Tuple[StreamDescription, CameraData]] = []
+    for i in range(streams.nStreams):
+        stream = streams.streams[i]
+        camera = cameras.get(stream.handle)
+        if camera is None:
+            continue
+        if stream.clipping.right <= stream.clipping.left or stream.clipping.bottom <= stream.clipping.top:
+            singles.append((stream, camera))
+            continue
+        key = (stream.channel, stream.mappingId, stream.format.value, camera.cameraHandle, _cameraPose(camera))
+        members = grouped.setdefault(key, [])
+        if members and not _sharesCanvas(stream, members[0]):
+            singles.append((stream, camera))
+            continue
+        members.append(stream)
+        groupCameras.setdefault(key, camera)
+
+    groups = [CanvasGroup(members, groupCameras[key]) for key, members in grouped.items()]
+    groups.extend(CanvasGroup([stream], camera) for stream, camera in singles)
+    return groups
+
+
+def renderCanvasGroups(
+    rs: RenderStream,
+    streams: StreamDescriptions,
+    frameData: FrameData,
+    scene: RemoteParameters,
+    render: Callable[[CanvasGroup, np.ndarray], Optional[Mapping]],
+    pool: BufferPool,
+):
+    """Render each canvas group once and send every member stream its region.
+
+    `render(group, canvas)` draws the group's full canvas (using group.camera and group.clipping) into `canvas`,
+    already in the group's pixel format, and may return the output parameters for the frame."""
+    cameras: Dict[int, CameraData] = {}
+    for i in range(streams.nStreams):
+        stream = streams.streams[i]
+        try:
+            cameras[stream.handle] = rs.getFrameCamera(stream.handle)
+        except RenderStreamError as e:
+            if e.error != RS_ERROR.NOT_FOUND:
+                raise
+            # on startup, this workload may not have been found on the controller yet.
+
+    for group in groupStreams(streams, cameras):
+        canvas = pool.get(("canvas", group.streams[0].handle), group.shape, formatDtype(group.format))
+        outputParams = render(group, canvas) or {}
+        for i, stream in enumerate(group.streams):
+            cameraResponse = CameraResponseData()
+            cameraResponse.tTracked = frameData.tTracked
+            cameraResponse.camera = cameras[stream.handle]
+            response = FrameResponseData(cameraResponse, scene, outputParams)
+            rs.sendFrame(stream.handle, SenderFrameType.HOST_MEMORY, group.senderFrameData(canvas, i), response)
@@ -0,0 +1,272 @@
+"""Asynchronous capture of sent host-memory frames, for QA and incident review. Requires numpy.
+
+CaptureTap copies the images of selected streams, decimated to every Nth frame and/or a maximum rate, into a bounded
+pool of buffers, and a background thread writes them to disk with their FrameData and camera metadata. The frame
+loop never waits on the disk: when every pool buffer is still queued for writing, the capture is dropped.
+
+Each stream is written to `stream-<handle>.jsonl`, one JSON line of metadata per captured frame, and either
+`stream-<handle>.raw`, frames appended back to back (see readRawCapture), or one PNG per frame."""
+
+import json
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from collections import deque
+from typing import Collection, Deque, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from .buffers import hostMemoryFrameData
+from .renderstream import (
+    CameraData,
+    FrameData,
+    FrameResponseData,
+    RenderStream,
+    RSPixelFormat,
+    SenderFrameType,
+    SenderFrameTypeData,
+    StreamDescription,
+)
+
+RAW = "raw"
+PNG = "png"
+
+_BGR_FORMATS = (RSPixelFormat.BGRA8.value, RSPixelFormat.BGRX8.value)
+_CAMERA_FIELDS = ("x", "y", "z", "rx", "ry", "rz", "focalLength", "sensorX", "sensorY", "cx", "cy", "nearZ", "farZ")
+
+
+def _pngChunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data) & 0xFFFFFFFF)
+
+
+def encodePng(rgba: np.ndarray, compression: int = 1) -> bytes:
+    "Encode a (height, width, 4) uint8 RGBA image as PNG."
+    height, width = rgba.shape[:2]
+    rows = np.zeros((height, width * 4 + 1), dtype=np.uint8)  # each row is prefixed by filter type 0
+    rows[:, 1:] = rgba.reshape(height, width * 4)
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + _pngChunk(b"IHDR", header)
+        + _pngChunk(b"IDAT", zlib.compress(rows.tobytes(), compression))
+        + _pngChunk(b"IEND", b"")
+    )
+
+
+def _toRgba8(image: np.ndarray, format: int) -> np.ndarray:
+    if image.dtype != np.uint8:
+        image = (np.clip(image.astype(np.float32), 0.0, 1.0) * 255.0 + 0.5).astype(np.uint8)
+    if format in _BGR_FORMATS:
+        image = image[..., [2, 1, 0, 3]]
+    if format in (RSPixelFormat.BGRX8.value, RSPixelFormat.RGBX8.value):
+        image = image.copy() if image.base is not None else image
+        image[..., 3] = 255
+    return image
+
+
+def _boxDownscale(image: np.ndarray, factor: int) -> np.ndarray:
+    height, width = image.shape[0] // factor, image.shape[1] // factor
+    blocks = image[: height * factor, : width * factor].reshape(height, factor, width, factor, image.shape[2])
+    return blocks.mean(axis=(1, 3), dtype=np.float32).astype(image.dtype)
+
+
+class _Capture:
+    __slots__ = ("buffer", "stream", "format", "frame", "metadata")
+
+    def __init__(self):
+        self.buffer: Optional[np.ndarray] = None
+        self.stream = 0
+        self.format = 0
+        self.frame = 0
+        self.metadata: dict = {}
+
+
+class CaptureTap:
+    """Captures streams' sent images on a background thread.
+
+    `streams` limits capture to those stream handles (default all). A stream is captured every `everyN` frames and
+    at most `maxFps` times a second. `downscale` reduces each dimension by an integer factor: "nearest" subsamples
+    while copying in the frame loop, "box" copies full size and averages on the writer thread. `poolSize` buffers
+    are shared by every stream; captures beyond that are counted in `dropped`."""
+
+    def __init__(
+        self,
+        directory: str,
+        streams: Optional[Collection[int]] = None,
+        everyN: int = 1,
+        maxFps: Optional[float] = None,
+        downscale: int = 1,
+        filter: str = "nearest",
+        output: str = RAW,
+        poolSize: int = 8,
+    ):
+        if output not in (RAW, PNG):
+            raise ValueError(f"Unknown capture output {output!r}")
+        if filter not in ("nearest", "box"):
+            raise ValueError(f"Unknown downscale filter {filter!r}")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.streams = None if streams is None else set(streams)
+        self.everyN = everyN
+        self.minInterval = 1.0 / maxFps if maxFps else 0.0
+        self.downscale = downscale
+        self.filter = filter
+        self.output = output
+
+        self.captured = 0
+        self.dropped = 0
+        self.written = 0
+        self.errors = 0
+        self._free: Deque[_Capture] = deque(_Capture() for _ in range(poolSize))
+        self._freeLock = threading.Lock()
+        self._queue: "queue.Queue[Optional[_Capture]]" = queue.Queue()
+        self._frameCounts: Dict[int, int] = {}
+        self._lastCapture: Dict[int, float] = {}
+        self._files: Dict[int, Tuple] = {}
+        self._thread = threading.Thread(target=self._run, name="renderstream-capture", daemon=True)
+        self._thread.start()
+
+    def wants(self, stream: int, now: Optional[float] = None) -> bool:
+        "Whether this frame of the stream should be captured; advances the stream's decimation state."
+        if self.streams is not None and stream not in self.streams:
+            return False
+        count = self._frameCounts.get(stream, 0)
+        self._frameCounts[stream] = count + 1
+        if count % self.everyN:
+            return False
+        if self.minInterval:
+            now = time.perf_counter() if now is None else now
+            if now - self._lastCapture.get(stream, -self.minInterval) < self.minInterval:
+                return False
+            self._lastCapture[stream] = now
+        return True
+
+    def capture(
+        self,
+        stream: StreamDescription,
+        image: np.ndarray,
+        frameData: FrameData,
+        camera: Optional[CameraData] = None,
+    ) -> bool:
+        "Queue a copy of `image`, the (height, width, 4) buffer sent for `stream`, if it is due. Never blocks."
+        if not self.wants(stream.handle):
+            return False
+        with self._freeLock:
+            item = self._free.popleft() if self._free else None
+        if item is None:
+            self.dropped += 1
+            return False
+
+        source = image
+        if self.downscale > 1 and self.filter == "nearest":
+            source = image[:: self.downscale, :: self.downscale]
+        if item.buffer is None or item.buffer.shape != source.shape or item.buffer.dtype != source.dtype:
+            item.buffer = np.empty(source.shape, dtype=source.dtype)
+        np.copyto(item.buffer, source)
+
+        item.stream = stream.handle
+        item.format = stream.format.value
+        item.frame = self._frameCounts[stream.handle] - 1
+        item.metadata = {
+            "frame": item.frame,
+            "stream": stream.handle,
+            "name": (stream.name or b"").decode("utf-8", "replace"),
+            "format": RSPixelFormat._value_map.get(item.format, item.format),
+            "tTracked": frameData.tTracked,
+            "localTime": frameData.localTime,
+            "localTimeDelta": frameData.localTimeDelta,
+            "frameRate": [frameData.frameRateNumerator, frameData.frameRateDenominator],
+            "scene": frameData.scene,
+        }
+        if camera is not None:
+            item.metadata["camera"] = {field: getattr(camera, field) for field in _CAMERA_FIELDS}
+        self.captured += 1
+        self._queue.put_nowait(item)
+        return True
+
+    def sendFrame(
+        self,
+        rs: RenderStream,
+        stream: StreamDescription,
+        image: np.ndarray,
+        frameData: FrameData,
+        response: FrameResponseData,
+        senderFrameData: Optional[SenderFrameTypeData] = None,
+    ):
+        "Send `image` as a host memory frame, then capture it if due."
+        rs.sendFrame(stream.handle, SenderFrameType.HOST_MEMORY, hostMemoryFrameData(image, senderFrameData), response)
+        self.capture(stream, image, frameData, response.cameraData.contents.camera)
+
+    def close(self):
+        "Write everything queued and close the output files."
+        self._queue.put(None)
+        self._thread.join()
+        for metadataFile, rawFile in self._files.values():
+            metadataFile.close()
+            if rawFile is not None:
+                rawFile.close()
+        self._files.clear()
+
+    def _outputFiles(self, stream: int) -> Tuple:
+        files = self._files.get(stream)
+        if files is None:
+            base = os.path.join(self.directory, f"stream-{stream}")
+            rawFile = open(base + ".raw", "ab") if self.output == RAW else None
+            files = self._files[stream] = (open(base + ".jsonl", "a", encoding="utf-8"), rawFile)
+        return files
+
+    def _write(self, item: _Capture):
+        image = item.buffer
+        if self.downscale > 1 and self.filter == "box":
+            image = _boxDownscale(image, self.downscale)
+        metadataFile, rawFile = self._outputFiles(item.stream)
+        metadata = item.metadata
+        metadata["shape"] = list(image.shape)
+        metadata["dtype"] = image.dtype.str
+        if rawFile is not None:
+            metadata["offset"] = rawFile.tell()
+            rawFile.write(np.ascontiguousarray(image).data)
+        else:
+            fileName = f"stream-{item.stream}-{item.frame:06d}.png"
+            png = encodePng(_toRgba8(image, item.format))
+            with open(os.path.join(self.directory, fileName), "wb") as pngFile:
+                pngFile.write(png)
+            metadata["file"] = fileName
+        metadataFile.write(json.dumps(metadata) + "\n")
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            try:
+                self._write(item)
+                self.written += 1
+            except Exception:  # disk errors, or an image or metadata which can't be encoded: skip the frame
+                self.errors += 1
+            finally:
+                with self._freeLock:
+                    self._free.append(item)
+        for metadataFile, rawFile in self._files.values():
+            metadataFile.flush()
+            if rawFile is not None:
+                rawFile.flush()
+
+
+def readRawCapture(directory: str, stream: int) -> Iterator[Tuple[dict, np.ndarray]]:
+    "Yield (metadata, image) for each frame of a raw capture, with images memory-mapped from the .raw file."
+    base = os.path.join(directory, f"stream-{stream}")
+    with open(base + ".jsonl", encoding="utf-8") as metadataFile:
+        for line in metadataFile:
+            metadata = json.loads(line)
+            image = np.memmap(
+                base + ".raw",
+                dtype=np.dtype(metadata["dtype"]),
+                mode="r",
+                offset=metadata["offset"],
+                shape=tuple(metadata["shape"]),
+            )
+            yield metadata, image
@@ -0,0 +1,261 @@
+"""Layer compositing into host memory stream buffers. Requires numpy.
+
+Compositor blends a stack of Layers, each with a blend mode, opacity, pixel offset and straight or premultiplied
+alpha, into a stream's pooled output buffer. The output is processed in row tiles on a thread pool, with per-thread
+scratch arrays the size of one tile, so no full-frame temporaries are created.
+
+Work is skipped when layers don't change: a layer with zero opacity or entirely off the canvas is ignored, and a
+layer whose `version` (e.g. an image parameter's imageId, or a counter bumped whenever its pixels are redrawn) is
+the same as on the previous frame counts as unchanged. If every layer is unchanged the output buffer is left as it
+is; otherwise the unchanged layers at the bottom of the stack are restored from a cached composite and only the
+layers above them are blended again."""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from .buffers import BufferPool
+from .pixelformat import channelOrder, formatDtype, hasAlpha
+from .renderstream import RSPixelFormat
+
+NORMAL = "normal"
+ADD = "add"
+MULTIPLY = "multiply"
+SCREEN = "screen"
+
+_BLEND_MODES = (NORMAL, ADD, MULTIPLY, SCREEN)
+
+
+class Layer:
+    """One image in a composite.
+
+    `image` is a (height, width, 4) RGBA array, uint8 or float32 in [0, 1], placed with its top left corner at
+    `offset` (x, y) in the output, which may be negative or partly off the canvas. Set `version` to something that
+    changes whenever the image's pixels change to let the compositor skip unchanged layers; a layer without a
+    version is always redrawn."""
+
+    __slots__ = ("image", "blend", "opacity", "offset", "premultiplied", "version")
+
+    def __init__(
+        self,
+        image: np.ndarray,
+        blend: str = NORMAL,
+        opacity: float = 1.0,
+        offset: Tuple[int, int] = (0, 0),
+        premultiplied: bool = False,
+        version: Hashable = None,
+    ):
+        if blend not in _BLEND_MODES:
+            raise ValueError(f"Unknown blend mode {blend!r}")
+        if image.ndim != 3 or image.shape[2] != 4:
+            raise ValueError(f"Expected a (height, width, 4) RGBA layer, got shape {image.shape}")
+        self.image = image
+        self.blend = blend
+        self.opacity = opacity
+        self.offset = offset
+        self.premultiplied = premultiplied
+        self.version = version
+
+    def signature(self) -> Optional[tuple]:
+        if self.version is None:
+            return None
+        return (id(self.image), self.version, self.blend, self.opacity, tuple(self.offset), self.premultiplied)
+
+
+class _Scratch(threading.local):
+    """Per-thread float32 scratch: one array per name, big enough for a tile of `tileRows` rows of the widest
+    (rows, width, channels) asked for, handed out as views of the shape asked for."""
+
+    def __init__(self, tileRows: int):
+        self.tileRows = tileRows
+        self.arrays: Dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: Tuple[int, int, int]) -> np.ndarray:
+        rows, width, channels = shape
+        size = rows * width * channels
+        array = self.arrays.get(name)
+        if array is None or array.size < size:
+            array = self.arrays[name] = np.empty(max(size, self.tileRows * width * channels), dtype=np.float32)
+        return array[:size].reshape(shape)
+
+
+class _Output:
+    "Compositing state kept per output key between frames."
+
+    def __init__(self, settings: tuple, base: np.ndarray):
+        self.settings = settings  # (width, height, format, background): changing any of these starts again
+        self.signatures: Optional[List[Optional[tuple]]] = None
+        self.cachedLayers = 0  # number of bottom layers composited into `base`
+        self.base = base
+
+
+class Compositor:
+    """Composites layers into output buffers in row tiles of `tileRows` rows on `threads` threads.
+
+    Blending is done in linear premultiplied float; the output is premultiplied unless `straightOutput` is set."""
+
+    def __init__(
+        self,
+        threads: Optional[int] = None,
+        tileRows: int = 64,
+        pool: Optional[BufferPool] = None,
+        straightOutput: bool = False,
+    ):
+        self.tileRows = tileRows
+        self.pool = pool if pool is not None else BufferPool()
+        self.straightOutput = straightOutput
+        self.layersBlended = 0
+        self.layersSkipped = 0
+        self.framesSkipped = 0
+        self._threads = threads if threads is not None else min(8, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(self._threads, "renderstream-composite") if self._threads > 1 else None
+        self._scratch = _Scratch(tileRows)
+        self._outputs: Dict[Hashable, _Output] = {}
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def composite(
+        self,
+        layers: Sequence[Layer],
+        width: int,
+        height: int,
+        format: Union[RSPixelFormat, int] = RSPixelFormat.BGRA8,
+        key: Hashable = None,
+        background: Tuple[float, float, float, float] = (0.0, 0.0, 0.0, 0.0),
+    ) -> np.ndarray:
+        """Composite `layers`, bottom first, over `background` (premultiplied RGBA) into the pooled (height, width,
+        4) buffer for `key` in `format`, and return it."""
+        out = self.pool.get(("composite", key), (height, width, 4), formatDtype(format))
+        settings = (width, height, int(getattr(format, "value", format)), tuple(background))
+        state = self._outputs.get(key)
+        if state is None or state.settings != settings:
+            base = self.pool.get(("composite-base", key), (height, width, 4), np.float32)
+            state = self._outputs[key] = _Output(settings, base)
+
+        visible = [layer for layer in layers if self._visible(layer, width, height)]
+        self.layersSkipped += len(layers) - len(visible)
+        signatures = [layer.signature() for layer in visible]
+        previous = state.signatures if state.signatures is not None else []
+        unchanged = 0
+        while (
+            unchanged < len(signatures)
+            and unchanged < len(previous)
+            and signatures[unchanged] is not None
+            and signatures[unchanged] == previous[unchanged]
+        ):
+            unchanged += 1
+        if state.signatures is not None and unchanged == len(signatures) == len(previous):
+            self.framesSkipped += 1
+            self.layersSkipped += len(visible)
+            return out
+
+        restoreFrom = state.cachedLayers if 0 < state.cachedLayers <= unchanged else 0
+        self.layersSkipped += restoreFrom
+        self.layersBlended += len(visible) - restoreFrom
+        job = (visible, restoreFrom, unchanged, state.base, out, channelOrder(format), hasAlpha(format), background)
+        tiles = [(row, min(row + self.tileRows, height)) for row in range(0, height, self.tileRows)]
+        if self._executor is None or len(tiles) == 1:
+            for start, end in tiles:
+                self._compositeTile(job, start, end)
+        else:
+            futures = [self._executor.submit(self._compositeTile, job, start, end) for start, end in tiles]
+            for future in futures:
+                future.result()
+
+        state.signatures = signatures
+        state.cachedLayers = unchanged
+        return out
+
+    def _visible(self, layer: Layer, width: int, height: int) -> bool:
+        x, y = layer.offset
+        layerHeight, layerWidth = layer.image.shape[:2]
+        return layer.opacity > 0.0 and x < width and y < height and x + layerWidth > 0 and y + layerHeight > 0
+
+    def _compositeTile(self, job: tuple, start: int, end: int):
+        layers, restoreFrom, cacheLayers, base, out, order, alpha, background = job
+        width = out.shape[1]
+        accumulator = self._scratch.get("accumulator", (end - start, width, 4))
+        if restoreFrom:
+            accumulator[...] = base[start:end]
+        else:
+            accumulator[...] = background
+
+        for i in range(restoreFrom, len(layers)):
+            if i == cacheLayers and cacheLayers > restoreFrom:
+                base[start:end] = accumulator
+            self._blendLayer(layers[i], accumulator, start, end)
+        if cacheLayers == len(layers) and cacheLayers > restoreFrom:
+            base[start:end] = accumulator
+
+        self._store(accumulator, out[start:end], order, alpha)
+
+    def _blendLayer(self, layer: Layer, accumulator: np.ndarray, start: int, end: int):
+        x, y = layer.offset
+        layerHeight, layerWidth = layer.image.shape[:2]
+        width = accumulator.shape[1]
+        # intersection of the layer with this tile, in output and in layer coordinates
+        top, bottom = max(start, y), min(end, y + layerHeight)
+        left, right = max(0, x), min(width, x + layerWidth)
+        if top >= bottom or left >= right:
+            return
+        source = layer.image[top - y : bottom - y, left - x : right - x]
+        dst = accumulator[top - start : bottom - start, left:right]
+
+        shape = source.shape
+        src = self._scratch.get("source", shape)
+        if source.dtype == np.uint8:
+            np.multiply(source, 1.0 / 255.0, out=src, casting="unsafe")
+        else:
+            np.copyto(src, source)
+        if not layer.premultiplied:
+            src[..., :3] *= src[..., 3:4]
+        if layer.opacity != 1.0:
+            src *= layer.opacity
+        srcRgb, srcAlpha = src[..., :3], src[..., 3:4]
+        dstRgb, dstAlpha = dst[..., :3], dst[..., 3:4]
+
+        inverseSrcAlpha = self._scratch.get("inverseSrcAlpha", shape[:2] + (1,))
+        np.subtract(1.0, srcAlpha, out=inverseSrcAlpha)
+        if layer.blend == NORMAL:
+            dst *= inverseSrcAlpha
+            dst += src
+            return
+
+        if layer.blend == ADD:
+            dstRgb += srcRgb
+        elif layer.blend == SCREEN:
+            product = self._scratch.get("product", shape[:2] + (3,))
+            np.multiply(srcRgb, dstRgb, out=product)
+            dstRgb += srcRgb
+            dstRgb -= product
+        else:  # MULTIPLY: s * d + s * (1 - da) + d * (1 - sa)
+            product = self._scratch.get("product", shape[:2] + (3,))
+            np.subtract(1.0, dstAlpha, out=product)
+            product *= srcRgb
+            factor = self._scratch.get("factor", shape[:2] + (3,))
+            np.add(inverseSrcAlpha, srcRgb, out=factor)
+            dstRgb *= factor
+            dstRgb += product
+        dstAlpha *= inverseSrcAlpha
+        dstAlpha += srcAlpha
+
+    def _store(self, accumulator: np.ndarray, out: np.ndarray, order, alpha: bool):
+        np.clip(accumulator, 0.0, 1.0, out=accumulator)
+        if self.straightOutput:
+            a = accumulator[..., 3:4]
+            np.divide(accumulator[..., :3], a, out=accumulator[..., :3], where=a > 0.0)
+        integer = out.dtype == np.uint8
+        if integer:
+            accumulator *= 255.0
+            accumulator += 0.5
+        for iOut, iRgba in enumerate(order[:3]):
+            np.copyto(out[..., iOut], accumulator[..., iRgba], casting="unsafe")
+        if alpha:
+            np.copyto(out[..., 3], accumulator[..., 3], casting="unsafe")
+        else:
+            out[..., 3] = 255 if integer else 1.0
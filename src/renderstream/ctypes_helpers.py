@@ -26,21 +26,31 @@ class AnnotatedUnion(Union, metaclass=AnnotatedUnionType):
     pass
 
 
+def _isMemberName(key):
+    # names like "_8" are members; other underscored names (_pack_, _members_...) are ctypes/Python internals
+    return not key.startswith("_") or key[1:2].isdigit()
+
+
 class EnumerationType(type(c_uint)):
     def __new__(metacls, name, bases, dict):
         _members_ = {}
         for key, value in dict.items():
-            if not key.startswith("_") and isinstance(value, int):
+            if _isMemberName(key) and isinstance(value, int):
                 _members_[key] = value
         dict["_members_"] = _members_
+        # _value_map and _instances_ are only written here, while the class is created, so looking members up is
+        # safe from any thread
         dict["_value_map"] = {}
+        dict["_instances_"] = {}
         cls = type(c_uint).__new__(metacls, name, bases, dict)
 
         # Now the enum class is created, we can override the int
         # values with the enum instances instead.
         for key, value in dict['_members_'].items():
             cls._value_map[value] = key
-            setattr(cls, key, cls(value))
+            instance = cls(value)
+            cls._instances_.setdefault(value, instance)
+            setattr(cls, key, instance)
         return cls
 
     def __contains__(self, value):
@@ -51,21 +61,27 @@ class EnumerationType(type(c_uint)):
 
 
 class Enumeration(c_uint, metaclass=EnumerationType):
-    def __init__(self, value):
+    def __init__(self, value=0):  # ctypes constructs arguments of callbacks without a value
         c_uint.__init__(self, value)
 
+    @classmethod
+    def fromValue(cls, value):
+        "The interned member for an integer value, or a new instance if the value isn't a member."
+        instance = cls._instances_.get(value)
+        return instance if instance is not None else cls(value)
+
     @classmethod
     def from_param(cls, param):
+        if type(param) is cls:
+            return param
         if isinstance(param, Enumeration):
-            if param.__class__ != cls:
-                raise ValueError("Cannot mix enumeration members")
-            else:
-                return param
-        else:
-            return cls(param)
+            raise ValueError("Cannot mix enumeration members")
+        return cls.fromValue(param)
 
     def __eq__(self, other):
-        return self.__class__ == other.__class__ and self.value == other.value
+        if self is other:
+            return True
+        return type(self) is type(other) and self.value == other.value
 
     def __repr__(self):
-        return f"<{self.__class__.__name__} value {self.__class__._value_map[self.value]} ({self.value})>"
+        return f"<{self.__class__.__name__} value {self.__class__._value_map.get(self.value, '?')} ({self.value})>"
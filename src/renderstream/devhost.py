@@ -0,0 +1,221 @@
+"""Development host which reloads a workload's render code in place, without restarting.
+
+Restarting a workload to try a change repeats loading the DLL, rs_initialise, the schema, GPU initialisation and
+buffer allocation. DevHost owns all of those instead and keeps them alive, while the render code lives in a module
+that is watched and reloaded between frames whenever its file (or that of another watched module) changes:
+
+    python -m renderstream.devhost my_workload            # under d3
+    python -m renderstream.devhost my_workload --simulate  # against a SimulatedController
+
+The module provides:
+
+    def frame(host, frameData, scene, parameters):  # required: render and send this frame's streams
+        for i in range(host.streams.nStreams):
+            ...
+            host.rs.sendFrame(...)
+
+    def schema(rs) -> Schema:  # optional, called once at startup; changing the schema needs a restart
+    def saveState(host): ...  # optional, called on the old module before a reload; returns state to hand over
+    def restoreState(host, state): ...  # optional, called on the new module after a reload
+    def streamsChanged(host): ...  # optional, called after host.streams is refreshed
+
+`host.state` is a dict kept across reloads for anything else worth keeping, and `host.pool` a BufferPool (when numpy
+is available). If a reload or a frame fails, the traceback is printed and frames are skipped until the file changes
+again, so a typo doesn't lose the session."""
+
+import argparse
+import importlib
+import os
+import sys
+import time
+import traceback
+from types import ModuleType
+from typing import Dict, List, Optional, Sequence, Union
+
+from .renderstream import RenderStream, RenderStreamError, RS_ERROR, Schema, StreamDescriptions
+
+try:
+    from .buffers import BufferPool
+except ImportError:  # numpy isn't installed
+    BufferPool = None
+
+
+def _moduleFile(module: ModuleType) -> str:
+    path = getattr(module, "__file__", None)
+    if path is None:
+        raise ValueError(f"Module {module.__name__} has no source file to watch")
+    return path
+
+
+class DevHost:
+    """Runs `module`'s frame function on `rs`, reloading it (and then any modules in `watch`, reloaded first, in the
+    order given) when their files change. Files are checked between frames, at most every `pollInterval` seconds."""
+
+    def __init__(
+        self,
+        module: Union[str, ModuleType],
+        rs: RenderStream,
+        watch: Sequence[Union[str, ModuleType]] = (),
+        timeoutMs: int = 5000,
+        pollInterval: float = 0.0,
+    ):
+        self.module = importlib.import_module(module) if isinstance(module, str) else module
+        self.watch = [importlib.import_module(m) if isinstance(m, str) else m for m in watch]
+        self.rs = rs
+        self.timeoutMs = timeoutMs
+        self.pollInterval = pollInterval
+        self.state: Dict = {}
+        self.pool = BufferPool() if BufferPool is not None else None
+        self.streams: Optional[StreamDescriptions] = None
+        self.schema: Optional[Schema] = None
+        self.running = True
+        self.broken = False  # the module failed to reload or to render; wait for the next change
+        self.reloads = 0
+        self.lastReloadSeconds = 0.0  # time spent reloading
+        self.lastEditToFrame: Optional[float] = None  # seconds from the file being saved to a frame rendered by it
+        self._editTime: Optional[float] = None
+        self._lastPoll = 0.0
+        self._badScene: Optional[int] = None  # out of range scene index already reported
+        self._mtimes = {m.__name__: os.stat(_moduleFile(m)).st_mtime for m in self._modules()}
+
+        schema = getattr(self.module, "schema", None)
+        if schema is not None:
+            self.schema = schema(rs)
+            rs.setSchema(self.schema)
+
+    def _modules(self) -> List[ModuleType]:
+        return self.watch + [self.module]
+
+    def changed(self) -> Optional[float]:
+        "The latest modification time of a watched file if any has changed since it was loaded, otherwise None."
+        latest = None
+        for module in self._modules():
+            try:
+                mtime = os.stat(_moduleFile(module)).st_mtime
+            except OSError:
+                continue  # mid-save by an editor which replaces the file
+            if mtime != self._mtimes[module.__name__]:
+                latest = mtime if latest is None else max(latest, mtime)
+        return latest
+
+    def reload(self) -> bool:
+        "Reload the watched modules and the render module, handing state over. Returns whether it succeeded."
+        start = time.perf_counter()
+        for module in self._modules():
+            try:
+                self._mtimes[module.__name__] = os.stat(_moduleFile(module)).st_mtime
+            except OSError:
+                pass
+        saveState = getattr(self.module, "saveState", None)
+        state = None
+        try:
+            if saveState is not None and not self.broken:
+                state = saveState(self)
+            for module in self.watch:
+                importlib.reload(module)
+            self.module = importlib.reload(self.module)
+            restoreState = getattr(self.module, "restoreState", None)
+            if restoreState is not None and state is not None:
+                restoreState(self, state)
+        except Exception:
+            traceback.print_exc()
+            self.broken = True
+            return False
+        self.broken = False
+        self.reloads += 1
+        self.lastReloadSeconds = time.perf_counter() - start
+        print(f"Reloaded {self.module.__name__} in {self.lastReloadSeconds * 1000:.1f}ms")
+        return True
+
+    def poll(self):
+        "Reload if a watched file has changed. Called between frames by step()."
+        now = time.perf_counter()
+        if now - self._lastPoll < self.pollInterval:
+            return
+        self._lastPoll = now
+        edited = self.changed()
+        if edited is not None and self.reload():
+            self._editTime = edited
+
+    def _refreshStreams(self):
+        self.streams = self.rs.getStreams()
+        streamsChanged = getattr(self.module, "streamsChanged", None)
+        if streamsChanged is not None and not self.broken:
+            streamsChanged(self)
+
+    def step(self):
+        "One iteration of the frame loop."
+        self.poll()
+        try:
+            frameData = self.rs.awaitFrameData(self.timeoutMs)
+        except RenderStreamError as e:
+            if e.error == RS_ERROR.STREAMS_CHANGED:
+                self._refreshStreams()
+                return
+            elif e.error == RS_ERROR.TIMEOUT:
+                return
+            elif e.error == RS_ERROR.QUIT:
+                self.running = False
+                return
+            else:
+                raise
+        if self.streams is None:
+            self._refreshStreams()
+        if self.broken:
+            return
+
+        scene = None
+        parameters = {}
+        if self.schema is not None:
+            nScenes = self.schema.scenes.nScenes
+            if frameData.scene >= nScenes:
+                if frameData.scene != self._badScene:
+                    self._badScene = frameData.scene
+                    print(
+                        f"Skipping frames for scene {frameData.scene}: the schema has {nScenes} scenes "
+                        "(restart to load a changed schema)",
+                        file=sys.stderr,
+                    )
+                return
+            self._badScene = None
+            scene = self.schema.scenes.scenes[frameData.scene]
+            parameters = self.rs.getFrameParameters(scene)
+        try:
+            self.module.frame(self, frameData, scene, parameters)
+        except RenderStreamError:
+            raise  # a problem with the session, not the render code
+        except Exception:
+            traceback.print_exc()
+            self.broken = True
+            return
+        if self._editTime is not None:
+            self.lastEditToFrame = time.time() - self._editTime
+            self._editTime = None
+            print(f"Edit to frame: {self.lastEditToFrame * 1000:.1f}ms")
+
+    def run(self):
+        while self.running:
+            self.step()
+
+
+def main(args: Optional[Sequence[str]] = None):
+    parser = argparse.ArgumentParser(description="Run a workload module, reloading it when it changes.")
+    parser.add_argument("module", help="the render module, importable from the current directory")
+    parser.add_argument("--watch", nargs="*", default=[], help="other modules to reload, in dependency order")
+    parser.add_argument("--simulate", action="store_true", help="run against a SimulatedController instead of d3")
+    options = parser.parse_args(args)
+
+    sys.path.insert(0, os.getcwd())
+    if options.simulate:
+        from .simulator import SimulatedController, SimulatedStream
+
+        controller = SimulatedController([SimulatedStream("simulated")], realtime=True)
+        rs = RenderStream(dll=controller.library)
+    else:
+        rs = RenderStream()
+    rs.initialiseGpGpuWithoutInterop()
+    DevHost(options.module, rs, options.watch).run()
+
+
+if __name__ == "__main__":
+    main()
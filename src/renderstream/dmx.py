@@ -0,0 +1,299 @@
+"""Local DMX input for dmxOffset/dmxType patched parameters, over sACN (E1.31) or Art-Net. Requires numpy.
+
+For testing without d3, or taking direct control from a lighting console, DmxInput receives DMX universes on a
+background thread and turns them into parameter values, which override those from the controller:
+
+    dmx = DmxInput(universe=1, startChannel=1).start()
+    ...
+    values = dmx.getFrameParameters(rs, scene)  # rs.getFrameParameters(scene), with DMX overrides merged in
+
+Each number parameter is patched at startChannel + dmxOffset; a negative dmxOffset places it on the channel after
+the previous patched parameter. An _8 parameter reads one channel and a _16_BE parameter two (coarse then fine);
+DEFAULT parameters use `defaultType`. Channels can run on into the following universes, up to `nUniverses`. Values
+are scaled from the full DMX range to the parameter's NumericalDefaults min and max, for all parameters at once with
+a vectorized gather. A parameter is only overridden while its universe is live: until the first packet arrives, and
+after none has arrived for `timeout` seconds, the controller's value is used. Packets are applied as they arrive
+(no merging or priority handling between sources).
+
+artNetPacket() and sacnPacket() build packets, e.g. to test over loopback UDP."""
+
+import socket
+import struct
+import threading
+import time
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from .renderstream import (
+    RemoteParameterDmxType,
+    RemoteParameterFlags,
+    RemoteParameters,
+    RemoteParameterType,
+    RenderStream,
+)
+
+SACN = "sacn"
+ARTNET = "artnet"
+
+SACN_PORT = 5568
+ARTNET_PORT = 6454
+
+UNIVERSE_SIZE = 512
+
+_ARTNET_ID = b"Art-Net\x00"
+_ARTNET_OPDMX = 0x5000
+_ARTNET_HEADER = struct.Struct("<8sH")  # id, opcode (little endian)
+
+_SACN_ID = b"ASC-E1.17\x00\x00\x00"
+_SACN_VECTOR_ROOT_DATA = 0x00000004
+_SACN_VECTOR_FRAMING_DATA = 0x00000002
+_SACN_VECTOR_DMP_SET_PROPERTY = 0x02
+_SACN_HEADER = 126  # bytes before the first slot of DMX data
+_SACN_OPTION_TERMINATED = 0x40
+
+
+def artNetPacket(universe: int, data: bytes, sequence: int = 0) -> bytes:
+    "An ArtDmx packet for the 15 bit port address `universe`."
+    if len(data) % 2:
+        data = bytes(data) + b"\x00"  # ArtDmx lengths are even
+    header = _ARTNET_HEADER.pack(_ARTNET_ID, _ARTNET_OPDMX)
+    # the port address is sent low byte (SubUni) first, unlike the other fields
+    body = struct.pack(">HBB", 14, sequence & 0xFF, 0) + struct.pack("<H", universe) + struct.pack(">H", len(data))
+    return header + body + bytes(data)
+
+
+def parseArtNet(packet: bytes) -> Optional[Tuple[int, memoryview]]:
+    "The universe and DMX data of an ArtDmx packet, or None for any other packet."
+    if len(packet) < 18 or packet[:8] != _ARTNET_ID:
+        return None
+    _, opcode = _ARTNET_HEADER.unpack_from(packet)
+    if opcode != _ARTNET_OPDMX:
+        return None
+    universe = packet[14] | (packet[15] << 8)
+    length = (packet[16] << 8) | packet[17]
+    return universe, memoryview(packet)[18 : 18 + min(length, UNIVERSE_SIZE)]
+
+
+def sacnPacket(
+    universe: int,
+    data: bytes,
+    sequence: int = 0,
+    priority: int = 100,
+    sourceName: str = "renderstream",
+    cid: bytes = bytes(16),
+) -> bytes:
+    "An E1.31 data packet for `universe` (1-63999), with start code 0."
+    count = len(data) + 1  # the start code is property value 0
+    dmpLength = 10 + count
+    framingLength = 77 + dmpLength
+    rootLength = 22 + framingLength
+    name = bytes(sourceName, encoding="utf-8")[:63].ljust(64, b"\x00")
+    return b"".join(
+        (
+            struct.pack(">HH12s", 0x0010, 0x0000, _SACN_ID),
+            struct.pack(">HI16s", 0x7000 | rootLength, _SACN_VECTOR_ROOT_DATA, cid),
+            struct.pack(
+                ">HI64sBHBBH",
+                0x7000 | framingLength,
+                _SACN_VECTOR_FRAMING_DATA,
+                name,
+                priority,
+                0,  # synchronization address
+                sequence & 0xFF,
+                0,  # options
+                universe,
+            ),
+            struct.pack(">HBBHHHB", 0x7000 | dmpLength, _SACN_VECTOR_DMP_SET_PROPERTY, 0xA1, 0, 1, count, 0),
+            bytes(data),
+        )
+    )
+
+
+def parseSacn(packet: bytes) -> Optional[Tuple[int, memoryview]]:
+    "The universe and DMX data of an E1.31 data packet with start code 0, or None for any other packet."
+    if len(packet) < _SACN_HEADER or packet[4:16] != _SACN_ID:
+        return None
+    rootVector, = struct.unpack_from(">I", packet, 18)
+    framingVector, = struct.unpack_from(">I", packet, 40)
+    if rootVector != _SACN_VECTOR_ROOT_DATA or framingVector != _SACN_VECTOR_FRAMING_DATA:
+        return None
+    if packet[112] & _SACN_OPTION_TERMINATED or packet[125] != 0:
+        return None  # stream terminated, or not dimmer data
+    universe, = struct.unpack_from(">H", packet, 113)
+    count, = struct.unpack_from(">H", packet, 123)
+    return universe, memoryview(packet)[_SACN_HEADER : _SACN_HEADER + min(count - 1, UNIVERSE_SIZE)]
+
+
+class _DmxMapping:
+    "The channels and scaling of one scene's patched parameters, as arrays for a vectorized gather."
+
+    def __init__(self, scene: RemoteParameters, startChannel: int, defaultType: RemoteParameterDmxType, size: int):
+        keys: List[str] = []
+        coarse: List[int] = []
+        fine: List[int] = []
+        wide: List[bool] = []
+        minimums: List[float] = []
+        maximums: List[float] = []
+        channel = startChannel - 1  # zero-based across the consecutive universes
+        for i in range(scene.nParameters):
+            param = scene.parameters[i]
+            if param.flags & RemoteParameterFlags.READ_ONLY.value or param.type != RemoteParameterType.NUMBER:
+                continue
+            dmxType = param.dmxType if param.dmxType != RemoteParameterDmxType.DEFAULT else defaultType
+            sixteenBit = dmxType == RemoteParameterDmxType._16_BE
+            if param.dmxOffset >= 0:
+                channel = startChannel - 1 + param.dmxOffset
+            last = channel + (1 if sixteenBit else 0)
+            if last >= size:
+                break  # patched beyond the universes received
+            keys.append(str(param.key, encoding="utf-8"))
+            coarse.append(channel)
+            fine.append(last)
+            wide.append(sixteenBit)
+            minimums.append(param.defaults.number.min)
+            maximums.append(param.defaults.number.max)
+            channel = last + 1
+
+        self.keys = keys
+        self.coarse = np.array(coarse, dtype=np.intp)
+        self.fine = np.array(fine, dtype=np.intp)
+        self.universes = self.coarse // UNIVERSE_SIZE
+        wide = np.array(wide, dtype=bool)
+        scale = np.array(maximums, dtype=np.float64) - np.array(minimums, dtype=np.float64)
+        # value = min + (coarse * coarseWeight + fine * fineWeight) * (max - min)
+        self.coarseWeight = np.where(wide, 256.0 / 65535.0, 1.0 / 255.0) * scale
+        self.fineWeight = np.where(wide, 1.0 / 65535.0, 0.0) * scale
+        self.minimums = np.array(minimums, dtype=np.float64)
+        self.values = np.empty(len(keys), dtype=np.float64)
+        self._fine = np.empty(len(keys), dtype=np.float64)
+        self._gathered = np.empty(len(keys), dtype=np.uint8)
+
+    def gather(self, channels: np.ndarray) -> np.ndarray:
+        np.take(channels, self.coarse, out=self._gathered)
+        np.multiply(self._gathered, self.coarseWeight, out=self.values)
+        np.take(channels, self.fine, out=self._gathered)
+        np.multiply(self._gathered, self.fineWeight, out=self._fine)
+        self.values += self._fine
+        self.values += self.minimums
+        return self.values
+
+
+class DmxInput:
+    """Receives `nUniverses` consecutive universes starting at `universe` over `protocol` (SACN or ARTNET).
+
+    Listens on `host` and `port` (the protocol's port by default; 0 picks a free one, see `port` after start()). For
+    sACN on all interfaces the universes' multicast groups are joined as well."""
+
+    def __init__(
+        self,
+        universe: int = 1,
+        nUniverses: int = 1,
+        startChannel: int = 1,
+        protocol: str = SACN,
+        host: str = "0.0.0.0",
+        port: Optional[int] = None,
+        timeout: float = 2.5,
+        defaultType: RemoteParameterDmxType = RemoteParameterDmxType._8,
+    ):
+        if protocol not in (SACN, ARTNET):
+            raise ValueError(f"Unknown DMX protocol {protocol!r}")
+        self.universe = universe
+        self.nUniverses = nUniverses
+        self.startChannel = startChannel
+        self.protocol = protocol
+        self.host = host
+        self.port = port if port is not None else (SACN_PORT if protocol == SACN else ARTNET_PORT)
+        self.timeout = timeout
+        self.defaultType = defaultType
+        self.packets = 0
+        self.channels = np.zeros(nUniverses * UNIVERSE_SIZE, dtype=np.uint8)
+        self.lastReceived = np.full(nUniverses, -np.inf)  # time.monotonic() of each universe's latest packet
+        self._parse = parseSacn if protocol == SACN else parseArtNet
+        self._lock = threading.Lock()
+        self._mappings: Dict[int, _DmxMapping] = {}
+        self._socket: Optional[socket.socket] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self._socket.bind((self.host, self.port))
+        self.port = self._socket.getsockname()[1]
+        if self.protocol == SACN and self.host in ("", "0.0.0.0"):
+            for universe in range(self.universe, self.universe + self.nUniverses):
+                group = socket.inet_aton(f"239.255.{universe >> 8}.{universe & 0xFF}")
+                try:
+                    self._socket.setsockopt(
+                        socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, group + socket.inet_aton("0.0.0.0")
+                    )
+                except OSError:
+                    pass  # no multicast route, e.g. offline; unicast sources still work
+        self._socket.settimeout(0.2)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="renderstream-dmx", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+    def _run(self):
+        buffer = bytearray(1024)
+        while not self._stop.is_set():
+            try:
+                nBytes = self._socket.recv_into(buffer)
+            except socket.timeout:
+                continue
+            except OSError:
+                break  # socket closed
+            self.receive(memoryview(buffer)[:nBytes])
+
+    def receive(self, packet: bytes) -> bool:
+        "Apply one packet, returning whether it carried one of our universes."
+        parsed = self._parse(packet)
+        if parsed is None:
+            return False
+        universe, data = parsed
+        index = universe - self.universe
+        if not 0 <= index < self.nUniverses:
+            return False
+        start = index * UNIVERSE_SIZE
+        with self._lock:
+            self.channels[start : start + len(data)] = np.frombuffer(data, dtype=np.uint8)
+            self.lastReceived[index] = time.monotonic()
+            self.packets += 1
+        return True
+
+    def _mapping(self, scene: RemoteParameters) -> _DmxMapping:
+        mapping = self._mappings.get(scene.hash)
+        if mapping is None:
+            mapping = _DmxMapping(scene, self.startChannel, self.defaultType, len(self.channels))
+            self._mappings[scene.hash] = mapping
+        return mapping
+
+    def overrides(self, scene: RemoteParameters) -> Dict[str, float]:
+        "Values of the scene's patched parameters whose universes are live."
+        mapping = self._mapping(scene)
+        with self._lock:
+            values = mapping.gather(self.channels)
+            live = time.monotonic() - self.lastReceived < self.timeout
+        if live.all():
+            return dict(zip(mapping.keys, values.tolist()))
+        values = values.tolist()
+        return {key: values[i] for i, key in enumerate(mapping.keys) if live[mapping.universes[i]]}
+
+    def apply(self, values: Dict, scene: RemoteParameters) -> Dict:
+        "Merge the overrides into `values` from rs.getFrameParameters(scene), and return it."
+        values.update(self.overrides(scene))
+        return values
+
+    def getFrameParameters(self, rs: RenderStream, scene: RemoteParameters) -> Mapping:
+        return self.apply(rs.getFrameParameters(scene), scene)
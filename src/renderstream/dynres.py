@@ -0,0 +1,219 @@
+"""Dynamic resolution scaling for CPU-rendered host memory streams. Requires numpy.
+
+When a stream can't be rendered at its native StreamDescription size within the frame budget, ResolutionScaler
+renders it at a reduced internal resolution, chosen from the stream's recent render cost, and upscales the result
+into a pooled native-size buffer to send:
+
+    scaler = ResolutionScaler()
+    ...
+    scaler.beginFrame(frameData, streams.nStreams)
+    for stream in streams:
+        image = scaler.render(stream, lambda width, height, scale: draw(stream, width, height))
+        rs.sendFrame(stream.handle, SenderFrameType.HOST_MEMORY, hostMemoryFrameData(image), response)
+
+Upscaling is separable and uses index and weight maps precomputed per (source, destination) size, with all
+intermediate arrays pooled, so a steady-state frame doesn't allocate."""
+
+import time
+from typing import Callable, Dict, Hashable, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .buffers import BufferPool
+from .pixelformat import formatDtype
+from .renderstream import FrameData, StreamDescription, StreamHandle
+
+NEAREST = "nearest"
+BILINEAR = "bilinear"
+
+
+def _sampleMap(source: int, destination: int, filter: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    "Source indices (i0, i1) and weight of i1 for each destination pixel centre."
+    centres = (np.arange(destination, dtype=np.float64) + 0.5) * (source / destination) - 0.5
+    if filter == NEAREST:
+        i0 = np.clip(np.floor(centres + 0.5), 0, source - 1).astype(np.intp)
+        return i0, i0, np.zeros(destination, dtype=np.float32)
+    centres = np.clip(centres, 0.0, source - 1)
+    i0 = np.floor(centres).astype(np.intp)
+    i1 = np.minimum(i0 + 1, source - 1)
+    return i0, i1, (centres - i0).astype(np.float32)
+
+
+class Upscaler:
+    "Nearest or bilinear resizing of (height, width, channels) images into pooled buffers."
+
+    def __init__(self, filter: str = BILINEAR, pool: Optional[BufferPool] = None):
+        if filter not in (NEAREST, BILINEAR):
+            raise ValueError(f"Unknown upscale filter {filter!r}")
+        self.filter = filter
+        self.pool = pool if pool is not None else BufferPool()
+        self._maps: Dict[Tuple[int, int, int, int], tuple] = {}
+
+    def _sampleMaps(self, srcHeight: int, srcWidth: int, dstHeight: int, dstWidth: int) -> tuple:
+        key = (srcHeight, srcWidth, dstHeight, dstWidth)
+        maps = self._maps.get(key)
+        if maps is None:
+            rows0, rows1, rowWeights = _sampleMap(srcHeight, dstHeight, self.filter)
+            columns0, columns1, columnWeights = _sampleMap(srcWidth, dstWidth, self.filter)
+            # weights shaped to broadcast over (rows, columns, channels)
+            maps = (rows0, rows1, rowWeights[:, None, None], columns0, columns1, columnWeights[None, :, None])
+            self._maps[key] = maps
+        return maps
+
+    def upscale(self, src: np.ndarray, height: int, width: int, out: np.ndarray, key: Hashable = None) -> np.ndarray:
+        "Resize `src` to (height, width) into `out`. `key` identifies the pooled intermediates (e.g. the stream)."
+        srcHeight, srcWidth, channels = src.shape
+        maps = self._sampleMaps(srcHeight, srcWidth, height, width)
+        rows0, rows1, rowWeights, columns0, columns1, columnWeights = maps
+        pool = self.pool
+        if self.filter == NEAREST:
+            tall = pool.get(("upscale-rows", key), (height, srcWidth, channels), src.dtype)
+            np.take(src, rows0, axis=0, out=tall)
+            np.take(tall, columns0, axis=1, out=out)
+            return out
+
+        source = src
+        if src.dtype != np.float32:
+            source = pool.get(("upscale-source", key), src.shape, np.float32)
+            np.copyto(source, src)
+        top = pool.get(("upscale-top", key), (height, srcWidth, channels), np.float32)
+        bottom = pool.get(("upscale-bottom", key), (height, srcWidth, channels), np.float32)
+        np.take(source, rows0, axis=0, out=top)
+        np.take(source, rows1, axis=0, out=bottom)
+        bottom -= top
+        bottom *= rowWeights
+        top += bottom
+
+        left = pool.get(("upscale-left", key), (height, width, channels), np.float32)
+        right = pool.get(("upscale-right", key), (height, width, channels), np.float32)
+        np.take(top, columns0, axis=1, out=left)
+        np.take(top, columns1, axis=1, out=right)
+        right -= left
+        right *= columnWeights
+        left += right
+        if np.issubdtype(out.dtype, np.integer):
+            left += 0.5  # round rather than truncate
+        np.copyto(out, left, casting="unsafe")
+        return out
+
+
+class _StreamScale:
+    __slots__ = ("index", "cost", "over", "under")
+
+    def __init__(self, index: int):
+        self.index = index
+        self.cost = 0.0  # moving average render time at the current scale, seconds
+        self.over = 0
+        self.under = 0
+
+
+class ResolutionScaler:
+    """Chooses each stream's internal render scale from its render cost against its share of the frame budget.
+
+    A stream drops to the largest of `scales` predicted to fit (cost assumed proportional to pixel count) once its
+    average cost has been over budget for `downshiftAfter` frames, and moves back up a step after `upshiftAfter`
+    frames in which the larger scale is predicted to fit within `headroom` of the budget. The per-stream budget is
+    `budgetFraction` of the frame interval divided between the streams rendered each frame."""
+
+    def __init__(
+        self,
+        scales: Sequence[float] = (1.0, 0.85, 0.7, 0.5),
+        budgetFraction: float = 0.8,
+        downshiftAfter: int = 3,
+        upshiftAfter: int = 60,
+        headroom: float = 0.75,
+        smoothing: float = 0.2,
+        filter: str = BILINEAR,
+        pool: Optional[BufferPool] = None,
+    ):
+        self.scales = sorted(scales, reverse=True)
+        self.budgetFraction = budgetFraction
+        self.downshiftAfter = downshiftAfter
+        self.upshiftAfter = upshiftAfter
+        self.headroom = headroom
+        self.smoothing = smoothing
+        self.pool = pool if pool is not None else BufferPool()
+        self.upscaler = Upscaler(filter, self.pool)
+        self.budget = 1.0 / 60.0 * budgetFraction
+        self.scaleChanges = 0
+        self._streams: Dict[StreamHandle, _StreamScale] = {}
+
+    def beginFrame(self, frameData: FrameData, nStreams: int = 1):
+        "Set the per-stream budget for this frame."
+        interval = 1.0 / 60.0
+        if frameData.frameRateNumerator and frameData.frameRateDenominator:
+            interval = frameData.frameRateDenominator / frameData.frameRateNumerator
+        self.budget = interval * self.budgetFraction / max(nStreams, 1)
+
+    def _state(self, stream: StreamHandle) -> _StreamScale:
+        state = self._streams.get(stream)
+        if state is None:
+            state = self._streams[stream] = _StreamScale(0)
+        return state
+
+    def scale(self, stream: StreamHandle) -> float:
+        return self.scales[self._state(stream).index]
+
+    def renderSize(self, stream: StreamDescription) -> Tuple[int, int]:
+        "The (width, height) to render the stream at this frame."
+        scale = self.scale(stream.handle)
+        return max(1, round(stream.width * scale)), max(1, round(stream.height * scale))
+
+    def record(self, stream: StreamHandle, seconds: float):
+        "Add a render time at the stream's current scale, and change scale if warranted."
+        state = self._state(stream)
+        state.cost = seconds if state.cost == 0.0 else state.cost + self.smoothing * (seconds - state.cost)
+        current = self.scales[state.index]
+
+        if state.cost > self.budget:
+            state.under = 0
+            state.over += 1
+            if state.over >= self.downshiftAfter and state.index + 1 < len(self.scales):
+                index = state.index + 1
+                while index + 1 < len(self.scales) and state.cost * (self.scales[index] / current) ** 2 > self.budget:
+                    index += 1
+                self._setScale(state, index, current)
+            return
+
+        state.over = 0
+        if state.index == 0:
+            return
+        larger = self.scales[state.index - 1]
+        if state.cost * (larger / current) ** 2 <= self.budget * self.headroom:
+            state.under += 1
+            if state.under >= self.upshiftAfter:
+                self._setScale(state, state.index - 1, current)
+        else:
+            state.under = 0
+
+    def _setScale(self, state: _StreamScale, index: int, current: float):
+        state.cost *= (self.scales[index] / current) ** 2  # predicted cost at the new scale
+        state.index = index
+        state.over = 0
+        state.under = 0
+        self.scaleChanges += 1
+
+    def render(self, stream: StreamDescription, render: Callable[[int, int, float], np.ndarray]) -> np.ndarray:
+        """Render the stream at its current scale and return a native-size image.
+
+        `render(width, height, scale)` returns a (height, width, 4) image in the stream's pixel format; at scale 1
+        it is returned as is, otherwise it is upscaled into a pooled buffer."""
+        width, height = self.renderSize(stream)
+        scale = self.scale(stream.handle)
+        start = time.perf_counter()
+        image = render(width, height, scale)
+        self.record(stream.handle, time.perf_counter() - start)
+        if image.shape[0] == stream.height and image.shape[1] == stream.width:
+            return image
+        out = self.pool.get(("dynres", stream.handle), (stream.height, stream.width, 4), formatDtype(stream.format))
+        return self.upscaler.upscale(image, stream.height, stream.width, out, stream.handle)
+
+    def reset(self):
+        "Return every stream to full resolution, e.g. after STREAMS_CHANGED."
+        self._streams.clear()
+
+    def stats(self) -> Dict[StreamHandle, Dict[str, float]]:
+        return {
+            handle: {"scale": self.scales[state.index], "cost": state.cost, "budget": self.budget}
+            for handle, state in self._streams.items()
+        }
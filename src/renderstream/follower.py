@@ -0,0 +1,221 @@
+"""Distribution of engine frame timing from a leader node to follower nodes.
+
+The leader calls awaitFrameData as normal and publishes each FrameData it receives over UDP (multicast or unicast).
+Follower nodes call setFollower(True) and use FrameFollower.awaitFrameData in place of RenderStream.awaitFrameData,
+which calls beginFollowerFrame with the distributed tTracked value."""
+
+import ctypes
+import random
+import socket
+import struct
+import time
+from array import array
+from typing import Optional, Sequence, Tuple
+
+from .ctypes_helpers import AnnotatedStructure
+from .renderstream import FrameData, RenderStream, RenderStreamError, RS_ERROR
+
+FRAME_PACKET_MAGIC = 0x44465352  # "RSFD"
+FRAME_PACKET_VERSION = 1
+
+Address = Tuple[str, int]
+
+
+class FramePacket(AnnotatedStructure):
+    "Wire format of a distributed frame, sent in native byte order."
+    _pack_ = 4
+    magic: ctypes.c_uint32
+    version: ctypes.c_uint16
+    flags: ctypes.c_uint16
+    session: ctypes.c_uint32
+    scene: ctypes.c_uint32
+    sequence: ctypes.c_uint64
+    tTracked: ctypes.c_double
+    localTime: ctypes.c_double
+    localTimeDelta: ctypes.c_double
+    sentTime: ctypes.c_double
+    frameRateNumerator: ctypes.c_uint32
+    frameRateDenominator: ctypes.c_uint32
+
+
+def _isMulticast(host: str) -> bool:
+    try:
+        return 224 <= socket.inet_aton(host)[0] <= 239
+    except OSError:
+        return False
+
+
+class FrameLeader:
+    """Publishes FrameData to followers. Call publish() straight after awaitFrameData returns.
+
+    `addresses` may contain a single multicast group or any number of unicast follower addresses."""
+
+    def __init__(self, addresses: Sequence[Address], ttl: int = 1, interface: Optional[str] = None):
+        self.addresses = [(host, port) for host, port in addresses]
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        if any(_isMulticast(host) for host, _ in self.addresses):
+            self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, ttl)
+            self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+            if interface:
+                self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, socket.inet_aton(interface))
+
+        self._buffer = bytearray(ctypes.sizeof(FramePacket))
+        self._packet = FramePacket.from_buffer(self._buffer)
+        self._packet.magic = FRAME_PACKET_MAGIC
+        self._packet.version = FRAME_PACKET_VERSION
+        self._packet.session = random.getrandbits(32)
+        self.sequence = 0
+
+    def publish(self, frameData: FrameData):
+        "Send frameData to all followers. The packet buffer is reused, so this does not allocate per frame."
+        packet = self._packet
+        self.sequence += 1
+        packet.sequence = self.sequence
+        packet.flags = frameData.flags.value
+        packet.scene = frameData.scene
+        packet.tTracked = frameData.tTracked
+        packet.localTime = frameData.localTime
+        packet.localTimeDelta = frameData.localTimeDelta
+        packet.frameRateNumerator = frameData.frameRateNumerator
+        packet.frameRateDenominator = frameData.frameRateDenominator
+        packet.sentTime = time.monotonic()
+        for address in self.addresses:
+            self._socket.sendto(self._buffer, address)
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class FrameFollower:
+    """Receives FrameData published by a FrameLeader.
+
+    If `rs` is given, beginFollowerFrame is called for every frame received; pass None to receive frames without
+    a RenderStream instance (e.g. when testing over loopback). The FrameData returned by awaitFrameData is reused
+    and is overwritten by the next call.
+
+    `clockOffset` estimates local monotonic time minus the leader's monotonic time, taken as the minimum observed
+    over the last `offsetWindow` packets so that it includes only the fastest network transit."""
+
+    def __init__(
+        self,
+        address: Address,
+        rs: Optional[RenderStream] = None,
+        interface: Optional[str] = None,
+        offsetWindow: int = 64,
+    ):
+        self.rs = rs
+        host, port = address
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+        self._socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if _isMulticast(host):
+            self._socket.bind(("", port))
+            membership = struct.pack("4s4s", socket.inet_aton(host), socket.inet_aton(interface or "0.0.0.0"))
+            self._socket.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+        else:
+            self._socket.bind((host, port))
+        self._timeoutMs = None
+
+        self._buffer = bytearray(ctypes.sizeof(FramePacket))
+        self._packet = FramePacket.from_buffer(self._buffer)
+        self._frameData = FrameData()
+
+        self._offsets = array("d", [float("inf")] * offsetWindow)
+        self._iOffset = 0
+        self.clockOffset = float("inf")
+
+        self.session = None
+        self.sequence = 0
+        self.framesReceived = 0
+        self.framesMissed = 0
+        self.packetsDiscarded = 0
+
+    def _setTimeout(self, timeoutMs: int):
+        if timeoutMs != self._timeoutMs:
+            self._socket.settimeout(max(timeoutMs, 0) / 1000.0)
+            self._timeoutMs = timeoutMs
+
+    def _receive(self, timeoutMs: int) -> bool:
+        "Receive the next in-order packet into self._packet, returns False on timeout."
+        deadline = time.monotonic() + timeoutMs / 1000.0
+        packet = self._packet
+        while True:
+            remainingMs = int((deadline - time.monotonic()) * 1000.0)
+            if remainingMs <= 0:
+                return False
+            self._setTimeout(remainingMs)
+            try:
+                nBytes = self._socket.recv_into(self._buffer)
+            except socket.timeout:
+                return False
+
+            if (
+                nBytes != len(self._buffer)
+                or packet.magic != FRAME_PACKET_MAGIC
+                or packet.version != FRAME_PACKET_VERSION
+            ):
+                self.packetsDiscarded += 1
+                continue
+
+            if packet.session != self.session:
+                # leader (re)started, resynchronise without counting a gap
+                self.session = packet.session
+                self.sequence = packet.sequence - 1
+                self._offsets[:] = array("d", [float("inf")] * len(self._offsets))
+                self.clockOffset = float("inf")
+
+            if packet.sequence <= self.sequence:
+                self.packetsDiscarded += 1  # duplicate or reordered
+                continue
+
+            self.framesMissed += packet.sequence - self.sequence - 1
+            self.sequence = packet.sequence
+            return True
+
+    def _updateClockOffset(self, receivedTime: float):
+        offsets = self._offsets
+        offsets[self._iOffset] = receivedTime - self._packet.sentTime
+        self._iOffset = (self._iOffset + 1) % len(offsets)
+        self.clockOffset = min(offsets)
+
+    def leaderToLocalTime(self, leaderTime: float) -> float:
+        "Convert a leader monotonic timestamp into local monotonic time using the current clock offset estimate."
+        return leaderTime + self.clockOffset
+
+    def awaitFrameData(self, timeoutMs: int) -> FrameData:
+        """Waits for the leader to publish a frame, and begins the follower frame for it.
+
+        Raises RenderStreamError(RS_ERROR.TIMEOUT) if no frame arrives within timeoutMs, matching
+        RenderStream.awaitFrameData."""
+        if not self._receive(timeoutMs):
+            raise RenderStreamError(RS_ERROR.TIMEOUT)
+        self._updateClockOffset(time.monotonic())
+        self.framesReceived += 1
+
+        packet = self._packet
+        frameData = self._frameData
+        frameData.tTracked = packet.tTracked
+        frameData.localTime = packet.localTime
+        frameData.localTimeDelta = packet.localTimeDelta
+        frameData.frameRateNumerator = packet.frameRateNumerator
+        frameData.frameRateDenominator = packet.frameRateDenominator
+        frameData.flags = packet.flags
+        frameData.scene = packet.scene
+
+        if self.rs is not None:
+            self.rs.beginFollowerFrame(frameData.tTracked)
+        return frameData
+
+    def close(self):
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,127 @@
+"""Frame-aware garbage collection and idle work.
+
+Python's cyclic garbage collector runs whenever allocation counts cross a threshold, which can land in the middle of
+rendering a frame. FrameGcScheduler disables automatic collection and instead collects in the slack between the last
+sendFrame of a frame and the frame deadline, together with any registered idle tasks:
+
+    scheduler = FrameGcScheduler()
+    scheduler.enable()
+    while True:
+        frameData = rs.awaitFrameData(5000)
+        scheduler.beginFrame(frameData)
+        ...  # render and send every stream
+        scheduler.runIdle()
+"""
+
+import gc
+import time
+from typing import Callable, List, Optional
+
+from .renderstream import FrameData
+
+DEFAULT_FRAME_INTERVAL = 1.0 / 60.0
+
+# idle tasks do a bounded slice of work per call and return True if they have more to do
+IdleTask = Callable[[], bool]
+
+
+class FrameGcScheduler:
+    """Runs garbage collection and idle tasks within a per-frame time budget.
+
+    The budget ends `safetyMargin` (as a fraction of the frame interval) before the next frame is due. A generation
+    is collected when its allocation count passes the threshold automatic collection would have used, but only if
+    its estimated cost fits the remaining budget; a collection deferred for more than `maxDeferredFrames` frames
+    runs anyway so memory can't grow without bound."""
+
+    def __init__(self, safetyMargin: float = 0.25, maxDeferredFrames: int = 120, smoothing: float = 0.2):
+        self.safetyMargin = safetyMargin
+        self.maxDeferredFrames = maxDeferredFrames
+        self.smoothing = smoothing
+        self.frameInterval = DEFAULT_FRAME_INTERVAL
+        self.frameStart = time.perf_counter()
+        self.enabled = False
+
+        self.collections = [0, 0, 0]
+        self.collectionCost = [0.0, 0.0, 0.0]  # moving average, seconds
+        self.forcedCollections = 0
+        self.idleTime = 0.0
+        self._deferredFrames = [0, 0, 0]
+        self._tasks: List[IdleTask] = []
+        self._iTask = 0
+        self._gcWasEnabled = gc.isenabled()
+
+    def enable(self):
+        "Take over from automatic garbage collection."
+        if not self.enabled:
+            self._gcWasEnabled = gc.isenabled()
+            gc.disable()
+            self.enabled = True
+
+    def disable(self):
+        "Restore automatic garbage collection to how it was before enable()."
+        if self.enabled:
+            if self._gcWasEnabled:
+                gc.enable()
+            self.enabled = False
+
+    def addIdleTask(self, task: IdleTask):
+        self._tasks.append(task)
+
+    def removeIdleTask(self, task: IdleTask):
+        self._tasks.remove(task)
+
+    def beginFrame(self, frameData: FrameData, frameStart: Optional[float] = None):
+        "Call as soon as awaitFrameData returns."
+        if frameData.frameRateNumerator and frameData.frameRateDenominator:
+            self.frameInterval = frameData.frameRateDenominator / frameData.frameRateNumerator
+        elif frameData.localTimeDelta > 0:
+            self.frameInterval = frameData.localTimeDelta
+        self.frameStart = time.perf_counter() if frameStart is None else frameStart
+
+    def remaining(self) -> float:
+        deadline = self.frameStart + self.frameInterval * (1.0 - self.safetyMargin)
+        return deadline - time.perf_counter()
+
+    def _collect(self, generation: int):
+        start = time.perf_counter()
+        gc.collect(generation)
+        elapsed = time.perf_counter() - start
+        cost = self.collectionCost[generation]
+        self.collectionCost[generation] = elapsed if cost == 0.0 else cost + self.smoothing * (elapsed - cost)
+        self.collections[generation] += 1
+        # collecting a generation also collects the younger ones
+        for younger in range(generation + 1):
+            self._deferredFrames[younger] = 0
+
+    def collectDue(self, budget: float):
+        "Collect the oldest generation which is due and fits the budget (or has been deferred too long)."
+        counts = gc.get_count()
+        thresholds = gc.get_threshold()
+        for generation in (2, 1, 0):
+            if thresholds[generation] == 0 or counts[generation] < thresholds[generation]:
+                continue
+            if self.collectionCost[generation] <= budget:
+                self._collect(generation)
+                return
+            self._deferredFrames[generation] += 1
+            if self._deferredFrames[generation] > self.maxDeferredFrames:
+                self.forcedCollections += 1
+                self._collect(generation)
+                return
+
+    def runIdle(self, budget: Optional[float] = None):
+        """Use the rest of this frame's budget (or `budget` seconds, e.g. after a TIMEOUT) for garbage collection and
+        then idle tasks, round-robin, until the budget runs out or no task has more work."""
+        start = time.perf_counter()
+        end = start + (budget if budget is not None else self.remaining())
+        if self.enabled:
+            self.collectDue(end - start)
+
+        tasks = self._tasks
+        idle = 0
+        while tasks and idle < len(tasks) and time.perf_counter() < end:
+            self._iTask %= len(tasks)
+            moreWork = tasks[self._iTask]()
+            self._iTask += 1
+            idle = 0 if moreWork else idle + 1
+        self.idleTime += time.perf_counter() - start
@@ -0,0 +1,195 @@
+"""Fixed-capacity history of parameter values and camera poses, for temporal effects. Requires numpy.
+
+Trails, motion blur, smoothing and beat detection need the last few frames of inputs. FrameHistory keeps a ring
+buffer per scene of tTracked and the raw parameter float vector (as rs_getFrameParameters returns it), and one per
+stream of tTracked and the CameraData float fields, stored as numpy structure-of-arrays:
+
+    history = FrameHistory(capacity=120)
+    ...
+    frameData = rs.awaitFrameData(5000)
+    parameters = history.recordParameters(rs, frameData, scene)
+    camera = rs.getFrameCamera(stream.handle)
+    history.recordCamera(stream.handle, camera, frameData.tTracked)
+    ...
+    times, speed = parameters.column("speed", 30)  # last 30 frames, oldest first
+    times, cameras = history.camera(stream.handle).window(8)  # (8, len(CAMERA_COLUMNS))
+
+Every sample is written twice, at its slot and at slot + capacity, so the last n samples are always one contiguous
+slice of the doubled array and windows are views, never copies. Parameters are read by rs_getFrameParameters
+straight into the ring, and nothing is allocated per frame."""
+
+import ctypes
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .batching import CAMERA_COLUMNS
+from .renderstream import (
+    CameraData,
+    FrameData,
+    RemoteParameterFlags,
+    RemoteParameters,
+    RemoteParameterType,
+    RenderStream,
+    StreamHandle,
+)
+
+_CAMERA_OFFSET = CameraData.x.offset
+_CAMERA_BYTES = len(CAMERA_COLUMNS) * ctypes.sizeof(ctypes.c_float)
+
+
+class Ring:
+    """tTracked and a row of float32 values per sample, for the last `capacity` samples.
+
+    `times` and `values` are the doubled backing arrays; use window() rather than indexing them directly."""
+
+    def __init__(self, capacity: int, width: int):
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.capacity = capacity
+        self.width = width
+        self.times = np.zeros(2 * capacity, dtype=np.float64)
+        self.values = np.zeros((2 * capacity, width), dtype=np.float32)
+        self.count = 0
+        self.head = 0  # slot of the next sample
+        self._rowBytes = self.values.strides[0]
+        self._address = self.values.ctypes.data
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _slot(self) -> int:
+        "Address of the row for the next sample; call _commit() once it has been filled."
+        return self._address + self.head * self._rowBytes
+
+    def _commit(self, tTracked: float):
+        head = self.head
+        ctypes.memmove(self._address + (head + self.capacity) * self._rowBytes, self._slot(), self._rowBytes)
+        self.times[head] = tTracked
+        self.times[head + self.capacity] = tTracked
+        self.head = (head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+    def push(self, tTracked: float, values: np.ndarray):
+        "Add a sample of `width` values, e.g. from a workload's own per-frame analysis."
+        self.values[self.head] = values
+        self._commit(tTracked)
+
+    def window(self, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Views of the times (n,) and values (n, width) of the last n samples (default all held), oldest first.
+
+        They are overwritten as samples are added, so copy them to keep them beyond the frame."""
+        n = self.count if n is None else min(n, self.count)
+        end = self.head + self.capacity
+        return self.times[end - n : end], self.values[end - n : end]
+
+    def latest(self) -> np.ndarray:
+        if not self.count:
+            raise IndexError("No samples recorded")
+        return self.values[self.head + self.capacity - 1]
+
+    def clear(self):
+        self.count = 0
+        self.head = 0
+
+
+class ParameterHistory(Ring):
+    "History of one scene's input parameter floats, in the order rs_getFrameParameters returns them."
+
+    def __init__(self, scene: RemoteParameters, capacity: int):
+        self.hash = scene.hash
+        self.columns: Dict[str, slice] = {}
+        nFloats = 0
+        for i in range(scene.nParameters):
+            param = scene.parameters[i]
+            if param.flags & RemoteParameterFlags.READ_ONLY.value:
+                continue  # don't count output params
+            key = str(param.key, encoding="utf-8")
+            if param.type == RemoteParameterType.NUMBER:
+                self.columns[key] = slice(nFloats, nFloats + 1)
+                nFloats += 1
+            elif param.type in (RemoteParameterType.POSE, RemoteParameterType.TRANSFORM):
+                self.columns[key] = slice(nFloats, nFloats + 16)
+                nFloats += 16
+        super().__init__(capacity, nFloats)
+
+    def fetch(self, rs: RenderStream, tTracked: float):
+        "Read this frame's parameters from the controller directly into the ring."
+        rs.dll.rs_getFrameParameters(self.hash, self._slot(), self._rowBytes)
+        self._commit(tTracked)
+
+    def column(self, key: str, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        "The last n values of one parameter: (n,) for a number, (n, 16) for a pose or transform matrix."
+        times, values = self.window(n)
+        columns = self.columns[key]
+        if columns.stop - columns.start == 1:
+            return times, values[:, columns.start]
+        return times, values[:, columns]
+
+
+class CameraHistory(Ring):
+    "History of one stream's cameras: the CameraData fields named in CAMERA_COLUMNS."
+
+    def __init__(self, capacity: int):
+        super().__init__(capacity, len(CAMERA_COLUMNS))
+
+    def record(self, camera: CameraData, tTracked: float):
+        ctypes.memmove(self._slot(), ctypes.addressof(camera) + _CAMERA_OFFSET, _CAMERA_BYTES)
+        self._commit(tTracked)
+
+    def column(self, name: str, n: Optional[int] = None) -> Tuple[np.ndarray, np.ndarray]:
+        "The last n values of one camera field, e.g. column('x', 8)."
+        times, values = self.window(n)
+        return times, values[:, CAMERA_COLUMNS.index(name)]
+
+
+class FrameHistory:
+    """History buffers for every scene and stream, created on first use with `capacity` samples each.
+
+    A sample with the same tTracked as the latest one (e.g. a repeated call within a frame) is not recorded again."""
+
+    def __init__(self, capacity: int = 60):
+        self.capacity = capacity
+        self._scenes: Dict[int, ParameterHistory] = {}
+        self._streams: Dict[StreamHandle, CameraHistory] = {}
+
+    def parameters(self, scene: RemoteParameters) -> ParameterHistory:
+        history = self._scenes.get(scene.hash)
+        if history is None:
+            history = self._scenes[scene.hash] = ParameterHistory(scene, self.capacity)
+        return history
+
+    def camera(self, stream: StreamHandle) -> CameraHistory:
+        history = self._streams.get(stream)
+        if history is None:
+            history = self._streams[stream] = CameraHistory(self.capacity)
+        return history
+
+    def recordParameters(self, rs: RenderStream, frameData: FrameData, scene: RemoteParameters) -> ParameterHistory:
+        "Fetch and record this frame's parameters for `scene`, and return the scene's history."
+        history = self.parameters(scene)
+        if not _repeated(history, frameData.tTracked):
+            history.fetch(rs, frameData.tTracked)
+        return history
+
+    def recordCamera(self, stream: StreamHandle, camera: CameraData, tTracked: float) -> CameraHistory:
+        history = self.camera(stream)
+        if not _repeated(history, tTracked):
+            history.record(camera, tTracked)
+        return history
+
+    def resetStreams(self, streams: Optional[List[StreamHandle]] = None):
+        "Forget camera history, for all streams or the given ones, e.g. after STREAMS_CHANGED."
+        if streams is None:
+            self._streams.clear()
+        else:
+            for stream in streams:
+                self._streams.pop(stream, None)
+
+    def clear(self):
+        self._scenes.clear()
+        self._streams.clear()
+
+
+def _repeated(ring: Ring, tTracked: float) -> bool:
+    return ring.count > 0 and ring.times[ring.head + ring.capacity - 1] == tTracked
@@ -0,0 +1,205 @@
+"""Non-blocking log forwarding between the RenderStream DLL and Python.
+
+The logging callbacks registered by RenderStream.registerLoggingFunc etc. run user code on the DLL's own threads.
+LogSink instead registers callbacks which only append the raw message bytes to a bounded queue; a background thread
+decodes them in batches and forwards them to the `logging` module. D3LogBatcher does the same in the other direction
+for logToD3."""
+
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Optional, Tuple
+
+from .renderstream import RenderStream
+
+INFO = logging.INFO
+ERROR = logging.ERROR
+VERBOSE = logging.DEBUG
+
+
+class _Batcher(ABC):
+    "Bounded queue drained by a daemon thread, which calls flush() every `flushInterval` seconds."
+
+    def __init__(self, capacity: int, flushInterval: float, name: str):
+        self.capacity = capacity
+        self.flushInterval = flushInterval
+        self.dropped = 0  # messages discarded because the queue was full
+        self.errors = 0  # messages (or flushes) which raised while being forwarded
+        self._queue = deque()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+
+    def _push(self, item):
+        # deque.append is atomic, so producers never block on a lock
+        if len(self._queue) < self.capacity:
+            self._queue.append(item)
+        else:
+            self.dropped += 1
+
+    def _run(self):
+        while not self._stop.wait(self.flushInterval):
+            self._flushSafely()
+        self._flushSafely()
+
+    def _flushSafely(self):
+        # flush() counts its own failures per message; this keeps the thread alive if anything else goes wrong
+        try:
+            self.flush()
+        except Exception:
+            self.errors += 1
+
+    def _drain(self):
+        queue = self._queue
+        for _ in range(len(queue)):
+            yield queue.popleft()
+
+    @abstractmethod
+    def flush(self):
+        "Forward everything queued."
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        "Stop the background thread after forwarding everything already queued."
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+
+class LogSink(_Batcher):
+    """Forwards DLL log messages to a `logging.Logger` without running Python logging on the DLL's threads.
+
+    Messages are routed by the callback they arrived on: logging -> INFO, error logging -> ERROR and verbose
+    logging -> DEBUG (override with `levels`). At most `maxPerSecond` non-error messages are forwarded per second,
+    the rest are counted in `rateLimited`. Dropped message counts are logged as a warning when they occur."""
+
+    def __init__(
+        self,
+        logger: Optional[logging.Logger] = None,
+        capacity: int = 4096,
+        maxPerSecond: float = 200.0,
+        flushInterval: float = 0.05,
+        levels: Optional[Dict[int, int]] = None,
+    ):
+        super().__init__(capacity, flushInterval, "renderstream-logsink")
+        self.logger = logger if logger is not None else logging.getLogger("renderstream")
+        self.maxPerSecond = maxPerSecond
+        self.levels = levels or {}
+        self.rateLimited = 0
+        self._tokens = maxPerSecond
+        self._lastRefill = time.monotonic()
+        self._reportedDropped = 0
+        self._reportedRateLimited = 0
+        self._reportedErrors = 0
+        # id(rs) -> (rs, info, error, verbose) for each RenderStream attached to
+        self._attached: Dict[int, Tuple[RenderStream, bool, bool, bool]] = {}
+
+    def _callback(self, level: int):
+        push = self._push
+
+        def callback(bMsg):
+            push((level, bMsg))
+
+        return callback
+
+    def attach(self, rs: RenderStream, info: bool = True, error: bool = True, verbose: bool = False):
+        """Register this sink as the DLL's logging callbacks, undecoded, and start forwarding.
+
+        They replace any registered with rs.registerLoggingFunc etc., and rs.unregisterLoggingFunc etc. still work."""
+        if info:
+            rs.registerLoggingFunc(self._callback(INFO), decode=False)
+        if error:
+            rs.registerErrorLoggingFunc(self._callback(ERROR), decode=False)
+        if verbose:
+            rs.registerVerboseLoggingFunc(self._callback(VERBOSE), decode=False)
+        self._attached[id(rs)] = (rs, info, error, verbose)
+        if not self._thread.is_alive():
+            self.start()
+
+    def detach(self, rs: RenderStream):
+        "Unregister the callbacks attach() registered on rs, then stop forwarding once the queue is empty."
+        _, info, error, verbose = self._attached.pop(id(rs), (rs, False, False, False))
+        if info:
+            rs.unregisterLoggingFunc()
+        if error:
+            rs.unregisterErrorLoggingFunc()
+        if verbose:
+            rs.unregisterVerboseLoggingFunc()
+        self.stop()
+
+    def _allow(self, level: int) -> bool:
+        if level >= ERROR:
+            return True
+        now = time.monotonic()
+        self._tokens = min(self.maxPerSecond, self._tokens + (now - self._lastRefill) * self.maxPerSecond)
+        self._lastRefill = now
+        if self._tokens < 1.0:
+            self.rateLimited += 1
+            return False
+        self._tokens -= 1.0
+        return True
+
+    def flush(self):
+        logger = self.logger
+        for level, bMsg in self._drain():
+            if not self._allow(level):
+                continue
+            level = self.levels.get(level, level)
+            try:
+                if logger.isEnabledFor(level):
+                    logger.log(level, str(bMsg, encoding="utf-8", errors="replace").rstrip("\r\n"))
+            except Exception:  # e.g. a NULL message, or a failing handler
+                self.errors += 1
+
+        dropped = self.dropped - self._reportedDropped
+        rateLimited = self.rateLimited - self._reportedRateLimited
+        errors = self.errors - self._reportedErrors
+        if dropped or rateLimited or errors:
+            self._reportedDropped += dropped
+            self._reportedRateLimited += rateLimited
+            self._reportedErrors += errors
+            logger.warning(
+                f"RenderStream log sink dropped {dropped} messages (queue full) and {rateLimited} (rate limited), "
+                f"and failed to forward {errors}"
+            )
+
+
+class D3LogBatcher(_Batcher):
+    """Queues messages for RenderStream.logToD3 and sends them from a background thread.
+
+    Consecutive identical messages within a batch are collapsed into one with a repeat count. Messages which fail to
+    send are counted in `errors`."""
+
+    def __init__(self, rs: RenderStream, capacity: int = 1024, flushInterval: float = 0.1):
+        super().__init__(capacity, flushInterval, "renderstream-d3log")
+        self.rs = rs
+
+    def logToD3(self, message: str):
+        "Queue a single line for d3. Do not terminate with a newline character."
+        self._push(message)
+
+    def flush(self):
+        previous = None
+        repeats = 0
+        for message in self._drain():
+            if message == previous:
+                repeats += 1
+                continue
+            if previous is not None:
+                self._send(previous, repeats)
+            previous = message
+            repeats = 0
+        if previous is not None:
+            self._send(previous, repeats)
+
+    def _send(self, message: str, repeats: int):
+        if repeats:
+            message = f"{message} (repeated {repeats} times)"
+        try:
+            self.rs.logToD3(message)
+        except Exception:  # e.g. RenderStreamError; the rest of the batch is still sent
+            self.errors += 1
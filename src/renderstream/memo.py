@@ -0,0 +1,98 @@
+"""Memoized values derived from frame parameters.
+
+Expensive data computed from a few parameters (colour LUTs, gradient tables, text layout, generated geometry) only
+needs recomputing when those parameters change. Register each derived function with the keys it reads; it is then
+called with those values, in that order, only when they differ from every recently seen combination:
+
+    derived = DerivedValues()
+
+    @derived.register("gradient", ["colourA", "colourB", "steps"])
+    def gradient(colourA, colourB, steps):
+        ...
+
+    values = rs.getFrameParameters(scene)
+    table = derived.get("gradient", values, scene)
+
+Image parameters are compared by image id and size (not content), like RenderCache."""
+
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable, Mapping, Optional, Sequence
+
+from .rendercache import parameterFingerprint
+from .renderstream import RemoteParameters
+
+
+class _Derived:
+    def __init__(self, name: str, keys: Sequence[str], function: Callable, maxEntries: int):
+        self.name = name
+        self.keys = tuple(keys)
+        self.function = function
+        self.maxEntries = maxEntries
+        self.results: "OrderedDict[Hashable, object]" = OrderedDict()
+        self.lastInputs: Optional[Hashable] = None
+        self.lastResult = None
+        self.hits = 0
+        self.misses = 0
+
+
+class DerivedValues:
+    """Registry of derived functions, each with an LRU of its `maxEntries` most recent results.
+
+    Results are cached per scene, so a key with the same name in two scenes never shares a result. Switching back
+    to a recently used combination of values (e.g. toggling between presets) is a cache hit."""
+
+    def __init__(self, maxEntries: int = 8):
+        self.maxEntries = maxEntries
+        self._derived: Dict[str, _Derived] = {}
+
+    def register(
+        self, name: str, keys: Sequence[str], function: Optional[Callable] = None, maxEntries: Optional[int] = None
+    ):
+        "Register `function` as `name`. Without `function`, returns a decorator."
+        if function is None:
+
+            def decorator(function: Callable) -> Callable:
+                self.register(name, keys, function, maxEntries)
+                return function
+
+            return decorator
+        if name in self._derived:
+            raise ValueError(f"Derived value {name!r} is already registered")
+        self._derived[name] = _Derived(name, keys, function, self.maxEntries if maxEntries is None else maxEntries)
+
+    def get(self, name: str, values: Mapping, scene: Optional[RemoteParameters] = None):
+        "The derived value for this frame's parameter `values`, computed only if not cached."
+        derived = self._derived[name]
+        args = [values[key] for key in derived.keys]
+        inputs = (scene.hash if scene is not None else None,) + tuple(parameterFingerprint(arg) for arg in args)
+        if inputs == derived.lastInputs:
+            derived.hits += 1
+            return derived.lastResult
+
+        results = derived.results
+        if inputs in results:
+            results.move_to_end(inputs)
+            result = results[inputs]
+            derived.hits += 1
+        else:
+            result = derived.function(*args)
+            derived.misses += 1
+            results[inputs] = result
+            if len(results) > derived.maxEntries:
+                results.popitem(last=False)
+        derived.lastInputs = inputs
+        derived.lastResult = result
+        return result
+
+    def invalidate(self, name: Optional[str] = None):
+        "Drop cached results for one derived value, or all of them (e.g. when the schema is reloaded)."
+        for derived in self._derived.values() if name is None else (self._derived[name],):
+            derived.results.clear()
+            derived.lastInputs = None
+            derived.lastResult = None
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {
+            name: {"hits": derived.hits, "misses": derived.misses, "entries": len(derived.results)}
+            for name, derived in self._derived.items()
+        }
@@ -0,0 +1,329 @@
+"""Frame timing metrics, exposed in Prometheus text format.
+
+Metrics are plain counters, gauges and fixed-bucket histograms which are updated in place from the frame loop.
+FrameMetrics wraps the RenderStream calls made every frame to feed the standard set, and MetricsServer serves the
+registry over HTTP from a background thread."""
+
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Mapping, Optional, Sequence, Set, Tuple, Union
+
+from .renderstream import (
+    CameraData,
+    FrameData,
+    FrameResponseData,
+    RenderStream,
+    RenderStreamError,
+    RS_ERROR,
+    SenderFrameType,
+    SenderFrameTypeData,
+    StreamDescriptions,
+    StreamHandle,
+)
+
+# seconds, chosen to resolve frame intervals from 240 fps down to 10 fps
+LATENCY_BUCKETS = (
+    0.001,
+    0.002,
+    0.004,
+    0.006,
+    0.008,
+    0.010,
+    0.0125,
+    0.015,
+    0.01667,
+    0.020,
+    0.025,
+    0.0333,
+    0.050,
+    0.075,
+    0.100,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escapeLabelValue(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _formatLabels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escapeLabelValue(value)}"' for name, value in pairs) + "}"
+
+
+def _formatValue(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_formatLabels(self.labels)} {_formatValue(self.value)}"]
+
+
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.value = 0.0
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_formatLabels(self.labels)} {_formatValue(self.value)}"]
+
+
+class Histogram:
+    """Histogram with fixed upper bounds. Observing a value only increments preallocated counts."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, buckets: Sequence[float] = LATENCY_BUCKETS, labels: Labels = ()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.counts = array("Q", [0] * (len(self.buckets) + 1))  # last entry is the +Inf bucket
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float("inf"),), self.counts):
+            cumulative += count
+            lines.append(f"{self.name}_bucket{_formatLabels(self.labels, ('le', _formatValue(bound)))} {cumulative}")
+        lines.append(f"{self.name}_sum{_formatLabels(self.labels)} {_formatValue(self.sum)}")
+        lines.append(f"{self.name}_count{_formatLabels(self.labels)} {self.count}")
+        return lines
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[Tuple[str, Labels], Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, labels: Optional[Mapping] = None, **kwargs) -> Metric:
+        key = (name, tuple(sorted((labels or {}).items())))
+        metric = self._metrics.get(key)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(key)
+                if metric is None:
+                    metric = self._metrics[key] = cls(name, help, labels=key[1], **kwargs)
+        if not isinstance(metric, cls):
+            raise ValueError(f"Metric {name} is already registered as a {metric.kind}")
+        return metric
+
+    def counter(self, name: str, help: str, labels: Optional[Mapping] = None) -> Counter:
+        return self._get(Counter, name, help, labels)
+
+    def gauge(self, name: str, help: str, labels: Optional[Mapping] = None) -> Gauge:
+        return self._get(Gauge, name, help, labels)
+
+    def histogram(
+        self, name: str, help: str, labels: Optional[Mapping] = None, buckets: Sequence[float] = LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._get(Histogram, name, help, labels, buckets=buckets)
+
+    def exposition(self) -> str:
+        "Render all metrics in the Prometheus text exposition format."
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: (metric.name, metric.labels))
+        lines = []
+        previousName = None
+        for metric in metrics:
+            if metric.name != previousName:
+                lines.append(f"# HELP {metric.name} {metric.help}")
+                lines.append(f"# TYPE {metric.name} {metric.kind}")
+                previousName = metric.name
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+class FrameMetrics:
+    """The standard frame loop metrics. Use the wrapper methods in place of the matching RenderStream calls:
+
+        frameData = metrics.awaitFrameData(rs, 5000)
+        ...
+        camera = metrics.getFrameCamera(rs, stream.handle)
+        ...
+        metrics.sendFrame(rs, stream.handle, frameType, frameData, response)
+
+    Frame latency is measured per stream from awaitFrameData returning to sendFrame completing. Call setStreams
+    after getStreams so per-stream metrics are labelled with the stream name rather than its handle, and so dropped
+    frames are counted: when the next frame is awaited, every stream of the set which had a camera but wasn't sent a
+    frame counts as one dropped frame. frameDropped() adds drops which that can't see."""
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry if registry is not None else MetricsRegistry()
+        r = self.registry
+        self.awaitSeconds = r.histogram("renderstream_await_seconds", "Time spent waiting inside awaitFrameData")
+        self.frames = r.counter("renderstream_frames_total", "Frames received from awaitFrameData")
+        self.framesPerSecond = r.gauge("renderstream_frames_per_second", "Frames received over the last second")
+        self.timeouts = r.counter("renderstream_timeouts_total", "awaitFrameData timeouts")
+        self.streamsChanged = r.counter("renderstream_streams_changed_total", "STREAMS_CHANGED notifications")
+        self.notFound = r.counter("renderstream_camera_not_found_total", "getFrameCamera NOT_FOUND results")
+        self.dropped = r.counter("renderstream_dropped_frames_total", "Stream frames requested but not sent")
+        self.frameStart = 0.0
+        self._streamLatency: Dict[int, Histogram] = {}
+        self._streams: Tuple[int, ...] = ()  # handles of the stream set, from setStreams
+        self._sent: Set[int] = set()  # streams sent a frame since the frame started
+        self._notFound: Set[int] = set()  # streams without a camera this frame, which aren't expected to be sent
+        self._frameOpen = False
+        self._fpsWindowStart = time.perf_counter()
+        self._fpsWindowFrames = 0
+
+    def setStreams(self, streams: StreamDescriptions):
+        handles = []
+        for i in range(streams.nStreams):
+            stream = streams.streams[i]
+            handles.append(stream.handle)
+            self._streamLatency[stream.handle] = self._latencyHistogram(str(stream.name, encoding="utf-8"))
+        self._streams = tuple(handles)
+
+    def _latencyHistogram(self, name: str) -> Histogram:
+        return self.registry.histogram(
+            "renderstream_stream_frame_seconds",
+            "Time from awaitFrameData returning to sendFrame completing",
+            {"stream": name},
+        )
+
+    def _endFrame(self):
+        "Count the streams of the frame just finished which were neither sent a frame nor without a camera."
+        if self._frameOpen:
+            sent, notFound = self._sent, self._notFound
+            missing = sum(1 for handle in self._streams if handle not in sent and handle not in notFound)
+            if missing:
+                self.dropped.inc(missing)
+            self._frameOpen = False
+        self._sent.clear()
+        self._notFound.clear()
+
+    def awaitFrameData(self, rs: RenderStream, timeoutMs: int) -> FrameData:
+        self._endFrame()
+        start = time.perf_counter()
+        try:
+            frameData = rs.awaitFrameData(timeoutMs)
+        except RenderStreamError as e:
+            if e.error == RS_ERROR.TIMEOUT:
+                self.timeouts.inc()
+            elif e.error == RS_ERROR.STREAMS_CHANGED:
+                self.streamsChanged.inc()
+            raise
+        finally:
+            self.frameStart = time.perf_counter()
+            self.awaitSeconds.observe(self.frameStart - start)
+
+        self.frames.inc()
+        self._frameOpen = True
+        self._fpsWindowFrames += 1
+        elapsed = self.frameStart - self._fpsWindowStart
+        if elapsed >= 1.0:
+            self.framesPerSecond.set(self._fpsWindowFrames / elapsed)
+            self._fpsWindowStart = self.frameStart
+            self._fpsWindowFrames = 0
+        return frameData
+
+    def getFrameCamera(self, rs: RenderStream, stream: StreamHandle) -> CameraData:
+        try:
+            return rs.getFrameCamera(stream)
+        except RenderStreamError as e:
+            if e.error == RS_ERROR.NOT_FOUND:
+                self.notFound.inc()
+                self._notFound.add(stream)
+            raise
+
+    def sendFrame(
+        self,
+        rs: RenderStream,
+        stream: StreamHandle,
+        frameType: SenderFrameType,
+        frameData: SenderFrameTypeData,
+        response: FrameResponseData,
+    ):
+        rs.sendFrame(stream, frameType, frameData, response)
+        self.observeFrameSent(stream)
+
+    def observeFrameSent(self, stream: StreamHandle):
+        "Record a stream's frame latency, for frames sent without going through sendFrame above."
+        self._sent.add(stream)
+        histogram = self._streamLatency.get(stream)
+        if histogram is None:
+            histogram = self._streamLatency[stream] = self._latencyHistogram(str(stream))
+        histogram.observe(time.perf_counter() - self.frameStart)
+
+    def frameDropped(self, count: int = 1):
+        "Count drops not seen by comparing the streams sent with the stream set, e.g. frames skipped whole."
+        self.dropped.inc(count)
+
+
+class MetricsServer:
+    """Serves a registry's exposition on http://host:port/metrics from a daemon thread.
+
+    Binds to localhost by default; pass host="0.0.0.0" to let a remote Prometheus scrape it."""
+
+    def __init__(self, registry: MetricsRegistry, port: int = 9464, host: str = "127.0.0.1"):
+        self.registry = registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(handler):
+                if handler.path.split("?")[0] not in ("/", "/metrics"):
+                    handler.send_error(404)
+                    return
+                body = registry.exposition().encode("utf-8")
+                handler.send_response(200)
+                handler.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                handler.send_header("Content-Length", str(len(body)))
+                handler.end_headers()
+                handler.wfile.write(body)
+
+            def log_message(handler, format, *args):
+                pass  # don't write a line to stderr per scrape
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="renderstream-metrics", daemon=True)
+
+    @property
+    def port(self) -> int:
+        return self._server.server_address[1]
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self._thread.join()
@@ -0,0 +1,52 @@
+"""Per-stream work on several threads.
+
+On free-threaded CPython builds (3.13t and later, where gilEnabled() is False) pure Python per-stream render code
+runs on every core at once; with the GIL only work which releases it, such as numpy kernels and the DLL calls
+themselves, overlaps. The per-stream calls (getFrameCamera, getFrameImage, sendFrame, releaseImage) may be made
+concurrently for different streams; the frame-level calls stay on the frame loop's thread:
+
+    workers = StreamWorkers()
+    ...
+    frameData = rs.awaitFrameData(5000)
+    parameters = rs.getFrameParameters(scene)
+    workers.run(streams, lambda stream: renderAndSend(rs, stream, frameData, scene, parameters))
+
+Per-stream helpers with their own state (CameraPredictor, ResolutionScaler, FrameHistory, RenderCache...) are not
+locked; give each thread or stream its own, or only share them between threads for different streams' keys."""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Callable, List, Optional, TypeVar
+
+from .renderstream import StreamDescription, StreamDescriptions
+
+T = TypeVar("T")
+
+
+def gilEnabled() -> bool:
+    "Whether the GIL is in effect, i.e. whether Python code in different threads is serialized."
+    isGilEnabled = getattr(sys, "_is_gil_enabled", None)
+    return True if isGilEnabled is None else isGilEnabled()
+
+
+class StreamWorkers:
+    """Runs a function for every stream of a frame on `threads` threads (by default one per core, up to 32), and
+    waits for them all. With one thread the streams are processed in order on the calling thread."""
+
+    def __init__(self, threads: Optional[int] = None):
+        self.threads = threads if threads is not None else min(32, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(self.threads, "renderstream-stream") if self.threads > 1 else None
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def run(self, streams: StreamDescriptions, work: Callable[[StreamDescription], T]) -> List[T]:
+        """`work(stream)` for each stream, returning the results in stream order. If any raise, the exception of the
+        first stream to fail is raised once every stream has finished."""
+        if self._executor is None or streams.nStreams < 2:
+            return [work(streams.streams[i]) for i in range(streams.nStreams)]
+        futures = [self._executor.submit(work, streams.streams[i]) for i in range(streams.nStreams)]
+        wait(futures)
+        return [future.result() for future in futures]
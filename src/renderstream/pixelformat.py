@@ -0,0 +1,153 @@
+"""Conversion of RGBA render output into a stream's RSPixelFormat. Requires numpy.
+
+Renderers can work in a single internal format, float32 RGBA in [0, 1] or uint8 RGBA, and convert into the format a
+StreamDescription asks for. Conversion handles channel order, quantization, optional sRGB encoding (8-bit targets
+only, float targets stay linear) and premultiplication, and processes the image in row tiles on a thread pool. The
+RGBA16 format is treated as half float."""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Hashable, Optional, Tuple, Union
+
+import numpy as np
+
+from .buffers import BufferPool
+from .renderstream import RSPixelFormat
+
+_SRGB_LUT_SIZE = 4096
+
+# format value -> (dtype, channel order taken from RGBA, opaque alpha)
+_FORMATS = {
+    RSPixelFormat.BGRA8.value: (np.dtype(np.uint8), (2, 1, 0, 3), False),
+    RSPixelFormat.BGRX8.value: (np.dtype(np.uint8), (2, 1, 0, 3), True),
+    RSPixelFormat.RGBA8.value: (np.dtype(np.uint8), (0, 1, 2, 3), False),
+    RSPixelFormat.RGBX8.value: (np.dtype(np.uint8), (0, 1, 2, 3), True),
+    RSPixelFormat.RGBA16.value: (np.dtype(np.float16), (0, 1, 2, 3), False),
+    RSPixelFormat.RGBA32F.value: (np.dtype(np.float32), (0, 1, 2, 3), False),
+}
+
+
+def _formatValue(format: Union[RSPixelFormat, int]) -> int:
+    value = format.value if isinstance(format, RSPixelFormat) else int(format)
+    if value not in _FORMATS:
+        raise ValueError(f"Unsupported pixel format {format!r}")
+    return value
+
+
+def formatDtype(format: Union[RSPixelFormat, int]) -> np.dtype:
+    return _FORMATS[_formatValue(format)][0]
+
+
+def bytesPerPixel(format: Union[RSPixelFormat, int]) -> int:
+    return formatDtype(format).itemsize * 4
+
+
+def channelOrder(format: Union[RSPixelFormat, int]) -> Tuple[int, int, int, int]:
+    "For each channel of the format, the index of the RGBA channel it holds."
+    return _FORMATS[_formatValue(format)][1]
+
+
+def hasAlpha(format: Union[RSPixelFormat, int]) -> bool:
+    return not _FORMATS[_formatValue(format)][2]
+
+
+def _srgbEncode(linear: np.ndarray) -> np.ndarray:
+    return np.where(linear <= 0.0031308, linear * 12.92, 1.055 * np.power(linear, 1.0 / 2.4) - 0.055)
+
+
+class PixelConverter:
+    """Converts RGBA images into stream pixel formats.
+
+    Destination buffers come from `pool` keyed by the caller's `key` (e.g. the stream handle), so each stream reuses
+    its buffer every frame. Images are split into tiles of `tileRows` rows which are converted on `threads` worker
+    threads; numpy releases the GIL for the per-tile work."""
+
+    def __init__(self, threads: Optional[int] = None, tileRows: int = 64, pool: Optional[BufferPool] = None):
+        self.tileRows = tileRows
+        self.pool = pool if pool is not None else BufferPool()
+        self._threads = threads if threads is not None else min(8, os.cpu_count() or 1)
+        self._executor = ThreadPoolExecutor(self._threads, "renderstream-pixels") if self._threads > 1 else None
+
+        # Linear float -> 8-bit sRGB through a lookup table, much cheaper than evaluating the power curve per pixel
+        lut = _srgbEncode(np.linspace(0.0, 1.0, _SRGB_LUT_SIZE)) * 255.0 + 0.5
+        self._srgbLut = np.clip(lut, 0, 255).astype(np.uint8)
+        self._srgbLut8 = np.clip(_srgbEncode(np.arange(256) / 255.0) * 255.0 + 0.5, 0, 255).astype(np.uint8)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+
+    def convert(
+        self,
+        src: np.ndarray,
+        format: Union[RSPixelFormat, int],
+        key: Hashable = None,
+        srgb: bool = False,
+        premultiply: bool = False,
+        out: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Convert `src`, a (height, width, 4) float32 or uint8 RGBA image, into `format`.
+
+        Writes into `out` if given, otherwise into the pooled buffer for `key`, and returns the (height, width, 4)
+        destination array. `premultiply` multiplies colour by alpha, for straight alpha sources."""
+        if src.ndim != 3 or src.shape[2] != 4:
+            raise ValueError(f"Expected a (height, width, 4) RGBA image, got shape {src.shape}")
+        if src.dtype != np.float32 and src.dtype != np.uint8:
+            raise ValueError(f"Expected float32 or uint8 source pixels, got {src.dtype}")
+        dtype, order, opaque = _FORMATS[_formatValue(format)]
+        height, width = src.shape[:2]
+        if out is None:
+            out = self.pool.get(key if key is not None else (height, width, dtype.str), (height, width, 4), dtype)
+        elif out.shape != (height, width, 4) or out.dtype != dtype:
+            raise ValueError(f"Destination should be {(height, width, 4)} {dtype}, got {out.shape} {out.dtype}")
+
+        srgb = srgb and dtype == np.uint8
+        tiles = [(row, min(row + self.tileRows, height)) for row in range(0, height, self.tileRows)]
+        if self._executor is None or len(tiles) == 1:
+            for start, end in tiles:
+                self._convertTile(src[start:end], out[start:end], order, opaque, srgb, premultiply)
+        else:
+            convert = self._convertTile
+            futures = [
+                self._executor.submit(convert, src[start:end], out[start:end], order, opaque, srgb, premultiply)
+                for start, end in tiles
+            ]
+            for future in futures:
+                future.result()
+        return out
+
+    def _convertTile(self, src: np.ndarray, dst: np.ndarray, order, opaque: bool, srgb: bool, premultiply: bool):
+        if src.dtype == np.uint8 and dst.dtype == np.uint8 and not premultiply:
+            # integer fast path: swizzle, with an optional table lookup, no float conversion
+            for iDst, iSrc in enumerate(order[:3]):
+                if srgb:
+                    np.take(self._srgbLut8, src[..., iSrc], out=dst[..., iDst])
+                else:
+                    dst[..., iDst] = src[..., iSrc]
+            if not opaque:
+                dst[..., 3] = src[..., 3]
+        else:
+            tile = src.astype(np.float32)
+            if src.dtype == np.uint8:
+                tile *= 1.0 / 255.0
+            if premultiply:
+                tile[..., :3] *= tile[..., 3:4]
+
+            if dst.dtype == np.uint8:
+                np.clip(tile, 0.0, 1.0, out=tile)
+                if srgb:
+                    rgb = self._srgbLut[(tile[..., :3] * (_SRGB_LUT_SIZE - 1) + 0.5).astype(np.intp)]
+                else:
+                    rgb = tile[..., :3] * 255.0 + 0.5
+                for iDst, iSrc in enumerate(order[:3]):
+                    dst[..., iDst] = rgb[..., iSrc]
+                if not opaque:
+                    dst[..., 3] = tile[..., 3] * 255.0 + 0.5
+            else:
+                for iDst, iSrc in enumerate(order[:3]):
+                    dst[..., iDst] = tile[..., iSrc]
+                if not opaque:
+                    dst[..., 3] = tile[..., 3]
+
+        if opaque:
+            dst[..., 3] = 255 if dst.dtype == np.uint8 else 1.0
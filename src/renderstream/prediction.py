@@ -0,0 +1,214 @@
+"""Camera pose prediction to compensate for render latency.
+
+A frame rendered from the pose tracked at FrameData.tTracked reaches the wall some time later, so tracked cameras
+appear to lag. CameraPredictor keeps a short history of each stream's poses and extrapolates position and rotation
+to tTracked plus the measured render-and-send latency (plus any fixed latency after sendFrame, e.g. the display
+pipeline). The renderer draws with the predicted pose, while d3 is still sent the pose it supplied:
+
+    predictor = CameraPredictor(extraLatency=1 / 60)
+    ...
+    predictor.frameStarted()
+    camera = rs.getFrameCamera(stream.handle)
+    predicted = predictor.update(stream.handle, camera, frameData.tTracked)
+    render(predicted)
+    cameraResponse.camera = camera
+    rs.sendFrame(...)
+    predictor.frameSent()
+
+frameSent is called after every stream's sendFrame. A frame's latency runs to its last send, so it is folded into the
+estimate when the next frame starts.
+"""
+
+import ctypes
+import enum
+import time
+from array import array
+from typing import Dict, Optional
+
+from .renderstream import CameraData, StreamHandle
+
+_POSE_FIELDS = ("x", "y", "z", "rx", "ry", "rz")
+_N_CHANNELS = len(_POSE_FIELDS)
+_FIRST_ANGLE = 3  # rx, ry, rz are in degrees and are unwrapped so they extrapolate across +-180
+
+
+class PredictionModel(enum.Enum):
+    CONSTANT_VELOCITY = "constant_velocity"  # least-squares velocity over the recent history
+    ALPHA_BETA = "alpha_beta"  # alpha-beta filtered position and velocity, smoother under tracking noise
+
+
+def _wrapDegrees(angle: float) -> float:
+    return (angle + 180.0) % 360.0 - 180.0
+
+
+class _StreamHistory:
+    "Fixed-size ring of (t, x, y, z, rx, ry, rz) samples, with alpha-beta filter state."
+
+    def __init__(self, capacity: int):
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.poses = array("d", bytes(8 * capacity * _N_CHANNELS))
+        self.count = 0
+        self.head = 0  # index of the next sample to write
+        self.fitIndices = array("q", bytes(8 * capacity))  # ring index of each sample in the velocity fit
+        self.fitTimes = array("d", bytes(8 * capacity))  # their times, relative to the mean
+        self.position = array("d", bytes(8 * _N_CHANNELS))
+        self.velocity = array("d", bytes(8 * _N_CHANNELS))
+        self.predicted = CameraData()
+
+    def lastIndex(self) -> int:
+        return (self.head - 1) % self.capacity
+
+    def push(self, t: float, camera: CameraData):
+        last = self.lastIndex() * _N_CHANNELS
+        base = self.head * _N_CHANNELS
+        for i, field in enumerate(_POSE_FIELDS):
+            value = getattr(camera, field)
+            if i >= _FIRST_ANGLE and self.count:
+                previous = self.poses[last + i]
+                value = previous + _wrapDegrees(value - previous)
+            self.poses[base + i] = value
+        self.times[self.head] = t
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+
+
+class CameraPredictor:
+    """Per-stream camera pose history and extrapolation.
+
+    `capacity` samples are kept per stream; the constant-velocity model fits its velocity over the last `window` of
+    them. Predictions never extrapolate further than `maxExtrapolation` seconds past the latest sample, and a stream
+    whose history is older than `resetAfter` seconds (or goes backwards) starts again, e.g. after a cut."""
+
+    def __init__(
+        self,
+        model: PredictionModel = PredictionModel.CONSTANT_VELOCITY,
+        capacity: int = 16,
+        window: int = 4,
+        alpha: float = 0.5,
+        beta: float = 0.1,
+        extraLatency: float = 0.0,
+        maxExtrapolation: float = 0.1,
+        resetAfter: float = 0.5,
+        latencySmoothing: float = 0.1,
+    ):
+        if window < 2 or window > capacity:
+            raise ValueError("window must be at least 2 and no larger than capacity")
+        self.model = model
+        self.capacity = capacity
+        self.window = window
+        self.alpha = alpha
+        self.beta = beta
+        self.extraLatency = extraLatency
+        self.maxExtrapolation = maxExtrapolation
+        self.resetAfter = resetAfter
+        self.latencySmoothing = latencySmoothing
+        self.latency = 0.0  # smoothed render-and-send latency, seconds
+        self._frameStart: Optional[float] = None
+        self._lastSent: Optional[float] = None  # time of the latest sendFrame of the current frame
+        self._streams: Dict[StreamHandle, _StreamHistory] = {}
+
+    def frameStarted(self, now: Optional[float] = None):
+        """Call when awaitFrameData returns, to start measuring this frame's latency. The previous frame's latency,
+        up to its last frameSent, updates the estimate used to choose the prediction target time."""
+        if self._frameStart is not None and self._lastSent is not None:
+            elapsed = self._lastSent - self._frameStart
+            if self.latency == 0.0:
+                self.latency = elapsed
+            else:
+                self.latency += self.latencySmoothing * (elapsed - self.latency)
+        self._frameStart = time.perf_counter() if now is None else now
+        self._lastSent = None
+
+    def frameSent(self, now: Optional[float] = None):
+        "Call after each sendFrame of the frame."
+        if self._frameStart is None:
+            return
+        sent = time.perf_counter() if now is None else now
+        if self._lastSent is None or sent > self._lastSent:
+            self._lastSent = sent
+
+    def targetTime(self, tTracked: float) -> float:
+        return tTracked + self.latency + self.extraLatency
+
+    def reset(self, stream: Optional[StreamHandle] = None):
+        "Forget the history of a stream (or every stream, e.g. after STREAMS_CHANGED)."
+        if stream is None:
+            self._streams.clear()
+        else:
+            self._streams.pop(stream, None)
+
+    def observe(self, stream: StreamHandle, camera: CameraData, tTracked: float):
+        "Add a tracked pose to the stream's history. Repeated observations of the same tTracked are ignored."
+        history = self._streams.get(stream)
+        if history is None:
+            history = self._streams[stream] = _StreamHistory(self.capacity)
+        if history.count:
+            dt = tTracked - history.times[history.lastIndex()]
+            if dt == 0.0:
+                return
+            if dt < 0.0 or dt > self.resetAfter:
+                history.count = 0
+        history.push(tTracked, camera)
+
+        last = history.lastIndex() * _N_CHANNELS
+        if history.count == 1:
+            for i in range(_N_CHANNELS):
+                history.position[i] = history.poses[last + i]
+                history.velocity[i] = 0.0
+        elif self.model is PredictionModel.ALPHA_BETA:
+            for i in range(_N_CHANNELS):
+                estimate = history.position[i] + history.velocity[i] * dt
+                residual = history.poses[last + i] - estimate
+                history.position[i] = estimate + self.alpha * residual
+                history.velocity[i] += self.beta * residual / dt
+        else:
+            self._fitVelocity(history)
+
+    def _fitVelocity(self, history: _StreamHistory):
+        "Least-squares slope of each channel over the last `window` samples, using the history's fit buffers."
+        n = min(history.count, self.window)
+        indices = history.fitIndices
+        times = history.fitTimes
+        tMean = 0.0
+        for k in range(n):
+            i = indices[k] = (history.head - n + k) % self.capacity
+            tMean += history.times[i]
+        tMean /= n
+        denominator = 0.0
+        for k in range(n):
+            dt = times[k] = history.times[indices[k]] - tMean
+            denominator += dt * dt
+        last = indices[n - 1] * _N_CHANNELS
+        for channel in range(_N_CHANNELS):
+            history.position[channel] = history.poses[last + channel]
+            if denominator == 0.0:
+                history.velocity[channel] = 0.0
+                continue
+            # the centred times sum to zero, so the values don't need centring too
+            covariance = 0.0
+            for k in range(n):
+                covariance += times[k] * history.poses[indices[k] * _N_CHANNELS + channel]
+            history.velocity[channel] = covariance / denominator
+
+    def predict(self, stream: StreamHandle, camera: CameraData, targetTime: float) -> CameraData:
+        """A copy of `camera` with its pose extrapolated to `targetTime`. The returned structure is reused for the
+        stream on every call; if the stream has no history `camera` is copied unchanged."""
+        history = self._streams.get(stream)
+        if history is None:
+            history = self._streams[stream] = _StreamHistory(self.capacity)
+        predicted = history.predicted
+        ctypes.memmove(ctypes.addressof(predicted), ctypes.addressof(camera), ctypes.sizeof(CameraData))
+        if history.count < 2:
+            return predicted
+
+        dt = min(max(targetTime - history.times[history.lastIndex()], 0.0), self.maxExtrapolation)
+        for i, field in enumerate(_POSE_FIELDS):
+            value = history.position[i] + history.velocity[i] * dt
+            setattr(predicted, field, _wrapDegrees(value) if i >= _FIRST_ANGLE else value)
+        return predicted
+
+    def update(self, stream: StreamHandle, camera: CameraData, tTracked: float) -> CameraData:
+        "Observe this frame's tracked pose and return the pose predicted for when the frame will be seen."
+        self.observe(stream, camera, tTracked)
+        return self.predict(stream, camera, self.targetTime(tTracked))
@@ -0,0 +1,126 @@
+"""Per-frame profiling values for d3's profiling view.
+
+A ProfilingSession registers its counters and timers up front, so entry names are encoded once and the
+ProfilingEntry array passed to sendProfilingData is built once. Values are accumulated every frame and their mean or
+maximum over the last `sendEvery` frames is sent, which keeps the cost low enough to leave on in production."""
+
+import time
+from array import array
+from typing import Dict, List
+
+from .renderstream import ProfilingEntry, RenderStream
+
+MEAN = "mean"
+MAX = "max"
+
+
+class _ScopedTimer:
+    "Reusable context manager which adds the time spent inside it, in milliseconds, to one counter."
+
+    __slots__ = ("_session", "_index", "_start")
+
+    def __init__(self, session: "ProfilingSession", index: int):
+        self._session = session
+        self._index = index
+        self._start = 0.0
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._session._accumulate(self._index, (time.perf_counter() - self._start) * 1000.0)
+
+
+class ProfilingSession:
+    """Named profiling counters sent to d3 through sendProfilingData.
+
+        profiling = ProfilingSession(rs, sendEvery=10)
+        profiling.addTimer("render")
+        profiling.addCounter("streams")
+        ...
+        with profiling.timer("render"):
+            render()
+        profiling.set("streams", streams.nStreams)
+        profiling.endFrame()
+
+    Each value set (or timed) within a frame is summed; at the end of every `sendEvery` frames the per-frame mean
+    (or maximum, for entries registered with aggregation=MAX) is sent and accumulation restarts."""
+
+    def __init__(self, rs: RenderStream, sendEvery: int = 1):
+        self.rs = rs
+        self.sendEvery = sendEvery
+        self.frame = 0
+        self._names: List[bytes] = []  # keeps the encoded names alive for the entries that point at them
+        self._aggregations: List[str] = []
+        self._indices: Dict[str, int] = {}
+        self._timers: List[_ScopedTimer] = []
+        self._entries = (ProfilingEntry * 0)()
+        self._frameValues = array("d")
+        self._sums = array("d")
+        self._maxima = array("d")
+        self._touched = array("B")
+
+    def _register(self, name: str, aggregation: str) -> int:
+        if aggregation not in (MEAN, MAX):
+            raise ValueError(f"Unknown aggregation {aggregation!r}")
+        if name in self._indices:
+            raise ValueError(f"Profiling entry {name!r} is already registered")
+        index = self._indices[name] = len(self._names)
+        self._names.append(bytes(name, encoding="utf-8"))
+        self._aggregations.append(aggregation)
+        self._timers.append(_ScopedTimer(self, index))
+        for values in (self._frameValues, self._sums, self._maxima):
+            values.append(0.0)
+        self._touched.append(0)
+
+        self._entries = (ProfilingEntry * len(self._names))()
+        for entry, encoded in zip(self._entries, self._names):
+            entry.name = encoded
+        return index
+
+    def addCounter(self, name: str, aggregation: str = MEAN) -> int:
+        return self._register(name, aggregation)
+
+    def addTimer(self, name: str, aggregation: str = MEAN) -> int:
+        "Register a timer, reported in milliseconds."
+        return self._register(name, aggregation)
+
+    def _accumulate(self, index: int, value: float):
+        self._frameValues[index] += value
+        self._touched[index] = 1
+
+    def set(self, name: str, value: float):
+        self._accumulate(self._indices[name], value)
+
+    def timer(self, name: str) -> _ScopedTimer:
+        "A context manager timing its body into the named timer. The same object is returned every call."
+        return self._timers[self._indices[name]]
+
+    def endFrame(self):
+        "Fold this frame's values into the aggregates and send them every `sendEvery` frames."
+        frameValues = self._frameValues
+        sums = self._sums
+        maxima = self._maxima
+        for i in range(len(frameValues)):
+            if self._touched[i]:
+                value = frameValues[i]
+                sums[i] += value
+                if value > maxima[i]:
+                    maxima[i] = value
+                frameValues[i] = 0.0
+                self._touched[i] = 0
+
+        self.frame += 1
+        if self.frame % self.sendEvery == 0:
+            self.send()
+
+    def send(self):
+        framesAggregated = (self.frame - 1) % self.sendEvery + 1
+        entries = self._entries
+        for i, aggregation in enumerate(self._aggregations):
+            entries[i].value = self._maxima[i] if aggregation == MAX else self._sums[i] / framesAggregated
+            self._sums[i] = 0.0
+            self._maxima[i] = 0.0
+        if len(entries):
+            self.rs.sendProfilingData(entries)
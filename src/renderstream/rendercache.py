@@ -0,0 +1,112 @@
+"""Skip rendering streams whose inputs haven't changed since the previous frame.
+
+RenderCache fingerprints the inputs of a stream's render: its camera, the scene and its parameter values (including
+image IDs and text values) and, for time-dependent renderers, tTracked. When the fingerprint matches the previous frame
+the render callback is not run and the previously rendered buffer is sent again with this frame's CameraResponseData.
+
+Renderers are time-dependent unless marked with @timeIndependent. Image parameters are fingerprinted by imageId, so a
+renderer showing images whose content changes under the same id (e.g. video) should stay time-dependent."""
+
+import ctypes
+from typing import Callable, Dict, Hashable, Mapping, Optional, Tuple
+
+from .renderstream import (
+    CameraData,
+    CameraResponseData,
+    FrameData,
+    FrameResponseData,
+    ImageFrameData,
+    RemoteParameters,
+    RenderStream,
+    SenderFrameType,
+    SenderFrameTypeData,
+    StreamHandle,
+)
+
+# render callbacks return what to send: (frameType, frameData, outputParams)
+RenderResult = Tuple[SenderFrameType, SenderFrameTypeData, Mapping]
+
+
+def timeIndependent(render: Callable) -> Callable:
+    "Mark a render callback whose output depends only on its camera and parameters, not on tTracked."
+    render.timeDependent = False
+    return render
+
+
+def parameterFingerprint(value):
+    "A hashable stand-in for a frame parameter value; image parameters compare by image id, size and format."
+    if isinstance(value, ImageFrameData):
+        return (value.imageId, value.width, value.height, value.format.value)
+    return value
+
+
+class RenderCache:
+    def __init__(self):
+        self._fingerprints: Dict[StreamHandle, Hashable] = {}
+        self._results: Dict[StreamHandle, RenderResult] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def fingerprint(
+        self, camera: CameraData, scene: RemoteParameters, parameters: Mapping, tTracked: Optional[float] = None
+    ) -> Hashable:
+        """A cheap, exactly comparable summary of a stream's render inputs. Pass tTracked only if time-dependent.
+
+        The scene's hash and the parameter keys are included, so a different scene never matches even if its values
+        do (e.g. two scenes without parameters)."""
+        return (
+            scene.hash,
+            ctypes.string_at(ctypes.addressof(camera), ctypes.sizeof(camera)),
+            tuple((key, parameterFingerprint(value)) for key, value in parameters.items()),
+            tTracked,
+        )
+
+    def invalidate(self, stream: Optional[StreamHandle] = None):
+        "Force the next render of a stream (or every stream, e.g. after STREAMS_CHANGED)."
+        if stream is None:
+            self._fingerprints.clear()
+            self._results.clear()
+        else:
+            self._fingerprints.pop(stream, None)
+            self._results.pop(stream, None)
+
+    def lookup(self, stream: StreamHandle, fingerprint: Hashable) -> Optional[RenderResult]:
+        "The cached result if the stream's previous render had the same fingerprint."
+        if stream in self._results and self._fingerprints.get(stream) == fingerprint:
+            self.hits += 1
+            return self._results[stream]
+        self.misses += 1
+        return None
+
+    def store(self, stream: StreamHandle, fingerprint: Hashable, result: RenderResult):
+        self._fingerprints[stream] = fingerprint
+        self._results[stream] = result
+
+    def renderStream(
+        self,
+        rs: RenderStream,
+        stream: StreamHandle,
+        frameData: FrameData,
+        camera: CameraData,
+        scene: RemoteParameters,
+        parameters: Mapping,
+        render: Callable[[], RenderResult],
+    ) -> bool:
+        """Render and send a stream, or re-send its previous buffer if nothing changed. Returns True on a cache hit.
+
+        The frame data returned by `render` must stay valid until the stream is next rendered, as it may be sent
+        again on later frames; pooled buffers satisfy this."""
+        timeDependent = getattr(render, "timeDependent", True)
+        fingerprint = self.fingerprint(camera, scene, parameters, frameData.tTracked if timeDependent else None)
+        result = self.lookup(stream, fingerprint)
+        hit = result is not None
+        if not hit:
+            result = render()
+            self.store(stream, fingerprint, result)
+
+        frameType, senderFrameData, outputParams = result
+        cameraResponse = CameraResponseData()
+        cameraResponse.tTracked = frameData.tTracked
+        cameraResponse.camera = camera
+        rs.sendFrame(stream, frameType, senderFrameData, FrameResponseData(cameraResponse, scene, outputParams))
+        return hit
@@ -1,9 +1,8 @@
 import ctypes
-import ctypes.wintypes
-import winreg
 import sys
 import os
 import os.path
+import threading
 from typing import Callable, List, Mapping, Union, Tuple
 from .ctypes_helpers import AnnotatedStructure, AnnotatedUnion, Enumeration
 
@@ -18,8 +17,16 @@ pID3D12Device = ctypes.c_void_p
 pID3D12CommandQueue = ctypes.c_void_p
 pID3D12Resource = ctypes.c_void_p
 
-_kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
-_kernel32.FreeLibrary.argtypes = [ctypes.wintypes.HMODULE]
+if sys.platform == "win32":
+    import ctypes.wintypes
+    import winreg
+
+    _kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+    _kernel32.FreeLibrary.argtypes = [ctypes.wintypes.HMODULE]
+else:
+    # Only the simulated controller (renderstream.simulator) can be used outside Windows
+    winreg = None
+    _kernel32 = None
 
 
 class VkDevice_T(ctypes.Structure):
@@ -354,27 +361,7 @@ class FrameResponseData(AnnotatedStructure):
         self.cameraData = ctypes.pointer(cameraData)
         self.schemaHash = scene.hash
 
-        floats: list[float] = []
-        texts: list[str] = []
-
-        # Build the flattened list in the same order as the parameters were published
-        for iParam in range(scene.nParameters):
-            param: RemoteParameter = scene.parameters[iParam]
-            if not param.flags & RemoteParameterFlags.READ_ONLY.value:
-                continue
-
-            key = str(param.key, encoding="utf-8")
-            value = outputParams[key]  # if this isn't present, the schema isn't matched with the outputParams somehow
-            if param.type == RemoteParameterType.NUMBER:
-                if not isinstance(value, float):
-                    raise ValueError(f"Value for {key} should be float")
-                floats.append(value)
-            elif param.type == RemoteParameterType.TEXT:
-                if not isinstance(value, str):
-                    raise ValueError(f"Value for {key} should be str")
-                texts.append(value)
-            else:
-                raise ValueError(f"Unexpected {value!r} in output params")
+        floats, texts = flattenOutputParameters(scene, outputParams)
 
         fParams = (ctypes.c_float * len(floats))(*floats)
         self.parameterData = ctypes.cast(fParams, ctypes.c_void_p)
@@ -384,6 +371,39 @@ class FrameResponseData(AnnotatedStructure):
         self.textData = (ctypes.c_char_p * len(texts))(*texts)
 
 
+def outputParameterLayout(scene: RemoteParameters) -> List[Tuple[str, RemoteParameterType]]:
+    "Returns the keys and types of the scene's read-only parameters, in the order they were published"
+    layout = []
+    for iParam in range(scene.nParameters):
+        param: RemoteParameter = scene.parameters[iParam]
+        if param.flags & RemoteParameterFlags.READ_ONLY.value:
+            layout.append((str(param.key, encoding="utf-8"), param.type))
+    return layout
+
+
+def flattenOutputParameters(
+    scene: RemoteParameters, outputParams: Mapping[str, Union[float, str]]
+) -> Tuple[List[float], List[bytes]]:
+    "Returns the float and utf-8 text values of the scene's read-only parameters, in the order they were published"
+    floats: List[float] = []
+    texts: List[bytes] = []
+
+    for key, paramType in outputParameterLayout(scene):
+        value = outputParams[key]  # if this isn't present, the schema isn't matched with the outputParams somehow
+        if paramType == RemoteParameterType.NUMBER:
+            if not isinstance(value, float):
+                raise ValueError(f"Value for {key} should be float")
+            floats.append(value)
+        elif paramType == RemoteParameterType.TEXT:
+            if not isinstance(value, str):
+                raise ValueError(f"Value for {key} should be str")
+            texts.append(bytes(value, encoding="utf-8"))
+        else:
+            raise ValueError(f"Unexpected {value!r} in output params")
+
+    return floats, texts
+
+
 class HostMemoryData(AnnotatedStructure):
     _pack_ = 4
     data: ctypes.POINTER(ctypes.c_uint8)
@@ -445,10 +465,72 @@ class RenderStreamError(Exception):
 
 def checkRsErrorOK(value):
     if value != RS_ERROR.SUCCESS.value:
-        raise RenderStreamError(RS_ERROR(value))
+        raise RenderStreamError(RS_ERROR.fromValue(value))
     return RS_ERROR.SUCCESS
 
 
+def errcheckRsError(result, func, args):
+    "ctypes errcheck for functions returning RS_ERROR. Success is 0, so the common path is a single truth test."
+    if result:
+        raise RenderStreamError(RS_ERROR.fromValue(result))
+    return RS_ERROR.SUCCESS
+
+
+# name -> (argtypes, whether the function returns RS_ERROR)
+_FUNCTION_SIGNATURES = {
+    "rs_registerLoggingFunc": ([logger_t], False),
+    "rs_registerErrorLoggingFunc": ([logger_t], False),
+    "rs_registerVerboseLoggingFunc": ([logger_t], False),
+    "rs_unregisterLoggingFunc": ([], False),
+    "rs_unregisterErrorLoggingFunc": ([], False),
+    "rs_unregisterVerboseLoggingFunc": ([], False),
+    "rs_initialise": ([ctypes.c_int, ctypes.c_int], True),
+    "rs_initialiseGpGpuWithoutInterop": ([pID3D11Device], True),
+    "rs_initialiseGpGpuWithDX11Device": ([pID3D11Device], True),
+    "rs_initialiseGpGpuWithDX11Resource": ([pID3D11Resource], True),
+    "rs_initialiseGpGpuWithDX12DeviceAndQueue": ([pID3D12Device, pID3D12CommandQueue], True),
+    "rs_initialiseGpGpuWithOpenGlContexts": ([ctypes.c_void_p, ctypes.c_void_p], True),  # [HGLRC, HDC]
+    "rs_initialiseGpGpuWithVulkanDevice": ([VkDevice], True),
+    "rs_shutdown": ([], True),
+    # non-isolated functions, these require init prior to use
+    "rs_useDX12SharedHeapFlag": ([ctypes.POINTER(UseDX12SharedHeapFlag)], True),
+    "rs_saveSchema": ([ctypes.c_char_p, ctypes.POINTER(Schema)], True),
+    "rs_loadSchema": ([ctypes.c_char_p, ctypes.POINTER(Schema), ctypes.POINTER(ctypes.c_uint32)], True),
+    # workload functions, these require the process to be running inside d3's asset launcher environment
+    "rs_setSchema": ([ctypes.POINTER(Schema)], True),
+    "rs_getStreams": ([ctypes.POINTER(StreamDescriptions), ctypes.POINTER(ctypes.c_uint32)], True),
+    "rs_awaitFrameData": ([ctypes.c_int, ctypes.POINTER(FrameData)], True),
+    "rs_setFollower": ([ctypes.c_int], True),
+    "rs_beginFollowerFrame": ([ctypes.c_double], True),
+    "rs_getFrameParameters": ([ctypes.c_uint64, ctypes.c_void_p, ctypes.c_uint64], True),
+    "rs_getFrameImageData": ([ctypes.c_uint64, ctypes.POINTER(ImageFrameData), ctypes.c_uint64], True),
+    "rs_getFrameImage": ([ctypes.c_int64, SenderFrameType, SenderFrameTypeData], True),
+    "rs_getFrameText": ([ctypes.c_uint64, ctypes.c_uint32, ctypes.POINTER(ctypes.c_char_p)], True),
+    "rs_getFrameCamera": ([StreamHandle, ctypes.POINTER(CameraData)], True),
+    "rs_sendFrame": ([StreamHandle, SenderFrameType, SenderFrameTypeData, ctypes.POINTER(FrameResponseData)], True),
+    "rs_releaseImage": ([SenderFrameType, SenderFrameTypeData], True),
+    "rs_logToD3": ([ctypes.c_char_p], True),
+    "rs_sendProfilingData": ([ctypes.POINTER(ProfilingEntry), ctypes.c_int], True),
+    "rs_setNewStatusMessage": ([ctypes.c_char_p], True),
+}
+
+# Function pointer types for the RenderStream API, built once at import rather than per loaded library
+FUNCTION_PROTOTYPES = {
+    name: (ctypes.CFUNCTYPE(ctypes.c_int if checked else None, *argtypes), checked)
+    for name, (argtypes, checked) in _FUNCTION_SIGNATURES.items()
+}
+
+
+def bindRenderStreamFunctions(library: ctypes.CDLL) -> ctypes.CDLL:
+    "Bind every RenderStream function of the loaded library through its prototype, with RS_ERROR checking."
+    for name, (prototype, checked) in FUNCTION_PROTOTYPES.items():
+        function = prototype((name, library))
+        if checked:
+            function.errcheck = errcheckRsError
+        setattr(library, name, function)
+    return library
+
+
 def loadRenderStreamFromRegistry():
     suiteKey = winreg.OpenKeyEx(
         winreg.HKEY_CURRENT_USER, "Software\\d3 Technologies\\d3 Production Suite", 0, winreg.KEY_READ
@@ -469,108 +551,32 @@ def loadRenderStreamFromRegistry():
     os.environ["PATH"] = os.environ["PATH"] + os.pathsep + exeDir
     renderStreamDll = ctypes.CDLL(renderStreamDllPath)
 
-    renderStreamDll.rs_registerLoggingFunc.argtypes = [logger_t]
-    renderStreamDll.rs_registerLoggingFunc.restype = None
-    renderStreamDll.rs_registerErrorLoggingFunc.argtypes = [logger_t]
-    renderStreamDll.rs_registerErrorLoggingFunc.restype = None
-    renderStreamDll.rs_registerVerboseLoggingFunc.argtypes = [logger_t]
-    renderStreamDll.rs_registerVerboseLoggingFunc.restype = None
-    renderStreamDll.rs_unregisterLoggingFunc.argtypes = []
-    renderStreamDll.rs_unregisterLoggingFunc.restype = None
-    renderStreamDll.rs_unregisterErrorLoggingFunc.argtypes = []
-    renderStreamDll.rs_unregisterErrorLoggingFunc.restype = None
-    renderStreamDll.rs_unregisterVerboseLoggingFunc.argtypes = []
-    renderStreamDll.rs_unregisterVerboseLoggingFunc.restype = None
-
-    renderStreamDll.rs_initialise.argtypes = [ctypes.c_int, ctypes.c_int]
-    renderStreamDll.rs_initialise.restype = checkRsErrorOK
-
-    renderStreamDll.rs_initialise.argtypes = [ctypes.c_int, ctypes.c_int]
-    renderStreamDll.rs_initialise.restype = checkRsErrorOK
-
-    renderStreamDll.rs_initialiseGpGpuWithoutInterop.argtypes = [pID3D11Device]
-    renderStreamDll.rs_initialiseGpGpuWithoutInterop.restype = checkRsErrorOK
-    renderStreamDll.rs_initialiseGpGpuWithDX11Device.argtypes = [pID3D11Device]
-    renderStreamDll.rs_initialiseGpGpuWithDX11Device.restype = checkRsErrorOK
-    renderStreamDll.rs_initialiseGpGpuWithDX11Resource.argtypes = [pID3D11Resource]
-    renderStreamDll.rs_initialiseGpGpuWithDX11Resource.restype = checkRsErrorOK
-    renderStreamDll.rs_initialiseGpGpuWithDX12DeviceAndQueue.argtypes = [pID3D12Device, pID3D12CommandQueue]
-    renderStreamDll.rs_initialiseGpGpuWithDX12DeviceAndQueue.restype = checkRsErrorOK
-    renderStreamDll.rs_initialiseGpGpuWithOpenGlContexts.argtypes = [ctypes.c_void_p, ctypes.c_void_p]  # [HGLRC, HDC]
-    renderStreamDll.rs_initialiseGpGpuWithOpenGlContexts.restype = checkRsErrorOK
-    renderStreamDll.rs_initialiseGpGpuWithVulkanDevice.argtypes = [VkDevice]
-    renderStreamDll.rs_initialiseGpGpuWithVulkanDevice.restype = checkRsErrorOK
-
-    renderStreamDll.rs_shutdown.argtypes = []
-    renderStreamDll.rs_shutdown.restype = checkRsErrorOK
-
-    # non-isolated functions, these require init prior to use
-    renderStreamDll.rs_useDX12SharedHeapFlag.argtypes = [ctypes.POINTER(UseDX12SharedHeapFlag)]
-    renderStreamDll.rs_useDX12SharedHeapFlag.restype = checkRsErrorOK
-
-    renderStreamDll.rs_saveSchema.argtypes = [ctypes.c_char_p, ctypes.POINTER(Schema)]
-    renderStreamDll.rs_saveSchema.restype = checkRsErrorOK
+    return bindRenderStreamFunctions(renderStreamDll)
 
-    renderStreamDll.rs_loadSchema.argtypes = [ctypes.c_char_p, ctypes.POINTER(Schema), ctypes.POINTER(ctypes.c_uint32)]
-    renderStreamDll.rs_loadSchema.restype = checkRsErrorOK
 
-    # workload functions, these require the process to be running inside d3's asset launcher environment
-    renderStreamDll.rs_setSchema.argtypes = [ctypes.POINTER(Schema)]
-    renderStreamDll.rs_setSchema.restype = checkRsErrorOK
-
-    renderStreamDll.rs_getStreams.argtypes = [ctypes.POINTER(StreamDescriptions), ctypes.POINTER(ctypes.c_uint32)]
-    renderStreamDll.rs_getStreams.restype = checkRsErrorOK
-
-    renderStreamDll.rs_awaitFrameData.argtypes = [ctypes.c_int, ctypes.POINTER(FrameData)]
-    renderStreamDll.rs_awaitFrameData.restype = checkRsErrorOK
-
-    renderStreamDll.rs_setFollower.argtypes = [ctypes.c_int]
-    renderStreamDll.rs_setFollower.restype = checkRsErrorOK
-
-    renderStreamDll.rs_beginFollowerFrame.argtypes = [ctypes.c_double]
-    renderStreamDll.rs_beginFollowerFrame.restype = checkRsErrorOK
-
-    renderStreamDll.rs_getFrameParameters.argtypes = [ctypes.c_uint64, ctypes.c_void_p, ctypes.c_uint64]
-    renderStreamDll.rs_getFrameParameters.restype = checkRsErrorOK
-
-    renderStreamDll.rs_getFrameImageData.argtypes = [ctypes.c_uint64, ctypes.POINTER(ImageFrameData), ctypes.c_uint64]
-    renderStreamDll.rs_getFrameImageData.restype = checkRsErrorOK
-
-    renderStreamDll.rs_getFrameImage.argtypes = [ctypes.c_int64, SenderFrameType, SenderFrameTypeData]
-    renderStreamDll.rs_getFrameImage.restype = checkRsErrorOK
-
-    renderStreamDll.rs_getFrameText.argtypes = [ctypes.c_uint64, ctypes.c_uint32, ctypes.POINTER(ctypes.c_char_p)]
-    renderStreamDll.rs_getFrameText.restype = checkRsErrorOK
-
-    renderStreamDll.rs_getFrameCamera.argtypes = [StreamHandle, ctypes.POINTER(CameraData)]
-    renderStreamDll.rs_getFrameCamera.restype = checkRsErrorOK
+def _decodingLogger(logger: Callable[[str], None]) -> logger_t:
+    return logger_t(lambda bMsg: logger(str(bMsg, encoding="utf-8")))
 
-    renderStreamDll.rs_sendFrame.argtypes = [
-        StreamHandle,
-        SenderFrameType,
-        SenderFrameTypeData,
-        ctypes.POINTER(FrameResponseData),
-    ]
-    renderStreamDll.rs_sendFrame.restype = checkRsErrorOK
 
-    renderStreamDll.rs_releaseImage.argtypes = [SenderFrameType, SenderFrameTypeData]
-    renderStreamDll.rs_releaseImage.restype = checkRsErrorOK
-
-    renderStreamDll.rs_logToD3.argtypes = [ctypes.c_char_p]
-    renderStreamDll.rs_logToD3.restype = checkRsErrorOK
-
-    renderStreamDll.rs_sendProfilingData.argtypes = [ctypes.POINTER(ProfilingEntry), ctypes.c_int]
-    renderStreamDll.rs_sendProfilingData.restype = checkRsErrorOK
-
-    renderStreamDll.rs_setNewStatusMessage.argtypes = [ctypes.c_char_p]
-    renderStreamDll.rs_setNewStatusMessage.restype = checkRsErrorOK
-
-    return renderStreamDll
+def _loggerCallback(logger: Callable, decode: bool) -> logger_t:
+    return _decodingLogger(logger) if decode else logger_t(logger)
 
 
 class RenderStream:
-    def __init__(self):
-        self.dll = loadRenderStreamFromRegistry()
+    """Threading: getFrameCamera, getFrameImage, sendFrame and releaseImage may be called concurrently from several
+    threads, each thread working on different streams (or images), e.g. with renderstream.parallel.StreamWorkers.
+    The frame-level calls (awaitFrameData, getStreams, getFrameParameters, the schema and follower calls) must be
+    made from one thread, between the per-stream work of successive frames. The logging functions may be registered
+    and unregistered from any thread. A FrameArena may be shared by the per-stream threads."""
+
+    def __init__(self, dll=None):
+        """Loads d3renderstream.dll from the d3 install, or uses `dll`, an object with the same rs_* functions (e.g.
+        a SimulatedController's library)."""
+        self._ownsDll = dll is None
+        self.dll = loadRenderStreamFromRegistry() if dll is None else dll
+        self._loggingLock = threading.Lock()
+        # the DLL may be calling a logger on another thread while it is replaced, so replaced loggers are kept alive
+        self._retiredLoggers = []
 
         # When running under a workload, d3 redirects stdout & stderr for the workload to a file.
         # Python detects that and increases buffering to the point you don't see any output.
@@ -580,39 +586,60 @@ class RenderStream:
             sys.stdout.reconfigure(line_buffering=True, encoding="utf-8")
             sys.stderr.reconfigure(line_buffering=True, encoding="utf-8")
 
+        self.arena = None
         self.dll.rs_initialise(VERSION_MAJOR, VERSION_MINOR)
 
     def __del__(self):
         try:
             self.dll.rs_shutdown()
         finally:
-            # Bizarre requirement to unload explicitly.
-            _kernel32.FreeLibrary(self.dll._handle)
+            if self._ownsDll:
+                # Bizarre requirement to unload explicitly.
+                _kernel32.FreeLibrary(self.dll._handle)
             del self.dll
 
-    def registerLoggingFunc(self, logger: Callable[[str], None]):
-        self._logger = logger_t(lambda bMsg: logger(str(bMsg, encoding="utf-8")))
-        self.dll.rs_registerLoggingFunc(self._logger)
-
-    def registerErrorLoggingFunc(self, logger: Callable[[str], None]):
-        self._errorLogger = logger_t(lambda bMsg: logger(str(bMsg, encoding="utf-8")))
-        self.dll.rs_registerErrorLoggingFunc(self._errorLogger)
-
-    def registerVerboseLoggingFunc(self, logger: Callable[[str], None]):
-        self._verboseLogger = logger_t(lambda bMsg: logger(str(bMsg, encoding="utf-8")))
-        self.dll.rs_registerVerboseLoggingFunc(self._verboseLogger)
+    def setFrameArena(self, arena):
+        """Use a preallocated FrameArena for the structures returned by awaitFrameData, getFrameCamera and
+        getFrameParameters, or None to allocate them per call. With an arena they are reset by awaitFrameData, so
+        they must not be kept beyond the frame they were returned for. FrameResponseData is only taken from the arena
+        when built with arena.frameResponseData(); its text outputs are still encoded per frame."""
+        self.arena = arena
+
+    def _registerLogger(self, name: str, register, callback: logger_t):
+        with self._loggingLock:
+            previous = getattr(self, name, None)
+            setattr(self, name, callback)
+            register(callback)
+            if previous is not None:
+                self._retiredLoggers.append(previous)
+
+    def _unregisterLogger(self, name: str, unregister):
+        with self._loggingLock:
+            unregister()
+            self._retiredLoggers.append(getattr(self, name))
+            delattr(self, name)
+
+    def registerLoggingFunc(self, logger: Callable[[str], None], decode: bool = True):
+        """`logger` is called on the DLL's thread with each message. With `decode` False it is passed the raw utf-8
+        bytes (None for a NULL message), leaving the decoding to the caller, e.g. a LogSink's own thread."""
+        self._registerLogger("_logger", self.dll.rs_registerLoggingFunc, _loggerCallback(logger, decode))
+
+    def registerErrorLoggingFunc(self, logger: Callable[[str], None], decode: bool = True):
+        self._registerLogger("_errorLogger", self.dll.rs_registerErrorLoggingFunc, _loggerCallback(logger, decode))
+
+    def registerVerboseLoggingFunc(self, logger: Callable[[str], None], decode: bool = True):
+        self._registerLogger(
+            "_verboseLogger", self.dll.rs_registerVerboseLoggingFunc, _loggerCallback(logger, decode)
+        )
 
     def unregisterLoggingFunc(self):
-        self.dll.rs_unregisterLoggingFunc()
-        del self._logger
+        self._unregisterLogger("_logger", self.dll.rs_unregisterLoggingFunc)
 
     def unregisterErrorLoggingFunc(self):
-        self.dll.rs_unregisterErrorLoggingFunc()
-        del self._errorLogger
+        self._unregisterLogger("_errorLogger", self.dll.rs_unregisterErrorLoggingFunc)
 
     def unregisterVerboseLoggingFunc(self):
-        self.dll.rs_unregisterVerboseLoggingFunc()
-        del self._verboseLogger
+        self._unregisterLogger("_verboseLogger", self.dll.rs_unregisterVerboseLoggingFunc)
 
     def initialiseGpGpuWithoutInterop(self):
         # the pointer argument is a mistake in the API, so just pass null.
@@ -637,44 +664,44 @@ class RenderStream:
         """When working with DX12, due to the nature of some interop libraries, we either require or don't require
         the shared heap flag to be set on the resources used with RenderStream - this will tell you which."""
         value = UseDX12SharedHeapFlag()
-        self.dll.rs_useDX12SharedHeapFlag(ctypes.pointer(value))
+        self.dll.rs_useDX12SharedHeapFlag(ctypes.byref(value))
         return value
 
     def saveSchema(self, assetPath: str, schema: Schema):
         "Save the schema. Choose assetPath to be the location the script is run from."
-        self.dll.rs_saveSchema(bytes(assetPath, encoding="utf-8"), ctypes.pointer(schema))
+        self.dll.rs_saveSchema(bytes(assetPath, encoding="utf-8"), ctypes.byref(schema))
 
     def loadSchema(self, assetPath: str) -> Schema:
         "Load the schema. Choose assetPath to be the location the script is run from"
         pathBytes = bytes(assetPath, encoding="utf-8")
         nBytes = ctypes.c_uint32(0)
         try:
-            self.dll.rs_loadSchema(pathBytes, pSchema(), ctypes.pointer(nBytes))
+            self.dll.rs_loadSchema(pathBytes, pSchema(), ctypes.byref(nBytes))
         except RenderStreamError as e:
             if e.error != RS_ERROR.BUFFER_OVERFLOW:
                 raise  # we only expect buffer overflow in this case
 
         data = ctypes.cast((ctypes.c_byte * nBytes.value)(), pSchema)
         schema = ctypes.cast(data, pSchema)
-        self.dll.rs_loadSchema(pathBytes, data, ctypes.pointer(nBytes))
+        self.dll.rs_loadSchema(pathBytes, data, ctypes.byref(nBytes))
 
         return schema.contents
 
     def setSchema(self, schema: Schema):
         "Set schema and fill in per-scene hash for use with rs_getFrameParameters etc"
-        self.dll.rs_setSchema(ctypes.pointer(schema))
+        self.dll.rs_setSchema(ctypes.byref(schema))
 
     def getStreams(self) -> StreamDescriptions:
         nBytes = ctypes.c_uint32(0)
         try:
-            self.dll.rs_getStreams(pStreamDescriptions(), ctypes.pointer(nBytes))
+            self.dll.rs_getStreams(pStreamDescriptions(), ctypes.byref(nBytes))
         except RenderStreamError as e:
             if e.error != RS_ERROR.BUFFER_OVERFLOW:
                 raise  # we only expect buffer overflow in this case
 
         data = ctypes.cast((ctypes.c_byte * nBytes.value)(), pStreamDescriptions)
         descriptions = ctypes.cast(data, pStreamDescriptions)
-        self.dll.rs_getStreams(data, ctypes.pointer(nBytes))
+        self.dll.rs_getStreams(data, ctypes.byref(nBytes))
 
         return descriptions.contents
 
@@ -683,8 +710,12 @@ class RenderStream:
 
         In normal operation, this raises RenderStream exceptions on timeout and when streams change
         and these need to be handled appropriately."""
-        frameData = FrameData()
-        self.dll.rs_awaitFrameData(timeoutMs, ctypes.pointer(frameData))  # throws timout etc errors. it's ok.
+        if self.arena is not None:
+            self.arena.reset()
+            frameData = self.arena.frameData()
+        else:
+            frameData = FrameData()
+        self.dll.rs_awaitFrameData(timeoutMs, ctypes.byref(frameData))  # throws timout etc errors. it's ok.
         return frameData
 
     def setFollower(self, isFollower: bool):
@@ -707,28 +738,38 @@ class RenderStream:
         nTexts = 0
         for i in range(scene.nParameters):
             param: RemoteParameter = scene.parameters[i]
-            type = param.type
+            paramType = param.type
 
             if param.flags & RemoteParameterFlags.READ_ONLY.value:
                 continue  # don't count output params
 
-            if type == RemoteParameterType.NUMBER:
+            if paramType == RemoteParameterType.NUMBER:
                 nFloats += 1
-            elif type == RemoteParameterType.IMAGE:
+            elif paramType == RemoteParameterType.IMAGE:
                 nImages += 1
-            elif type == RemoteParameterType.POSE:
+            elif paramType == RemoteParameterType.POSE:
                 nFloats += 16
-            elif type == RemoteParameterType.TRANSFORM:
+            elif paramType == RemoteParameterType.TRANSFORM:
                 nFloats += 16
-            elif type == RemoteParameterType.TEXT:
+            elif paramType == RemoteParameterType.TEXT:
                 nTexts += 1
             else:
-                raise Exception(f"Unknown remote parameter type {type}")
+                raise Exception(f"Unknown remote parameter type {paramType}")
 
-        floats = (ctypes.c_float * nFloats)()
-        self.dll.rs_getFrameParameters(scene.hash, floats, ctypes.sizeof(floats))
-        images = (ImageFrameData * nImages)()
-        self.dll.rs_getFrameImageData(scene.hash, images, ctypes.sizeof(images))
+        arena = self.arena
+        if arena is not None and nFloats <= arena.maxParameterFloats and nImages <= arena.maxParameterImages:
+            floats = arena.parameterFloats
+            images = arena.parameterImages
+        else:
+            if arena is not None:
+                if nFloats > arena.maxParameterFloats:
+                    arena.overflow("parameterFloats")
+                if nImages > arena.maxParameterImages:
+                    arena.overflow("parameterImages")
+            floats = (ctypes.c_float * nFloats)()
+            images = (ImageFrameData * nImages)()
+        self.dll.rs_getFrameParameters(scene.hash, floats, nFloats * ctypes.sizeof(ctypes.c_float))
+        self.dll.rs_getFrameImageData(scene.hash, images, nImages * ctypes.sizeof(ImageFrameData))
 
         values = {}
         iFloat = 0
@@ -741,25 +782,26 @@ class RenderStream:
                 continue  # don't count output params
 
             key = str(param.key, encoding="utf-8")
-            if param.type == RemoteParameterType.NUMBER:
+            paramType = param.type
+            if paramType == RemoteParameterType.NUMBER:
                 values[key] = floats[iFloat]
                 iFloat += 1
-            elif param.type == RemoteParameterType.IMAGE:
+            elif paramType == RemoteParameterType.IMAGE:
                 values[key] = images[iImage]
                 iImage += 1
-            elif param.type == RemoteParameterType.POSE:
+            elif paramType == RemoteParameterType.POSE:
                 values[key] = tuple(floats[iFloat : iFloat + 16])
                 iFloat += 16
-            elif type == RemoteParameterType.TRANSFORM:
+            elif paramType == RemoteParameterType.TRANSFORM:
                 values[key] = tuple(floats[iFloat : iFloat + 16])
                 iFloat += 16
-            elif type == RemoteParameterType.TEXT:
+            elif paramType == RemoteParameterType.TEXT:
                 stringMem = ctypes.c_char_p()
-                self.dll.rs_getFrameText(scene.hash, iText, ctypes.pointer(stringMem))
-                values[key] = str(stringMem, encoding="utf-8")
+                self.dll.rs_getFrameText(scene.hash, iText, ctypes.byref(stringMem))
+                values[key] = str(stringMem.value, encoding="utf-8")
                 iText += 1
             else:
-                raise Exception(f"Unknown remote parameter type {type}")
+                raise Exception(f"Unknown remote parameter type {paramType}")
 
         return values
 
@@ -770,8 +812,8 @@ class RenderStream:
     def getFrameCamera(self, stream: StreamHandle) -> CameraData:
         """returns the CameraData for this stream, or RS_ERROR_NOTFOUND if no " "camera data is available for this
         stream on this frame"""
-        cam = CameraData()
-        self.dll.rs_getFrameCamera(stream, ctypes.pointer(cam))
+        cam = CameraData() if self.arena is None else self.arena.cameraData()
+        self.dll.rs_getFrameCamera(stream, ctypes.byref(cam))
         return cam
 
     def sendFrame(
@@ -782,7 +824,10 @@ class RenderStream:
         response: FrameResponseData,
     ):
         "publish a frame buffer which was generated from the associated tracking and timing information."
-        self.dll.rs_sendFrame(stream, frameType, frameData, ctypes.pointer(response))
+        if self.arena is not None:
+            self.arena.check(frameData)
+            self.arena.check(response)
+        self.dll.rs_sendFrame(stream, frameType, frameData, ctypes.byref(response))
 
     def releaseImage(self, frameType: SenderFrameType, frameData: SenderFrameTypeData):
         "release any references to image (e.g. before deletion)"
@@ -794,8 +839,11 @@ class RenderStream:
         Do not terminate with a newline character"""
         self.dll.rs_logToD3(bytes(message, encoding="utf-8"))
 
-    def sendProfilingData(self, entries: list[ProfilingEntry]):
-        self.dll.rs_sendProfilingData((ProfilingEntry * len(entries))(*entries))
+    def sendProfilingData(self, entries: Union[List[ProfilingEntry], ctypes.Array]):
+        "Send profiling values to d3. Pass a persistent ProfilingEntry array to avoid rebuilding it per call."
+        if not isinstance(entries, ctypes.Array):
+            entries = (ProfilingEntry * len(entries))(*entries)
+        self.dll.rs_sendProfilingData(entries, len(entries))
 
     def setNewStatusMessage(self, message):
         self.dll.rs_setNewStatusMessage(bytes(message, encoding="utf-8"))
@@ -0,0 +1,178 @@
+"""Deadline-aware scheduling of per-stream rendering within a frame.
+
+A FrameScheduler derives a deadline for each frame from FrameData's frame rate, tracks how long each stream takes
+to render, and when a stream is predicted to miss the deadline applies a LatePolicy instead of rendering it."""
+
+import enum
+import time
+from array import array
+from typing import Callable, Dict, Optional
+
+from .renderstream import FrameData, StreamDescriptions, StreamHandle
+
+DEFAULT_FRAME_INTERVAL = 1.0 / 60.0
+
+
+class LatePolicy(enum.Enum):
+    RESEND_LAST = 0  # re-send the stream's previous buffer with the current frame's camera response
+    SKIP = 1  # don't send low priority streams at all, high priority streams re-send their last buffer
+    REDUCED_QUALITY = 2  # render with a quality hint < 1 so the render callback can do less work
+
+
+class StreamAction(enum.Enum):
+    RENDER = 0
+    RESEND_LAST = 1
+    SKIP = 2
+    REDUCED_QUALITY = 3
+
+
+class StreamCost:
+    "Moving average and 99th percentile of a stream's render time, in seconds."
+
+    def __init__(self, window: int = 128, smoothing: float = 0.1):
+        self.smoothing = smoothing
+        self.mean = 0.0
+        self.p99 = 0.0
+        self.nSamples = 0
+        self.consecutiveLate = 0
+        self._samples = array("d", [0.0] * window)
+        self._iSample = 0
+
+    def record(self, seconds: float):
+        if self.nSamples == 0:
+            self.mean = seconds
+        else:
+            self.mean += self.smoothing * (seconds - self.mean)
+        self._samples[self._iSample] = seconds
+        self._iSample = (self._iSample + 1) % len(self._samples)
+        self.nSamples += 1
+        # sorting the window is the expensive part, so only refresh the percentile periodically
+        if self.nSamples <= 16 or self._iSample % 16 == 0:
+            self._updatePercentile()
+
+    def _updatePercentile(self):
+        n = min(self.nSamples, len(self._samples))
+        ordered = sorted(self._samples[:n])
+        self.p99 = ordered[min(n - 1, int(n * 0.99))]
+
+    @property
+    def predicted(self) -> float:
+        "Pessimistic estimate of the next render's duration."
+        return max(self.mean, self.p99)
+
+
+class FrameScheduler:
+    """Decides per stream whether to render, re-send, skip or render at reduced quality.
+
+    Call beginFrame with each FrameData returned by awaitFrameData, then renderStream (or decide/record) for each
+    stream, and setStreams after every getStreams so the costs of removed streams are dropped. `safetyMargin` is the
+    fraction of the frame interval reserved for sending, and streams with a priority below `skipBelowPriority` may
+    be skipped under LatePolicy.SKIP. A stream is always rendered after `maxConsecutiveLate` frames without a full
+    render, so its cost estimate can't keep it stale forever."""
+
+    def __init__(
+        self,
+        policy: LatePolicy = LatePolicy.RESEND_LAST,
+        safetyMargin: float = 0.1,
+        skipBelowPriority: int = 0,
+        minQuality: float = 0.25,
+        maxConsecutiveLate: int = 4,
+        window: int = 128,
+    ):
+        self.policy = policy
+        self.safetyMargin = safetyMargin
+        self.skipBelowPriority = skipBelowPriority
+        self.minQuality = minQuality
+        self.maxConsecutiveLate = maxConsecutiveLate
+        self.window = window
+
+        self.costs: Dict[StreamHandle, StreamCost] = {}
+        self.frameInterval = DEFAULT_FRAME_INTERVAL
+        self.frameStart = 0.0
+        self.deadline = 0.0
+        self.quality = 1.0  # quality hint from the most recent decide()
+        self.framesLate = 0
+        self.actionCounts = {action: 0 for action in StreamAction}
+        self._lateThisFrame = False
+
+    def beginFrame(self, frameData: FrameData, frameStart: Optional[float] = None):
+        "Start timing a frame; frameStart defaults to now, which should be just after awaitFrameData returned."
+        if frameData.frameRateNumerator and frameData.frameRateDenominator:
+            self.frameInterval = frameData.frameRateDenominator / frameData.frameRateNumerator
+        elif frameData.localTimeDelta > 0:
+            self.frameInterval = frameData.localTimeDelta
+        self.frameStart = time.perf_counter() if frameStart is None else frameStart
+        self.deadline = self.frameStart + self.frameInterval * (1.0 - self.safetyMargin)
+        self._lateThisFrame = False
+
+    def setStreams(self, streams: StreamDescriptions):
+        "Forget the costs of streams which are no longer in `streams`, e.g. after STREAMS_CHANGED."
+        current = {streams.streams[i].handle for i in range(streams.nStreams)}
+        for stream in [stream for stream in self.costs if stream not in current]:
+            del self.costs[stream]
+
+    def cost(self, stream: StreamHandle) -> StreamCost:
+        cost = self.costs.get(stream)
+        if cost is None:
+            cost = self.costs[stream] = StreamCost(self.window)
+        return cost
+
+    def remaining(self) -> float:
+        "Seconds left until this frame's deadline, negative once it has passed."
+        return self.deadline - time.perf_counter()
+
+    def decide(self, stream: StreamHandle, priority: int = 0) -> StreamAction:
+        "Choose what to do with a stream given its predicted cost and the time left in the frame."
+        cost = self.cost(stream)
+        remaining = self.remaining()
+        self.quality = 1.0
+        if cost.nSamples == 0 or cost.predicted <= remaining or cost.consecutiveLate >= self.maxConsecutiveLate:
+            action = StreamAction.RENDER
+            cost.consecutiveLate = 0
+        else:
+            if not self._lateThisFrame:
+                self._lateThisFrame = True
+                self.framesLate += 1
+
+            if self.policy == LatePolicy.REDUCED_QUALITY:
+                quality = remaining / cost.predicted if remaining > 0 else 0.0
+                if quality >= self.minQuality:
+                    self.quality = quality
+                    action = StreamAction.REDUCED_QUALITY
+                else:
+                    action = StreamAction.RESEND_LAST
+            elif self.policy == LatePolicy.SKIP and priority < self.skipBelowPriority:
+                action = StreamAction.SKIP
+            else:
+                action = StreamAction.RESEND_LAST
+            cost.consecutiveLate += 1
+
+        self.actionCounts[action] += 1
+        return action
+
+    def record(self, stream: StreamHandle, seconds: float):
+        "Record the time a full quality render of this stream took."
+        self.cost(stream).record(seconds)
+
+    def renderStream(
+        self,
+        stream: StreamHandle,
+        render: Callable[[float], None],
+        resendLast: Callable[[], None],
+        priority: int = 0,
+    ) -> StreamAction:
+        """Render a stream, or apply the late policy to it.
+
+        `render` is called with a quality hint in (0, 1] and is expected to render and send the stream.
+        `resendLast` is called when the stream should send its previous buffer again instead; it should send it
+        with a CameraResponseData for the current frame's tTracked."""
+        action = self.decide(stream, priority)
+        if action == StreamAction.RENDER:
+            start = time.perf_counter()
+            render(1.0)
+            self.record(stream, time.perf_counter() - start)
+        elif action == StreamAction.REDUCED_QUALITY:
+            render(self.quality)
+        elif action == StreamAction.RESEND_LAST:
+            resendLast()
+        return action
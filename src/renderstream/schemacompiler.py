@@ -0,0 +1,231 @@
+"""Compile a declarative schema description into a single contiguous allocation.
+
+Building a Schema from RemoteParameter objects allocates a ctypes object per parameter, per options array and per
+scene, plus a bytes object for every string. compileSchema instead lays out the Schema, every RemoteParameters and
+RemoteParameter, the options and channel pointer arrays and a deduplicated string pool in one buffer, and returns
+views over it. The description is a dict (or JSON text, or a dataclass) shaped like:
+
+    {
+        "engineName": "My engine",
+        "channels": ["main"],
+        "scenes": [
+            {
+                "name": "Default",
+                "parameters": [
+                    {"key": "speed", "displayName": "Speed", "group": "Motion", "default": 1.0, "min": 0.0,
+                     "max": 4.0, "step": 0.01, "flags": ["NO_SEQUENCE"]},
+                    {"key": "title", "displayName": "Title", "group": "Text", "default": "hello"},
+                    {"key": "mode", "displayName": "Mode", "group": "Motion", "default": 0, "options": ["A", "B"]},
+                ],
+            },
+        ],
+    }
+
+Parameter types are inferred from the default (str -> TEXT, otherwise NUMBER) unless "type" names a
+RemoteParameterType member."""
+
+import ctypes
+import dataclasses
+import json
+from typing import Any, Dict, List, Mapping, Tuple, Union
+
+from .renderstream import (
+    RemoteParameter,
+    RemoteParameterDmxType,
+    RemoteParameterFlags,
+    RemoteParameters,
+    RemoteParameterType,
+    Schema,
+)
+
+_ALIGNMENT = 8
+
+
+def _align(offset: int) -> int:
+    return (offset + _ALIGNMENT - 1) & ~(_ALIGNMENT - 1)
+
+
+def _enumValue(enumeration, value) -> int:
+    "Accepts an enumeration member, its name or its integer value."
+    if isinstance(value, enumeration):
+        return value.value
+    if isinstance(value, str):
+        return getattr(enumeration, value).value
+    return int(value)
+
+
+def _flagsValue(value) -> int:
+    if isinstance(value, (list, tuple)):
+        flags = 0
+        for flag in value:
+            flags |= _enumValue(RemoteParameterFlags, flag)
+        return flags
+    return _enumValue(RemoteParameterFlags, value)
+
+
+def _normalise(description) -> Mapping[str, Any]:
+    if isinstance(description, (str, bytes)):
+        return json.loads(description)
+    if dataclasses.is_dataclass(description) and not isinstance(description, type):
+        return dataclasses.asdict(description)
+    return description
+
+
+class _StringPool:
+    "Deduplicated, null-terminated utf-8 strings, addressed by offset into the pool."
+
+    def __init__(self):
+        self.offsets: Dict[str, int] = {}
+        self.data = bytearray()
+
+    def add(self, string: str) -> int:
+        offset = self.offsets.get(string)
+        if offset is None:
+            offset = self.offsets[string] = len(self.data)
+            self.data += bytes(string, encoding="utf-8") + b"\0"
+        return offset
+
+
+class CompiledSchema:
+    """A Schema and everything it points to, stored in one buffer.
+
+    Pass `schema` to RenderStream.setSchema/saveSchema. scene() and parameter() are O(1) lookups returning views
+    into the same buffer, so setSchema's per-scene hashes are visible through them."""
+
+    def __init__(
+        self,
+        buffer: ctypes.Array,
+        sceneOffset: int,
+        parameterOffset: int,
+        sceneIndices: Dict[str, int],
+        parameterIndices: Dict[Tuple[str, str], int],
+    ):
+        self.buffer = buffer
+        self.schema = Schema.from_buffer(buffer, 0)
+        self._sceneOffset = sceneOffset
+        self._parameterOffset = parameterOffset
+        self._sceneIndices = sceneIndices
+        self._parameterIndices = parameterIndices
+
+    @property
+    def nbytes(self) -> int:
+        return ctypes.sizeof(self.buffer)
+
+    def sceneIndex(self, name: str) -> int:
+        return self._sceneIndices[name]
+
+    def scene(self, name: str) -> RemoteParameters:
+        offset = self._sceneOffset + self._sceneIndices[name] * ctypes.sizeof(RemoteParameters)
+        return RemoteParameters.from_buffer(self.buffer, offset)
+
+    def parameter(self, sceneName: str, key: str) -> RemoteParameter:
+        offset = self._parameterOffset + self._parameterIndices[(sceneName, key)] * ctypes.sizeof(RemoteParameter)
+        return RemoteParameter.from_buffer(self.buffer, offset)
+
+
+def compileSchema(description: Union[Mapping[str, Any], str, Any]) -> CompiledSchema:
+    description = _normalise(description)
+    channels: List[str] = list(description.get("channels", []))
+    scenes: List[Mapping[str, Any]] = list(description.get("scenes", []))
+    parameters = [parameter for scene in scenes for parameter in scene.get("parameters", [])]
+
+    # Intern every string first so the pool size is known before allocating
+    pool = _StringPool()
+    for field in ("engineName", "engineVersion", "info"):
+        pool.add(description.get(field, ""))
+    for channel in channels:
+        pool.add(channel)
+    for scene in scenes:
+        pool.add(scene["name"])
+    nOptions = 0
+    for parameter in parameters:
+        for field in ("key", "displayName", "group"):
+            pool.add(parameter.get(field, ""))
+        if isinstance(parameter.get("default"), str):
+            pool.add(parameter["default"])
+        for option in parameter.get("options", []):
+            pool.add(option)
+            nOptions += 1
+
+    sceneOffset = _align(ctypes.sizeof(Schema))
+    parameterOffset = _align(sceneOffset + len(scenes) * ctypes.sizeof(RemoteParameters))
+    pointerOffset = _align(parameterOffset + len(parameters) * ctypes.sizeof(RemoteParameter))
+    poolOffset = _align(pointerOffset + (len(channels) + nOptions) * ctypes.sizeof(ctypes.c_char_p))
+    buffer = (ctypes.c_uint8 * (poolOffset + len(pool.data)))()
+    base = ctypes.addressof(buffer)
+    ctypes.memmove(base + poolOffset, bytes(pool.data), len(pool.data))
+
+    def string(value: str) -> int:
+        return base + poolOffset + pool.offsets[value]
+
+    pointers = (ctypes.c_char_p * (len(channels) + nOptions)).from_buffer(buffer, pointerOffset)
+    iPointer = 0
+
+    schema = Schema.from_buffer(buffer, 0)
+    schema.engineName = string(description.get("engineName", ""))
+    schema.engineVersion = string(description.get("engineVersion", ""))
+    schema.info = string(description.get("info", ""))
+    schema.channels.nChannels = len(channels)
+    schema.channels.channels = ctypes.cast(base + pointerOffset, ctypes.POINTER(ctypes.c_char_p))
+    for channel in channels:
+        pointers[iPointer] = string(channel)
+        iPointer += 1
+    schema.scenes.nScenes = len(scenes)
+    schema.scenes.scenes = ctypes.cast(base + sceneOffset, ctypes.POINTER(RemoteParameters))
+
+    sceneViews = (RemoteParameters * len(scenes)).from_buffer(buffer, sceneOffset)
+    parameterViews = (RemoteParameter * len(parameters)).from_buffer(buffer, parameterOffset)
+    sceneIndices: Dict[str, int] = {}
+    parameterIndices: Dict[Tuple[str, str], int] = {}
+    iParameter = 0
+    for iScene, sceneDescription in enumerate(scenes):
+        sceneName = sceneDescription["name"]
+        sceneIndices[sceneName] = iScene
+        sceneParameters = sceneDescription.get("parameters", [])
+
+        scene = sceneViews[iScene]
+        scene.name = string(sceneName)
+        scene.nParameters = len(sceneParameters)
+        scene.parameters = ctypes.cast(
+            base + parameterOffset + iParameter * ctypes.sizeof(RemoteParameter), ctypes.POINTER(RemoteParameter)
+        )
+
+        for parameterDescription in sceneParameters:
+            key = parameterDescription["key"]
+            if (sceneName, key) in parameterIndices:
+                raise ValueError(f"Duplicate parameter key {key!r} in scene {sceneName!r}")
+            parameterIndices[(sceneName, key)] = iParameter
+
+            param = parameterViews[iParameter]
+            param.key = string(key)
+            param.displayName = string(parameterDescription.get("displayName", ""))
+            param.group = string(parameterDescription.get("group", ""))
+
+            default = parameterDescription.get("default", 0.0)
+            if "type" in parameterDescription:
+                param.type = _enumValue(RemoteParameterType, parameterDescription["type"])
+            else:
+                param.type = RemoteParameterType.TEXT.value if isinstance(default, str) else 0
+            if param.type == RemoteParameterType.TEXT:
+                param.defaults.text.defaultValue = string(default)
+            else:
+                param.defaults.number.defaultValue = default
+                param.defaults.number.min = parameterDescription.get("min", 0.0)
+                param.defaults.number.max = parameterDescription.get("max", 1.0)
+                param.defaults.number.step = parameterDescription.get("step", 0.01)
+
+            options = parameterDescription.get("options", [])
+            param.nOptions = len(options)
+            param.options = ctypes.cast(
+                base + pointerOffset + iPointer * ctypes.sizeof(ctypes.c_char_p), ctypes.POINTER(ctypes.c_char_p)
+            )
+            for option in options:
+                pointers[iPointer] = string(option)
+                iPointer += 1
+
+            param.dmxOffset = parameterDescription.get("dmxOffset", 0)
+            param.dmxType = _enumValue(RemoteParameterDmxType, parameterDescription.get("dmxType", 0))
+            param.flags = _flagsValue(parameterDescription.get("flags", 0))
+            iParameter += 1
+
+    return CompiledSchema(buffer, sceneOffset, parameterOffset, sceneIndices, parameterIndices)
@@ -0,0 +1,673 @@
+"""Simulated RenderStream controller, for soak testing without d3 (and outside Windows).
+
+SimulatedController implements the rs_* function table that RenderStream binds, as Python functions wrapped in the
+same C prototypes, so a workload runs unmodified against it:
+
+    controller = SimulatedController([SimulatedStream("left"), SimulatedStream("right")], faults=[
+        Fault(300, STREAMS_CHANGED),
+        Fault(600, TIMEOUT, frames=20),
+        Fault(900, NOT_FOUND, frames=5),
+        Fault(1200, RESOLUTION_CHANGE, stream="left", size=(1280, 720)),
+    ])
+    rs = RenderStream(dll=controller.library)
+    report = runSoak(controller, lambda: frameLoopIteration(rs), frames=100000)
+    print(report)
+
+It generates frames at the configured rate (in real time, or as fast as the workload consumes them), supplies the
+stream layout, cameras and scene parameters, validates every sendFrame (stream handle, stride, schema hash, output
+parameter sizes, tTracked) and injects the scripted faults at the given frame numbers."""
+
+import ctypes
+import math
+import sys
+import threading
+import time
+import traceback
+import types
+import zlib
+from array import array
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from .renderstream import (
+    FUNCTION_PROTOTYPES,
+    VERSION_MAJOR,
+    FrameData,
+    FrameDataFlags,
+    ImageFrameData,
+    RemoteParameterFlags,
+    RemoteParameterType,
+    RS_ERROR,
+    RSPixelFormat,
+    SenderFrameType,
+    StreamDescription,
+    StreamDescriptions,
+    errcheckRsError,
+)
+
+# fault kinds
+STREAMS_CHANGED = "streams_changed"  # awaitFrameData returns STREAMS_CHANGED; `layout` optionally replaces the streams
+TIMEOUT = "timeout"  # awaitFrameData times out for `frames` calls
+NOT_FOUND = "not_found"  # getFrameCamera returns NOT_FOUND for `streams` (default all) for `frames` frames
+SCENE_SWITCH = "scene_switch"  # FrameData.scene becomes `scene`
+RESOLUTION_CHANGE = "resolution_change"  # `stream` is resized to `size`, followed by STREAMS_CHANGED
+
+_BYTES_PER_PIXEL = {
+    RSPixelFormat.BGRA8.value: 4,
+    RSPixelFormat.BGRX8.value: 4,
+    RSPixelFormat.RGBA32F.value: 16,
+    RSPixelFormat.RGBA16.value: 8,
+    RSPixelFormat.RGBA8.value: 4,
+    RSPixelFormat.RGBX8.value: 4,
+}
+
+_IDENTITY = (1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0, 0.0, 0.0, 0.0, 0.0, 1.0)
+
+
+class SimulatedStream:
+    def __init__(
+        self,
+        name: str,
+        width: int = 1920,
+        height: int = 1080,
+        format: RSPixelFormat = RSPixelFormat.BGRA8,
+        channel: str = "main",
+        clipping: Tuple[float, float, float, float] = (0.0, 1.0, 0.0, 1.0),  # left, right, top, bottom
+        mappingId: int = 1,
+        iViewpoint: int = 0,
+    ):
+        self.name = name
+        self.width = width
+        self.height = height
+        self.format = format
+        self.channel = channel
+        self.clipping = clipping
+        self.mappingId = mappingId
+        self.iViewpoint = iViewpoint
+
+
+class Fault:
+    "A scripted event, injected when the controller is about to produce frame number `frame`."
+
+    def __init__(
+        self,
+        frame: int,
+        kind: str,
+        frames: int = 1,
+        streams: Optional[Sequence[str]] = None,
+        layout: Optional[Sequence[SimulatedStream]] = None,
+        scene: int = 0,
+        stream: Optional[str] = None,
+        size: Optional[Tuple[int, int]] = None,
+    ):
+        if kind not in (STREAMS_CHANGED, TIMEOUT, NOT_FOUND, SCENE_SWITCH, RESOLUTION_CHANGE):
+            raise ValueError(f"Unknown fault {kind!r}")
+        self.frame = frame
+        self.kind = kind
+        self.frames = frames
+        self.streams = streams
+        self.layout = layout
+        self.scene = scene
+        self.stream = stream
+        self.size = size
+
+
+class _SceneLayout:
+    "What the controller needs to know about a scene of the schema passed to rs_setSchema."
+
+    def __init__(self, scene):
+        self.hash = 0
+        floats: List[float] = []
+        self.nImages = 0
+        self.texts: List[bytes] = []
+        self.nOutputFloats = 0
+        self.nOutputTexts = 0
+        signature = []
+        for i in range(scene.nParameters):
+            param = scene.parameters[i]
+            paramType = param.type.value
+            signature.append(b"%s:%d:%d" % (param.key or b"", paramType, param.flags))
+            if param.flags & RemoteParameterFlags.READ_ONLY.value:
+                if paramType == RemoteParameterType.TEXT.value:
+                    self.nOutputTexts += 1
+                else:
+                    self.nOutputFloats += 1
+            elif paramType == RemoteParameterType.NUMBER.value:
+                floats.append(param.defaults.number.defaultValue)
+            elif paramType == RemoteParameterType.IMAGE.value:
+                self.nImages += 1
+            elif paramType in (RemoteParameterType.POSE.value, RemoteParameterType.TRANSFORM.value):
+                floats.extend(_IDENTITY)
+            elif paramType == RemoteParameterType.TEXT.value:
+                self.texts.append(bytes(param.defaults.text.defaultValue or b""))
+        self.floats = (ctypes.c_float * len(floats))(*floats)
+        self.hash = zlib.crc32(b"\0".join(signature)) | (zlib.crc32(scene.name or b"") << 32)
+
+
+class _Recovery:
+    __slots__ = ("fault", "injected", "seconds")
+
+    def __init__(self, fault: Fault, injected: float):
+        self.fault = fault
+        self.injected = injected
+        self.seconds: Optional[float] = None
+
+
+class LatencyHistogram:
+    """Counts of durations in logarithmic buckets 1% wide, from 1us up to about 20 minutes, so the percentiles of a
+    whole soak are kept in fixed memory. Percentiles are accurate to the bucket width."""
+
+    MIN_SECONDS = 1e-6
+    GROWTH = 1.01
+    BUCKETS = 2100
+
+    def __init__(self):
+        self.counts = array("Q", [0] * self.BUCKETS)
+        self.count = 0
+        self.max = 0.0
+        self._logGrowth = math.log(self.GROWTH)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def add(self, seconds: float):
+        if seconds <= self.MIN_SECONDS:
+            i = 0
+        else:
+            i = min(self.BUCKETS - 1, int(math.log(seconds / self.MIN_SECONDS) / self._logGrowth) + 1)
+        self.counts[i] += 1
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def percentile(self, fraction: float) -> float:
+        "The upper bound of the bucket holding the given fraction of the durations (at most the maximum)."
+        if not self.count:
+            return 0.0
+        target = min(self.count - 1, int(fraction * self.count))
+        cumulative = 0
+        for i, count in enumerate(self.counts):
+            cumulative += count
+            if cumulative > target:
+                return min(self.max, self.MIN_SECONDS * self.GROWTH**i)
+        return self.max
+
+
+class SimulatedController:
+    """A scripted stand-in for d3, exposing the rs_* functions as `library`.
+
+    Frames are produced at `frameRate` (numerator, denominator). With `realtime` awaitFrameData sleeps until each
+    frame is due (and for the whole timeout when timing out); otherwise frames are produced as fast as they are
+    requested, with tTracked still advancing at the frame rate. With `copyFrames` every host memory frame is copied
+    out, as the real library does."""
+
+    def __init__(
+        self,
+        streams: Sequence[SimulatedStream],
+        frameRate: Tuple[int, int] = (60, 1),
+        realtime: bool = False,
+        faults: Sequence[Fault] = (),
+        copyFrames: bool = True,
+    ):
+        self.frameRate = frameRate
+        self.frameInterval = frameRate[1] / frameRate[0]
+        self.realtime = realtime
+        self.copyFrames = copyFrames
+        self.faults = sorted(faults, key=lambda fault: fault.frame)
+
+        self.frame = 0  # number of frames produced
+        self.scene = 0
+        self.streams: List[SimulatedStream] = []
+        self._handles: Dict[str, int] = {}
+        self._byHandle: Dict[int, SimulatedStream] = {}
+        self._setLayout(streams)
+        self._streamsChanged = False
+        self._timeouts = 0
+        self._notFound: Dict[int, int] = {}  # handle -> last frame without a camera
+        self._scenes: List[_SceneLayout] = []
+        self._frameData = FrameData()
+        self._frameStart = 0.0
+        self._sent: Dict[int, bool] = {}
+        self._nextFrameTime: Optional[float] = None
+        self._frameCopies: Dict[int, ctypes.Array] = {}
+        self._loggers: Dict[str, Callable] = {}
+        self._pendingRecoveries: List[_Recovery] = []
+        self._lock = threading.Lock()  # sendFrame may be called from several threads
+
+        self.initialised = False
+        self.follower = False
+        self.latencies = LatencyHistogram()  # seconds from awaitFrameData returning to each sendFrame
+        self.framesCompleted = 0  # frames in which every stream with a camera was sent
+        self.framesSent = 0
+        self.recoveries: List[_Recovery] = []
+        self.violations: List[str] = []
+        self.errorsReturned: Dict[str, int] = {}
+        self.d3Log: List[str] = []
+        self.statusMessage = ""
+        self.profiling: Dict[str, float] = {}
+        self.library = self._bind()
+
+    def _bind(self) -> types.SimpleNamespace:
+        "Wrap each rs_* implementation in its C prototype, exactly as bindRenderStreamFunctions does for the DLL."
+        library = types.SimpleNamespace()
+        for name, (prototype, checked) in FUNCTION_PROTOTYPES.items():
+            implementation = getattr(self, "_" + name[3:])
+            function = prototype(self._guard(name, implementation, checked))
+            if checked:
+                function.errcheck = errcheckRsError
+            setattr(library, name, function)
+        return library
+
+    def _guard(self, name: str, implementation: Callable, checked: bool) -> Callable:
+        # an exception escaping a ctypes callback would be printed and reported as success
+        def guarded(*args):
+            try:
+                result = implementation(*args)
+            except Exception:
+                self.violations.append(f"{name} raised:\n{traceback.format_exc()}")
+                result = RS_ERROR.UNSPECIFIED
+            if not checked:
+                return None
+            if result != RS_ERROR.SUCCESS:
+                key = f"{name}:{RS_ERROR._value_map[result.value]}"
+                self.errorsReturned[key] = self.errorsReturned.get(key, 0) + 1
+            return result.value
+
+        return guarded
+
+    def _setLayout(self, streams: Sequence[SimulatedStream]):
+        self.streams = list(streams)
+        self._byHandle = {}
+        for stream in self.streams:
+            handle = self._handles.setdefault(stream.name, len(self._handles) + 1)
+            self._byHandle[handle] = stream
+
+    def handle(self, name: str) -> int:
+        return self._handles[name]
+
+    def log(self, message: str, kind: str = "info"):
+        "Call the workload's registered logging function for `kind` (info, error or verbose)."
+        logger = self._loggers.get(kind)
+        if logger is not None:
+            logger(bytes(message, encoding="utf-8"))
+
+    # faults
+
+    def _injectFaults(self):
+        while self.faults and self.faults[0].frame <= self.frame:
+            fault = self.faults.pop(0)
+            if fault.kind == STREAMS_CHANGED:
+                if fault.layout is not None:
+                    self._setLayout(fault.layout)
+                self._streamsChanged = True
+            elif fault.kind == RESOLUTION_CHANGE:
+                stream = self._byHandle[self._handles[fault.stream]]
+                stream.width, stream.height = fault.size
+                self._streamsChanged = True
+            elif fault.kind == TIMEOUT:
+                self._timeouts += fault.frames
+            elif fault.kind == NOT_FOUND:
+                names = fault.streams if fault.streams is not None else [stream.name for stream in self.streams]
+                for name in names:
+                    self._notFound[self._handles[name]] = self.frame + fault.frames - 1
+            elif fault.kind == SCENE_SWITCH:
+                self.scene = fault.scene
+            self._pendingRecoveries.append(_Recovery(fault, time.perf_counter()))
+
+    def _expectedStreams(self) -> List[int]:
+        "Handles which should be sent this frame: those with a camera."
+        return [handle for handle in self._byHandle if self._notFound.get(handle, -1) < self.frame - 1]
+
+    def _frameCompleted(self):
+        self.framesCompleted += 1
+        if self._pendingRecoveries:
+            now = time.perf_counter()
+            for recovery in self._pendingRecoveries:
+                recovery.seconds = now - recovery.injected
+                self.recoveries.append(recovery)
+            self._pendingRecoveries.clear()
+
+    # initialisation and logging
+
+    def _registerLoggingFunc(self, logger):
+        self._loggers["info"] = logger
+
+    def _registerErrorLoggingFunc(self, logger):
+        self._loggers["error"] = logger
+
+    def _registerVerboseLoggingFunc(self, logger):
+        self._loggers["verbose"] = logger
+
+    def _unregisterLoggingFunc(self):
+        self._loggers.pop("info", None)
+
+    def _unregisterErrorLoggingFunc(self):
+        self._loggers.pop("error", None)
+
+    def _unregisterVerboseLoggingFunc(self):
+        self._loggers.pop("verbose", None)
+
+    def _initialise(self, major, minor):
+        if major != VERSION_MAJOR:
+            return RS_ERROR.INCOMPATIBLE_VERSION
+        if self.initialised:
+            return RS_ERROR.ALREADY_INITIALISED
+        self.initialised = True
+        return RS_ERROR.SUCCESS
+
+    def _initialiseGpGpu(self, *args):
+        return RS_ERROR.SUCCESS
+
+    _initialiseGpGpuWithoutInterop = _initialiseGpGpu
+    _initialiseGpGpuWithDX11Device = _initialiseGpGpu
+    _initialiseGpGpuWithDX11Resource = _initialiseGpGpu
+    _initialiseGpGpuWithDX12DeviceAndQueue = _initialiseGpGpu
+    _initialiseGpGpuWithOpenGlContexts = _initialiseGpGpu
+    _initialiseGpGpuWithVulkanDevice = _initialiseGpGpu
+
+    def _shutdown(self):
+        self.initialised = False
+        return RS_ERROR.SUCCESS
+
+    def _useDX12SharedHeapFlag(self, pFlag):
+        pFlag[0] = 0
+        return RS_ERROR.SUCCESS
+
+    def _saveSchema(self, assetPath, pSchema):
+        return RS_ERROR.SUCCESS
+
+    def _loadSchema(self, assetPath, pSchema, pnBytes):
+        return RS_ERROR.NOT_FOUND  # the simulator has no schema files; workloads must call setSchema
+
+    # workload functions
+
+    def _setSchema(self, pSchema):
+        schema = pSchema[0]
+        self._scenes = []
+        for i in range(schema.scenes.nScenes):
+            scene = schema.scenes.scenes[i]
+            layout = _SceneLayout(scene)
+            scene.hash = layout.hash  # rs_setSchema fills in the per-scene hashes
+            self._scenes.append(layout)
+        return RS_ERROR.SUCCESS
+
+    def _getStreams(self, pDescriptions, pnBytes):
+        strings = [
+            (bytes(stream.channel, encoding="utf-8") + b"\0", bytes(stream.name, encoding="utf-8") + b"\0")
+            for stream in self.streams
+        ]
+        headerSize = ctypes.sizeof(StreamDescriptions)
+        headerSize += -headerSize % ctypes.alignment(StreamDescription)
+        arraySize = ctypes.sizeof(StreamDescription) * len(self.streams)
+        required = headerSize + arraySize + sum(len(channel) + len(name) for channel, name in strings)
+        if not pDescriptions or pnBytes[0] < required:
+            pnBytes[0] = required
+            return RS_ERROR.BUFFER_OVERFLOW
+
+        address = ctypes.addressof(pDescriptions.contents)
+        descriptions = StreamDescriptions.from_address(address)
+        descriptions.nStreams = len(self.streams)
+        descriptions.streams = ctypes.cast(address + headerSize, ctypes.POINTER(StreamDescription))
+        stringAddress = address + headerSize + arraySize
+        for i, stream in enumerate(self.streams):
+            description = descriptions.streams[i]
+            for field, encoded in zip(("channel", "name"), strings[i]):
+                ctypes.memmove(stringAddress, encoded, len(encoded))
+                setattr(description, field, ctypes.cast(stringAddress, ctypes.c_char_p))
+                stringAddress += len(encoded)
+            description.handle = self._handles[stream.name]
+            description.mappingId = stream.mappingId
+            description.iViewpoint = stream.iViewpoint
+            description.width = stream.width
+            description.height = stream.height
+            description.format = stream.format
+            left, right, top, bottom = stream.clipping
+            description.clipping.left = left
+            description.clipping.right = right
+            description.clipping.top = top
+            description.clipping.bottom = bottom
+        pnBytes[0] = required
+        return RS_ERROR.SUCCESS
+
+    def _awaitFrameData(self, timeoutMs, pFrameData):
+        if not self.initialised:
+            return RS_ERROR.UNSPECIFIED
+        self._injectFaults()
+        if self._streamsChanged:
+            self._streamsChanged = False
+            return RS_ERROR.STREAMS_CHANGED
+        if self._timeouts:
+            self._timeouts -= 1
+            if self.realtime:
+                time.sleep(timeoutMs / 1000.0)
+                self._nextFrameTime = None
+            return RS_ERROR.TIMEOUT
+
+        if self.realtime:
+            now = time.perf_counter()
+            due = now if self._nextFrameTime is None else self._nextFrameTime
+            if due - now > timeoutMs / 1000.0:
+                time.sleep(timeoutMs / 1000.0)
+                return RS_ERROR.TIMEOUT
+            if due > now:
+                time.sleep(due - now)
+            self._nextFrameTime = max(due, time.perf_counter() - self.frameInterval) + self.frameInterval
+
+        frameData = self._frameData
+        frameData.tTracked = self.frame * self.frameInterval
+        frameData.localTime = frameData.tTracked
+        frameData.localTimeDelta = self.frameInterval
+        frameData.frameRateNumerator, frameData.frameRateDenominator = self.frameRate
+        frameData.flags = FrameDataFlags.FRAMEDATA_RESET if self.frame == 0 else FrameDataFlags.FRAMEDATA_NO_FLAGS
+        frameData.scene = self.scene
+        pFrameData[0] = frameData
+
+        self.frame += 1
+        self._sent = {handle: False for handle in self._expectedStreams()}
+        if not self._sent:
+            self._frameCompleted()
+        self._frameStart = time.perf_counter()
+        return RS_ERROR.SUCCESS
+
+    def _setFollower(self, isFollower):
+        self.follower = bool(isFollower)
+        return RS_ERROR.SUCCESS
+
+    def _beginFollowerFrame(self, tTracked):
+        return RS_ERROR.SUCCESS
+
+    def _currentScene(self, schemaHash) -> Union[_SceneLayout, RS_ERROR]:
+        if self.scene >= len(self._scenes):
+            return RS_ERROR.INCORRECT_SCHEMA
+        scene = self._scenes[self.scene]
+        if scene.hash != schemaHash:
+            self.violations.append(f"frame {self.frame}: hash {schemaHash:#x} is not the current scene's")
+            return RS_ERROR.INCORRECT_SCHEMA
+        return scene
+
+    def _checkSize(self, name: str, nBytes: int, expected: int) -> bool:
+        if nBytes != expected:
+            self.violations.append(f"frame {self.frame}: {name} given {nBytes} bytes, expected {expected}")
+            return False
+        return True
+
+    def _getFrameParameters(self, schemaHash, pData, nBytes):
+        scene = self._currentScene(schemaHash)
+        if isinstance(scene, RS_ERROR):
+            return scene
+        if not self._checkSize("rs_getFrameParameters", nBytes, ctypes.sizeof(scene.floats)):
+            return RS_ERROR.INVALID_PARAMETERS
+        if nBytes:
+            ctypes.memmove(pData, scene.floats, nBytes)
+        return RS_ERROR.SUCCESS
+
+    def _getFrameImageData(self, schemaHash, pImages, nBytes):
+        scene = self._currentScene(schemaHash)
+        if isinstance(scene, RS_ERROR):
+            return scene
+        if not self._checkSize("rs_getFrameImageData", nBytes, scene.nImages * ctypes.sizeof(ImageFrameData)):
+            return RS_ERROR.INVALID_PARAMETERS
+        for i in range(scene.nImages):
+            image = pImages[i]
+            image.width = 256
+            image.height = 256
+            image.format = RSPixelFormat.RGBA8
+            image.imageId = i + 1
+        return RS_ERROR.SUCCESS
+
+    def _getFrameImage(self, imageId, frameType, frameData):
+        return RS_ERROR.SUCCESS if imageId > 0 else RS_ERROR.NOT_FOUND
+
+    def _getFrameText(self, schemaHash, index, pString):
+        scene = self._currentScene(schemaHash)
+        if isinstance(scene, RS_ERROR):
+            return scene
+        if index >= len(scene.texts):
+            return RS_ERROR.INVALID_PARAMETERS
+        pString[0] = scene.texts[index]  # the layout keeps the bytes alive, as the DLL keeps its strings
+        return RS_ERROR.SUCCESS
+
+    def _getFrameCamera(self, handle, pCamera):
+        if handle not in self._byHandle or self._notFound.get(handle, -1) >= self.frame - 1:
+            return RS_ERROR.NOT_FOUND
+        t = (self.frame - 1) * self.frameInterval
+        camera = pCamera[0]
+        camera.id = handle
+        camera.cameraHandle = 1
+        camera.x = 2.0 * math.sin(t)
+        camera.y = 1.5
+        camera.z = -5.0 * math.cos(t)
+        camera.rx = 0.0
+        camera.ry = math.degrees(t) % 360.0 - 180.0
+        camera.rz = 0.0
+        camera.focalLength = 35.0
+        camera.sensorX = 36.0
+        camera.sensorY = 24.0
+        camera.nearZ = 0.1
+        camera.farZ = 1000.0
+        pCamera[0] = camera
+        return RS_ERROR.SUCCESS
+
+    def _sendFrame(self, handle, frameType, frameData, pResponse):
+        stream = self._byHandle.get(handle)
+        if stream is None:
+            self.violations.append(f"frame {self.frame}: sendFrame to unknown stream {handle}")
+            return RS_ERROR.NOT_FOUND
+        if not pResponse or not pResponse[0].cameraData:
+            self.violations.append(f"frame {self.frame}: sendFrame without camera response data")
+            return RS_ERROR.INVALID_PARAMETERS
+        response = pResponse[0]
+
+        if frameType.value == SenderFrameType.HOST_MEMORY.value:
+            cpu = frameData.cpu
+            rowBytes = stream.width * _BYTES_PER_PIXEL[stream.format.value]
+            if not cpu.data:
+                self.violations.append(f"frame {self.frame}: stream {stream.name} sent a null buffer")
+                return RS_ERROR.INVALID_PARAMETERS
+            if cpu.stride < rowBytes:
+                self.violations.append(
+                    f"frame {self.frame}: stream {stream.name} stride {cpu.stride} is less than a row ({rowBytes})"
+                )
+                return RS_ERROR.INVALID_PARAMETERS
+            if self.copyFrames:
+                size = cpu.stride * (stream.height - 1) + rowBytes
+                copy = self._frameCopies.get(handle)
+                if copy is None or len(copy) != size:
+                    copy = self._frameCopies[handle] = (ctypes.c_uint8 * size)()
+                ctypes.memmove(copy, cpu.data, size)
+
+        if self.scene < len(self._scenes):
+            scene = self._scenes[self.scene]
+            if response.schemaHash != scene.hash:
+                self.violations.append(f"frame {self.frame}: stream {stream.name} response has the wrong schema hash")
+                return RS_ERROR.INCORRECT_SCHEMA
+            if response.parameterDataSize != scene.nOutputFloats * ctypes.sizeof(ctypes.c_float):
+                self.violations.append(
+                    f"frame {self.frame}: stream {stream.name} sent {response.parameterDataSize} bytes of output "
+                    f"parameters, expected {scene.nOutputFloats * ctypes.sizeof(ctypes.c_float)}"
+                )
+                return RS_ERROR.INVALID_PARAMETERS
+            if response.textDataCount != scene.nOutputTexts:
+                self.violations.append(f"frame {self.frame}: stream {stream.name} sent the wrong number of texts")
+                return RS_ERROR.INVALID_PARAMETERS
+        if not self.follower and response.cameraData[0].tTracked != self._frameData.tTracked:
+            self.violations.append(f"frame {self.frame}: stream {stream.name} responded with a stale tTracked")
+
+        with self._lock:
+            self.framesSent += 1
+            self.latencies.add(time.perf_counter() - self._frameStart)
+            if handle in self._sent and not self._sent[handle]:
+                self._sent[handle] = True
+                if all(self._sent.values()):
+                    self._frameCompleted()
+        return RS_ERROR.SUCCESS
+
+    def _releaseImage(self, frameType, frameData):
+        return RS_ERROR.SUCCESS
+
+    def _logToD3(self, message):
+        self.d3Log.append(str(message, encoding="utf-8"))
+        return RS_ERROR.SUCCESS
+
+    def _sendProfilingData(self, pEntries, count):
+        for i in range(count):
+            self.profiling[str(pEntries[i].name, encoding="utf-8")] = pEntries[i].value
+        return RS_ERROR.SUCCESS
+
+    def _setNewStatusMessage(self, message):
+        self.statusMessage = str(message, encoding="utf-8")
+        return RS_ERROR.SUCCESS
+
+
+class SoakReport:
+    def __init__(self, controller: SimulatedController, seconds: float, memoryBlocks: Tuple[int, int]):
+        latencies = controller.latencies
+        self.frames = controller.frame
+        self.framesCompleted = controller.framesCompleted
+        self.framesSent = controller.framesSent
+        self.seconds = seconds
+        self.throughput = controller.framesCompleted / seconds if seconds > 0 else 0.0
+        self.latencyP50 = latencies.percentile(0.5)
+        self.latencyP95 = latencies.percentile(0.95)
+        self.latencyP99 = latencies.percentile(0.99)
+        self.latencyMax = latencies.max
+        self.memoryGrowthBlocks = memoryBlocks[1] - memoryBlocks[0]
+        self.recoveries = [
+            (recovery.fault.kind, recovery.fault.frame, recovery.seconds) for recovery in controller.recoveries
+        ]
+        self.unrecovered = [recovery.fault.kind for recovery in controller._pendingRecoveries]
+        self.violations = list(controller.violations)
+        self.errorsReturned = dict(controller.errorsReturned)
+
+    def __str__(self):
+        lines = [
+            f"{self.framesCompleted}/{self.frames} frames completed in {self.seconds:.1f}s "
+            f"({self.throughput:.1f} frames/s, {self.framesSent} sends)",
+            f"send latency p50 {self.latencyP50 * 1000:.2f}ms, p95 {self.latencyP95 * 1000:.2f}ms, "
+            f"p99 {self.latencyP99 * 1000:.2f}ms, max {self.latencyMax * 1000:.2f}ms",
+            f"memory growth after warm-up: {self.memoryGrowthBlocks} blocks",
+        ]
+        for kind, frame, seconds in self.recoveries:
+            lines.append(f"recovered from {kind} at frame {frame} in {seconds * 1000:.1f}ms")
+        for kind in self.unrecovered:
+            lines.append(f"never recovered from {kind}")
+        for error, count in sorted(self.errorsReturned.items()):
+            lines.append(f"returned {error} x{count}")
+        lines.extend(self.violations[:20])
+        if len(self.violations) > 20:
+            lines.append(f"... and {len(self.violations) - 20} more violations")
+        return "\n".join(lines)
+
+
+def runSoak(
+    controller: SimulatedController, step: Callable[[], None], frames: int, warmupFrames: int = 60
+) -> SoakReport:
+    """Call `step`, one iteration of the workload's frame loop (which must handle RenderStreamErrors the way the
+    workload does on stage), until the controller has produced `frames` frames, then report."""
+    start = time.perf_counter()
+    memoryStart = None
+    while controller.frame < frames:
+        if memoryStart is None and controller.frame >= warmupFrames:
+            memoryStart = sys.getallocatedblocks()
+        step()
+    memoryEnd = sys.getallocatedblocks()
+    return SoakReport(controller, time.perf_counter() - start, (memoryStart or memoryEnd, memoryEnd))
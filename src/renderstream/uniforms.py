@@ -0,0 +1,152 @@
+"""std140/std430 uniform block packing of a scene's parameters.
+
+Instead of looking up and uploading each uniform every frame, compute a UniformLayout for a scene once, declare the
+block in the shader with layout.declaration(), and each frame pack the values returned by getFrameParameters into
+layout.buffer for a single glBufferSubData (or equivalent) upload:
+
+    layout = UniformLayout(scene)
+    shaderSource = layout.declaration(binding=0) + shaderBody
+    ...
+    glBufferSubData(GL_UNIFORM_BUFFER, 0, layout.size, bytes(layout.pack(rs.getFrameParameters(scene))))
+
+NUMBER parameters become floats, POSE and TRANSFORM parameters mat4s and IMAGE parameters vec2s holding the image's
+width and height (named `<key>_size`); TEXT and read-only output parameters are left out. Members are ordered by
+decreasing alignment so no padding is needed between them. For these member types std140 and std430 only differ in
+the block's size, which std140 rounds up to a multiple of 16 bytes."""
+
+import re
+import struct
+from typing import Dict, List, Mapping, Optional
+
+from .renderstream import RemoteParameter, RemoteParameterFlags, RemoteParameters, RemoteParameterType
+
+STD140 = "std140"
+STD430 = "std430"
+
+# parameter type value -> (GLSL type, number of floats, base alignment in bytes)
+_MEMBER_TYPES = {
+    RemoteParameterType.POSE.value: ("mat4", 16, 16),
+    RemoteParameterType.TRANSFORM.value: ("mat4", 16, 16),
+    RemoteParameterType.IMAGE.value: ("vec2", 2, 8),
+    RemoteParameterType.NUMBER.value: ("float", 1, 4),
+}
+
+_TRANSPOSE = tuple(row * 4 + column for column in range(4) for row in range(4))
+
+
+def glslIdentifier(key: str) -> str:
+    "A valid GLSL identifier for a parameter key."
+    name = re.sub(r"[^A-Za-z0-9_]", "_", key)
+    name = re.sub(r"__+", "_", name)  # identifiers containing "__" are reserved
+    if not name or name[0].isdigit() or name.startswith("gl_"):
+        name = "p_" + name
+    return name
+
+
+class UniformMember:
+    def __init__(self, key: str, name: str, paramType: int, glslType: str, offset: int, nFloats: int):
+        self.key = key
+        self.name = name
+        self.paramType = paramType
+        self.glslType = glslType
+        self.offset = offset
+        self.nFloats = nFloats
+
+    def __repr__(self):
+        return f"<UniformMember {self.glslType} {self.name} at {self.offset}>"
+
+
+class UniformLayout:
+    """The std140 or std430 layout of a scene's parameters as one uniform (or storage) block.
+
+    Matrices are packed in the order getFrameParameters returns them; set `transposeMatrices` to swap between row
+    and column major."""
+
+    def __init__(
+        self,
+        scene: RemoteParameters,
+        layout: str = STD140,
+        blockName: str = "RenderStreamParameters",
+        transposeMatrices: bool = False,
+    ):
+        if layout not in (STD140, STD430):
+            raise ValueError(f"Unknown uniform block layout {layout!r}")
+        self.layout = layout
+        self.blockName = blockName
+        self.transposeMatrices = transposeMatrices
+        self.schemaHash = scene.hash
+
+        params: List[RemoteParameter] = []
+        for i in range(scene.nParameters):
+            param = scene.parameters[i]
+            if param.flags & RemoteParameterFlags.READ_ONLY.value or param.type.value not in _MEMBER_TYPES:
+                continue
+            params.append(param)
+        # stable sort by decreasing alignment: mat4s, then vec2s, then floats, with no padding between them
+        params.sort(key=lambda param: -_MEMBER_TYPES[param.type.value][2])
+
+        self.members: List[UniformMember] = []
+        self._byKey: Dict[str, UniformMember] = {}
+        names = set()
+        offset = 0
+        format = "<"
+        for param in params:
+            key = str(param.key, encoding="utf-8")
+            glslType, nFloats, alignment = _MEMBER_TYPES[param.type.value]
+            name = glslIdentifier(key + "_size" if param.type == RemoteParameterType.IMAGE else key)
+            while name in names:
+                name += "_"
+            names.add(name)
+
+            padding = -offset % alignment
+            if padding:
+                format += f"{padding}x"
+            offset += padding
+            member = UniformMember(key, name, param.type.value, glslType, offset, nFloats)
+            self.members.append(member)
+            self._byKey[key] = member
+            format += f"{nFloats}f"
+            offset += 4 * nFloats
+
+        if layout == STD140:
+            offset += -offset % 16
+        self.size = max(offset, 16 if layout == STD140 else 4)  # an empty block still declares one float
+        self._struct = struct.Struct(format)
+        self.buffer = bytearray(self.size)
+        self._values = [0.0] * sum(member.nFloats for member in self.members)
+
+    def member(self, key: str) -> UniformMember:
+        return self._byKey[key]
+
+    def offset(self, key: str) -> int:
+        return self._byKey[key].offset
+
+    def declaration(self, binding: Optional[int] = None, instanceName: Optional[str] = None) -> str:
+        "GLSL declaration of the block."
+        qualifiers = self.layout if binding is None else f"{self.layout}, binding = {binding}"
+        storage = "uniform" if self.layout == STD140 else "buffer"
+        lines = [f"layout({qualifiers}) {storage} {self.blockName}", "{"]
+        lines.extend(f"    {member.glslType} {member.name};" for member in self.members)
+        if not self.members:
+            lines.append("    float _unused;")  # GLSL doesn't allow empty blocks
+        lines.append(f"}}{' ' + instanceName if instanceName else ''};")
+        return "\n".join(lines) + "\n"
+
+    def pack(self, values: Mapping) -> bytearray:
+        "Write the values returned by getFrameParameters into `buffer` and return it."
+        flat = self._values
+        i = 0
+        for member in self.members:
+            value = values[member.key]
+            if member.nFloats == 1:
+                flat[i] = value
+            elif member.nFloats == 2:
+                flat[i] = value.width
+                flat[i + 1] = value.height
+            elif self.transposeMatrices:
+                flat[i : i + 16] = [value[j] for j in _TRANSPOSE]
+            else:
+                flat[i : i + 16] = value
+            i += member.nFloats
+        self._struct.pack_into(self.buffer, 0, *flat)
+        return self.buffer